@@ -0,0 +1,98 @@
+"""
+End-of-day absence marking.
+
+Every active enrollment without an attendance row on a day gets one with status
+``absent``, so reports also count the absences staff didn't record. On PostgreSQL
+and SQLite this is one ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``; other
+backends select the missing rows once and insert them with batched
+``bulk_create(ignore_conflicts=True)``. Either way the number of queries doesn't
+grow with the roster, and running it again for the same day inserts nothing.
+Days the calendar marks as weekend or holiday are skipped.
+"""
+
+import logging
+
+from django.db import connection, transaction
+from django.db.models import DateField, DateTimeField, Exists, F, OuterRef, Q, Value
+from django.utils import timezone
+
+from . import caching, events, roster
+from .models import Attendance, CalendarDay, Enrollment
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+INSERT_SELECT_VENDORS = {"postgresql", "sqlite"}
+
+
+def missing_attendance(date):
+	"""Active enrollments of ``date`` without an attendance row that day"""
+	return (
+		Enrollment.objects.filter(status=True, enrollment_date__lte=date, expiration_date__gte=date)
+		.filter(~Exists(Attendance.objects.filter(enrollment=OuterRef("pk"), date=date)))
+		.order_by()
+	)
+
+
+def is_closed(date):
+	return CalendarDay.objects.filter(Q(is_weekend=True) | Q(is_holiday=True), date=date).exists()
+
+
+def mark_absences(date=None, force=False):
+	"""
+	Record the enrollments without attendance on ``date`` (default: today) as absent,
+	unless the facility is closed that day (or ``force``). Returns the rows inserted.
+	"""
+	date = date or timezone.localdate()
+	if not force and is_closed(date):
+		logger.info("Absence marking skipped: %s is a closed day", date)
+		return 0
+	with transaction.atomic():
+		if connection.vendor in INSERT_SELECT_VENDORS:
+			marked = _insert_select(date)
+		else:
+			marked = _bulk_insert(date)
+	if marked:
+		# Bulk inserts skip the signals that keep the caches and the live board current
+		caching.bump("attendance")
+		roster.invalidate_roster(date)
+		transaction.on_commit(lambda: events.publish(events.RESYNC, {}))
+	logger.info("Marked %d enrollments absent on %s", marked, date)
+	return marked
+
+
+def _insert_select(date):
+	rows = missing_attendance(date).values(
+		enrollment_ref=F("pk"),
+		day=Value(date, output_field=DateField()),
+		absent=Value(Attendance.Status.ABSENT),
+		reason=Value(""),
+		changed=Value(timezone.now(), output_field=DateTimeField()),
+	)
+	select_sql, params = rows.query.sql_with_params()
+	quote = connection.ops.quote_name
+	columns = ", ".join(
+		quote(Attendance._meta.get_field(name).column)
+		for name in ("enrollment", "date", "status", "withdrawal_reason", "updated_at")
+	)
+	unique = ", ".join(
+		quote(Attendance._meta.get_field(name).column) for name in ("enrollment", "date")
+	)
+	with connection.cursor() as cursor:
+		# The WHERE clause of the SELECT keeps SQLite from parsing ON CONFLICT as a join
+		cursor.execute(
+			f"INSERT INTO {quote(Attendance._meta.db_table)} ({columns}) {select_sql} "
+			f"ON CONFLICT ({unique}) DO NOTHING",
+			params,
+		)
+		return cursor.rowcount
+
+
+def _bulk_insert(date):
+	ids = list(missing_attendance(date).values_list("pk", flat=True))
+	Attendance.objects.bulk_create(
+		(Attendance(enrollment_id=pk, date=date, status=Attendance.Status.ABSENT) for pk in ids),
+		batch_size=BATCH_SIZE,
+		ignore_conflicts=True,
+	)
+	return len(ids)
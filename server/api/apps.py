@@ -1,6 +1,24 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
 	default_auto_field = "django.db.models.BigAutoField"
 	name = "api"
+
+	def ready(self):
+		from . import scheduler, signals
+
+		signals.connect()
+
+		if not settings.SCHEDULER_ENABLED:
+			return
+		# Management commands other than runserver must not start background jobs,
+		# nor the autoreloader's parent process (the child sets RUN_MAIN)
+		is_command = sys.argv[0].endswith("manage.py")
+		is_runserver = sys.argv[1:2] == ["runserver"] and os.environ.get("RUN_MAIN") == "true"
+		if not is_command or is_runserver:
+			scheduler.start()
@@ -0,0 +1,107 @@
+"""
+Attendance analytics for staffing: when canines arrive and how long they stay.
+
+Both are aggregated in the database over a date range. Arrivals are counted per
+ISO weekday of the day and hour of the arrival time (``EXTRACT``). Stays average
+``departure_time - arrival_time`` per canine size and plan. Results are cached
+per range and returned as matrices (lists of rows) ready for charting.
+"""
+
+import datetime
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from . import caching
+from .models import Attendance, Canine
+
+DEFAULT_DAYS = 90
+WEEKDAYS = range(1, 8)
+HOURS = range(24)
+NAMESPACES = ["attendance", "enrollments", "canines"]
+SECONDS_PER_MINUTE = 60
+
+
+def attendance_analytics(date_from, date_to):
+	"""Arrival heatmap and stay durations of the attendance from ``date_from`` to ``date_to``"""
+	params = {"date_from": date_from, "date_to": date_to}
+	return caching.cached(
+		"attendance_analytics", NAMESPACES, lambda: _compute(date_from, date_to), params=params
+	)
+
+
+def default_range(today):
+	return today - datetime.timedelta(days=DEFAULT_DAYS - 1), today
+
+
+def _compute(date_from, date_to):
+	attendance = Attendance.objects.filter(date__gte=date_from, date__lte=date_to).order_by()
+	return {
+		"date_from": date_from,
+		"date_to": date_to,
+		"arrivals": arrival_heatmap(attendance),
+		"stay": stay_matrix(attendance),
+	}
+
+
+def arrival_heatmap(attendance):
+	"""Arrivals per weekday (rows, 1 = Monday) and hour (columns)"""
+	counts = [[0] * len(HOURS) for _ in WEEKDAYS]
+	rows = (
+		attendance.filter(arrival_time__isnull=False)
+		.values(weekday=ExtractIsoWeekDay("date"), hour=ExtractHour("arrival_time"))
+		.annotate(count=Count("id"))
+	)
+	for row in rows:
+		counts[row["weekday"] - 1][row["hour"]] = row["count"]
+	return {"weekdays": list(WEEKDAYS), "hours": list(HOURS), "counts": counts}
+
+
+def stay_matrix(attendance):
+	"""
+	Average stay in minutes and number of stays per canine size (rows) and plan
+	(columns), with the averages of every size, every plan and overall. Only days
+	with a departure after the arrival count.
+	"""
+	stay = ExpressionWrapper(F("departure_time") - F("arrival_time"), output_field=DurationField())
+	rows = list(
+		attendance.filter(arrival_time__isnull=False, departure_time__gt=F("arrival_time"))
+		.values(
+			size=F("enrollment__canine__size"),
+			plan_id=F("enrollment__plan_id"),
+			plan_name=F("enrollment__plan__name"),
+		)
+		.annotate(average=Avg(stay), count=Count("id"))
+	)
+	sizes = list(Canine.Size.values)
+	sizes += sorted({row["size"] for row in rows} - set(sizes))
+	plans = sorted({(row["plan_id"], row["plan_name"]) for row in rows})
+	columns = {plan_id: index for index, (plan_id, _name) in enumerate(plans)}
+	counts = [[0] * len(plans) for _ in sizes]
+	# Total seconds per cell, so that the row and column averages are exact
+	seconds = [[0.0] * len(plans) for _ in sizes]
+	for row in rows:
+		size, plan = sizes.index(row["size"]), columns[row["plan_id"]]
+		counts[size][plan] = row["count"]
+		seconds[size][plan] = row["average"].total_seconds() * row["count"]
+	by_plan = list(zip(*seconds, strict=True)), list(zip(*counts, strict=True))
+	return {
+		"sizes": sizes,
+		"plans": [{"id": plan_id, "name": name} for plan_id, name in plans],
+		"minutes": [
+			[_minutes(total, count) for total, count in zip(*cells, strict=True)]
+			for cells in zip(seconds, counts, strict=True)
+		],
+		"counts": counts,
+		"size_minutes": [
+			_minutes(sum(totals), sum(row)) for totals, row in zip(seconds, counts, strict=True)
+		],
+		"plan_minutes": [
+			_minutes(sum(totals), sum(column)) for totals, column in zip(*by_plan, strict=True)
+		],
+		"overall_minutes": _minutes(sum(map(sum, seconds)), sum(map(sum, counts))),
+	}
+
+
+def _minutes(total_seconds, count):
+	return round(total_seconds / count / SECONDS_PER_MINUTE, 1) if count else None
@@ -0,0 +1,125 @@
+"""
+In-process dispatch of batched GET requests (``POST /api/batch/``).
+
+Each sub-request is resolved with the URL resolver and handed straight to its view,
+skipping the middleware stack. Sub-requests inherit the headers of the batch
+request, and DRF views reuse the user it was authenticated as instead of decoding
+the token again. Permissions are still checked by every view. With ``parallel``
+the sub-requests run on a thread pool, each thread with its own database
+connection.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUESTS = 20
+MAX_WORKERS = 4
+PATH_PREFIX = "/api/"
+# Request headers that apply to the batch itself, not to its sub-requests
+EXCLUDED_HEADERS = (
+	"CONTENT_LENGTH",
+	"CONTENT_TYPE",
+	"HTTP_IF_MODIFIED_SINCE",
+	"HTTP_IF_NONE_MATCH",
+)
+
+
+class BatchError(ValueError):
+	pass
+
+
+def parse_requests(data):
+	"""Validate the batch body and return the list of sub-request items"""
+	items = data.get("requests") if isinstance(data, dict) else None
+	if not isinstance(items, list) or not items:
+		raise BatchError("requests must be a non-empty list")
+	if len(items) > MAX_REQUESTS:
+		raise BatchError(f"At most {MAX_REQUESTS} requests per batch")
+	for item in items:
+		path = item.get("path") if isinstance(item, dict) else None
+		if not isinstance(path, str) or not path.startswith(PATH_PREFIX):
+			raise BatchError(f"Every request needs a path starting with {PATH_PREFIX}")
+	return items
+
+
+def run_batch(request, items, parallel=False):
+	"""Dispatch ``items`` on behalf of ``request`` (a DRF request), keeping their order"""
+	if not parallel:
+		return [dispatch(request, item) for item in items]
+	with ThreadPoolExecutor(
+		max_workers=min(MAX_WORKERS, len(items)), thread_name_prefix="batch"
+	) as executor:
+		return list(executor.map(lambda item: _dispatch_in_thread(request, item), items))
+
+
+def _dispatch_in_thread(request, item):
+	try:
+		return dispatch(request, item)
+	finally:
+		# Worker threads open their own connection; don't leave it dangling
+		connection.close()
+
+
+def dispatch(request, item):
+	url = urlsplit(item["path"])
+	result = {"path": item["path"]}
+	if "id" in item:
+		result["id"] = item["id"]
+	try:
+		match = resolve(url.path)
+	except Resolver404:
+		return {**result, "status": 404, "body": {"error": "Not found"}}
+	if match.url_name == "batch":
+		return {**result, "status": 400, "body": {"error": "Batches can't be nested"}}
+	if iscoroutinefunction(match.func):
+		return {**result, "status": 400, "body": {"error": "Streaming endpoints can't be batched"}}
+
+	sub_request = _sub_request(request, url, match)
+	try:
+		response = match.func(sub_request, *match.args, **match.kwargs)
+	except Exception:
+		logger.exception("Batched request to %s failed", item["path"])
+		return {**result, "status": 500, "body": {"error": "Internal server error"}}
+	return {**result, "status": response.status_code, "body": _body(response)}
+
+
+def _sub_request(request, url, match):
+	outer = request._request
+	sub_request = HttpRequest()
+	sub_request.method = "GET"
+	sub_request.path = sub_request.path_info = url.path
+	sub_request.META = {
+		key: value for key, value in outer.META.items() if key not in EXCLUDED_HEADERS
+	}
+	sub_request.META.update(REQUEST_METHOD="GET", PATH_INFO=url.path, QUERY_STRING=url.query)
+	sub_request.GET = QueryDict(url.query)
+	sub_request.resolver_match = match
+	sub_request.COOKIES = outer.COOKIES
+	if hasattr(outer, "session"):
+		sub_request.session = outer.session
+	sub_request.user = request.user
+	# Picked up by rest_framework.request.Request: authenticate as the batch request did
+	sub_request._force_auth_user = request.user
+	sub_request._force_auth_token = request.auth
+	return sub_request
+
+
+def _body(response):
+	data = getattr(response, "data", None)
+	if data is not None:
+		return data
+	if getattr(response, "streaming", False):
+		return None
+	content = response.content.decode(response.charset)
+	if response.get("Content-Type", "").startswith("application/json"):
+		return json.loads(content) if content else None
+	return content
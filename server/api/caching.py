@@ -0,0 +1,72 @@
+"""
+Versioned caching for reports and other derived data.
+
+Cached values are grouped in namespaces (``"enrollments"``, ``"attendance"``...).
+Every namespace has a version number stored in the cache; keys embed the versions
+of the namespaces they depend on, so bumping a version invalidates every dependent
+entry at once without having to know their keys.
+
+Invalidation from management commands or other workers only reaches the server
+processes when ``CACHES`` points to a shared backend (file, database or Redis); the
+default dummy backend caches nothing (see :func:`enabled`).
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+
+from .metrics import record_cache
+
+VERSION_KEY = "cache-version:{}"
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def enabled():
+	"""
+	False with the dummy backend: versions never move, so process-local caches keyed
+	on them must not be used either
+	"""
+	return not isinstance(caches["default"], DummyCache)
+
+
+def get_versions(namespaces):
+	keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+	versions = cache.get_many(keys)
+	return [versions.get(key, 0) for key in keys]
+
+
+def bump(*namespaces):
+	"""Invalidate every cached value depending on any of ``namespaces``"""
+	for namespace in namespaces:
+		key = VERSION_KEY.format(namespace)
+		# incr is atomic on shared backends; add() initializes missing versions
+		if not cache.add(key, 1, timeout=None):
+			try:
+				cache.incr(key)
+			except ValueError:
+				cache.set(key, 1, timeout=None)
+
+
+def make_key(name, namespaces, params=None):
+	versions = get_versions(namespaces)
+	digest = hashlib.sha1(
+		json.dumps(params or {}, sort_keys=True, default=str).encode(), usedforsecurity=False
+	).hexdigest()
+	version_tag = ".".join(f"{ns}{v}" for ns, v in zip(namespaces, versions, strict=True))
+	return f"{name}:{version_tag}:{digest}"
+
+
+def cached(name, namespaces, compute, params=None, timeout=DEFAULT_TIMEOUT):
+	"""
+	Return the cached value of ``compute()`` for ``name``/``params``, computing and
+	storing it on a miss. Hits and misses are counted in the metrics registry.
+	"""
+	key = make_key(name, namespaces, params)
+	value = cache.get(key)
+	record_cache(name, hit=value is not None)
+	if value is None:
+		value = compute()
+		cache.set(key, value, timeout=timeout)
+	return value
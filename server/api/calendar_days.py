@@ -0,0 +1,165 @@
+"""
+Calendar dimension (:class:`~api.models.CalendarDay`).
+
+One row per day with its weekday, ISO week, weekend and holiday flags computed
+once, so reports can group by them cheaply and time series can be gap-filled by
+joining the grouped facts to the calendar (see :func:`api.reports.run_report`).
+
+The table is extended ``CALENDAR_YEARS_AHEAD`` years past the current one by
+``manage.py extend_calendar`` and the ``extend_calendar`` scheduled job. Holidays
+come from the ``CALENDAR_HOLIDAYS`` setting: the dotted path of a function taking
+a year and returning ``{date: name}``.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Attendance, CalendarDay, Enrollment
+
+ONE_DAY = datetime.timedelta(days=1)
+ISO_SATURDAY = 6
+BATCH_SIZE = 1000
+ATTRIBUTES = ["year", "month", "day", "weekday", "week", "is_weekend", "is_holiday", "holiday"]
+# Colombian holidays (Ley 51 de 1983)
+FIXED_HOLIDAYS = {
+	(1, 1): "Año Nuevo",
+	(5, 1): "Día del Trabajo",
+	(7, 20): "Día de la Independencia",
+	(8, 7): "Batalla de Boyacá",
+	(12, 8): "Inmaculada Concepción",
+	(12, 25): "Navidad",
+}
+# Moved to the following Monday
+MONDAY_HOLIDAYS = {
+	(1, 6): "Reyes Magos",
+	(3, 19): "San José",
+	(6, 29): "San Pedro y San Pablo",
+	(8, 15): "Asunción de la Virgen",
+	(10, 12): "Día de la Raza",
+	(11, 1): "Todos los Santos",
+	(11, 11): "Independencia de Cartagena",
+}
+# Days after Easter Sunday, the last three moved to the following Monday
+EASTER_HOLIDAYS = {-3: "Jueves Santo", -2: "Viernes Santo"}
+EASTER_MONDAY_HOLIDAYS = {39: "Ascensión del Señor", 60: "Corpus Christi", 68: "Sagrado Corazón"}
+
+
+def easter(year):
+	"""Easter Sunday (anonymous Gregorian algorithm)"""
+	a, b, c = year % 19, year // 100, year % 100
+	d, e = divmod(b, 4)
+	g = (8 * b + 13) // 25
+	h = (19 * a + b - d - g + 15) % 30
+	i, k = divmod(c, 4)
+	weekday = (32 + 2 * e + 2 * i - h - k) % 7
+	m = (a + 11 * h + 19 * weekday) // 433
+	month, day = divmod(h + weekday - 7 * m + 114, 31)
+	return datetime.date(year, month, day + 1)
+
+
+def _next_monday(day):
+	return day + datetime.timedelta(days=-day.weekday() % 7)
+
+
+def colombian_holidays(year):
+	holidays = {datetime.date(year, *day): name for day, name in FIXED_HOLIDAYS.items()}
+	for day, name in MONDAY_HOLIDAYS.items():
+		holidays[_next_monday(datetime.date(year, *day))] = name
+	sunday = easter(year)
+	for offset, name in EASTER_HOLIDAYS.items():
+		holidays[sunday + datetime.timedelta(days=offset)] = name
+	for offset, name in EASTER_MONDAY_HOLIDAYS.items():
+		holidays[_next_monday(sunday + datetime.timedelta(days=offset))] = name
+	return holidays
+
+
+def calendar_days(start, end):
+	"""Attributes of every day from ``start`` to ``end`` (inclusive), as dicts"""
+	holidays_for = import_string(settings.CALENDAR_HOLIDAYS)
+	holidays = {}
+	for year in range(start.year, end.year + 1):
+		holidays.update(holidays_for(year))
+	day = start
+	while day <= end:
+		iso = day.isocalendar()
+		yield {
+			"date": day,
+			"year": day.year,
+			"month": day.month,
+			"day": day.day,
+			"weekday": iso.weekday,
+			"week": iso.week,
+			"is_weekend": iso.weekday >= ISO_SATURDAY,
+			"is_holiday": day in holidays,
+			"holiday": holidays.get(day, ""),
+		}
+		day += ONE_DAY
+
+
+def calendar_range(today, *firsts):
+	"""
+	Whole years, from the one of the earliest of ``today`` and ``firsts`` (dates or
+	None) to the end of the calendar horizon. Pure, so migrations can use it too.
+	"""
+	first = min(day for day in (today, *firsts) if day is not None)
+	end = datetime.date(today.year + settings.CALENDAR_YEARS_AHEAD, 12, 31)
+	return datetime.date(first.year, 1, 1), end
+
+
+def default_range():
+	"""Calendar range covering the earliest enrollment or attendance (see :func:`calendar_range`)"""
+	return calendar_range(
+		timezone.localdate(),
+		Enrollment.objects.aggregate(first=Min("enrollment_date"))["first"],
+		Attendance.objects.aggregate(first=Min("date"))["first"],
+	)
+
+
+def extend_calendar(start=None, end=None, rebuild=False):
+	"""
+	Add the missing days from ``start`` to ``end`` (see :func:`default_range`).
+	``rebuild`` rewrites the attributes of the existing days too, e.g. after the
+	holidays change. Returns the number of days written.
+	"""
+	if start is None or end is None:
+		default_start, default_end = default_range()
+		start, end = start or default_start, end or default_end
+	days = [CalendarDay(**fields) for fields in calendar_days(start, end)]
+	if rebuild:
+		CalendarDay.objects.bulk_create(
+			days,
+			batch_size=BATCH_SIZE,
+			update_conflicts=True,
+			unique_fields=["date"],
+			update_fields=ATTRIBUTES,
+		)
+		return len(days)
+	existing = set(
+		CalendarDay.objects.filter(date__range=(start, end)).values_list("date", flat=True)
+	)
+	missing = [day for day in days if day.date not in existing]
+	# Another process may be adding the same days (see cover())
+	CalendarDay.objects.bulk_create(missing, batch_size=BATCH_SIZE, ignore_conflicts=True)
+	return len(missing)
+
+
+def cover(first, last):
+	"""
+	Extend the calendar over the whole years from ``first`` to ``last`` (dates, or
+	None when there is nothing to cover) if it doesn't reach them yet, e.g. for facts
+	dated before the calendar was built. Returns the number of days written.
+	"""
+	if first is None or last is None:
+		return 0
+	start, end = datetime.date(first.year, 1, 1), datetime.date(last.year, 12, 31)
+	bounds = CalendarDay.objects.aggregate(first=Min("date"), last=Max("date"))
+	if bounds["first"] is None:
+		return extend_calendar(start, end)
+	if bounds["first"] <= first and last <= bounds["last"]:
+		return 0
+	# From the existing days on, so that no gap is left between them and the new ones
+	return extend_calendar(min(start, bounds["first"]), max(end, bounds["last"]))
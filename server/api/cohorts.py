@@ -0,0 +1,249 @@
+"""
+Renewal and cohort retention analytics.
+
+A canine's cohort is the month of its first enrollment. An enrollment counts as
+renewed when the canine's next enrollment (``LEAD`` over its enrollments) starts
+at most ``RENEWAL_GRACE_DAYS`` after it expires. Enrollments that haven't been
+renewed and whose grace period is still running are not counted yet.
+
+Each cohort reports its size, how many of its canines renewed at least 1, 2, ...
+times in a row from their first enrollment, and the renewals per plan duration.
+Everything is aggregated in the database, one window query per batch of cohorts.
+
+Results are cached per cohort. Enrollment changes invalidate only the cohorts of
+the canines involved (see :func:`track_cohorts`). A cached cohort also expires
+on its own once the grace period of one of its pending enrollments ends.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import DateField, ExpressionWrapper, F, Min, Q, Window
+from django.db.models.functions import Lead, RowNumber, TruncMonth
+from django.utils import timezone
+
+from . import caching
+from .models import Enrollment, EnrollmentPlan
+
+# Invalidates every cohort (plan durations edited, bulk loads)
+ALL_COHORTS = "cohorts"
+INDEX_NAMESPACE = "cohort-index"
+COHORT_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def cohort_namespace(month):
+	return f"cohort-{month}"
+
+
+def _month(value):
+	# Raw queries return dates on PostgreSQL and ISO strings on SQLite
+	return str(value)[:7]
+
+
+def _date(value):
+	return datetime.date.fromisoformat(str(value)[:10]) if value is not None else None
+
+
+def _first_months(queryset):
+	return queryset.values("canine_id").annotate(cohort=Min(TruncMonth("enrollment_date")))
+
+
+def canine_cohorts(canine_ids):
+	"""``{canine id: cohort month}`` for the canines that have enrollments"""
+	rows = _first_months(Enrollment.objects.filter(canine_id__in=canine_ids))
+	return {row["canine_id"]: _month(row["cohort"]) for row in rows}
+
+
+def invalidate(before, after):
+	"""
+	Invalidate the cohorts of the canines of a change, given their
+	``{canine id: cohort}`` before and after it.
+	"""
+	caching.bump(*(cohort_namespace(month) for month in {*before.values(), *after.values()}))
+	if before != after:
+		caching.bump(INDEX_NAMESPACE)
+
+
+def invalidate_canines(canine_ids):
+	"""Invalidate the cohorts of new canines (enrollments created in bulk)"""
+	invalidate({}, canine_cohorts(canine_ids))
+
+
+def track_cohorts(instance):
+	"""Remember the cohorts of the canines an enrollment change may move"""
+	affected = Enrollment.objects.filter(
+		Q(canine_id=instance.canine_id) | Q(pk=instance.pk)
+		if instance.pk
+		else Q(canine_id=instance.canine_id)
+	).values("canine_id")
+	instance._cohorts = canine_cohorts(affected)
+
+
+def record_cohorts(instance):
+	before = getattr(instance, "_cohorts", {})
+	after = canine_cohorts({*before, instance.canine_id})
+	invalidate(before, after)
+	instance._cohorts = after
+
+
+def _cohort_months():
+	months = _first_months(Enrollment.objects.order_by()).values_list("cohort", flat=True)
+	return sorted({_month(month) for month in months.distinct()})
+
+
+def cohort_months():
+	return caching.cached("cohort_index", [ALL_COHORTS, INDEX_NAMESPACE], _cohort_months)
+
+
+def _facts(months):
+	"""
+	One row per enrollment of the canines of ``months`` with its cohort, position
+	among the canine's enrollments, next start date and renewal deadline.
+	"""
+	canines = _first_months(Enrollment.objects.order_by()).filter(
+		cohort__in=[datetime.date.fromisoformat(f"{month}-01") for month in months]
+	)
+	by_canine = {
+		"partition_by": [F("canine_id")],
+		"order_by": [F("enrollment_date").asc(), F("id").asc()],
+	}
+	return (
+		Enrollment.objects.filter(canine_id__in=canines.values("canine_id"))
+		.annotate(
+			cohort=Window(Min(TruncMonth("enrollment_date")), partition_by=[F("canine_id")]),
+			sequence=Window(RowNumber(), **by_canine),
+			next_start=Window(Lead("enrollment_date"), **by_canine),
+			renew_by=ExpressionWrapper(
+				F("expiration_date") + datetime.timedelta(days=settings.RENEWAL_GRACE_DAYS),
+				output_field=DateField(),
+			),
+			duration=F("plan__duration"),
+		)
+		.order_by()
+		.values("cohort", "canine_id", "duration", "sequence", "next_start", "renew_by")
+	)
+
+
+def _flagged(months):
+	sql, params = _facts(months).query.sql_with_params()
+	flagged = (
+		"SELECT facts.*, CASE WHEN next_start IS NOT NULL AND next_start <= renew_by "
+		f"THEN 1 ELSE 0 END AS renewed FROM ({sql}) AS facts"
+	)
+	return flagged, params
+
+
+def _compute(months, today):
+	"""Cohort entries for ``months``: two aggregate queries over the window rows"""
+	flagged, params = _flagged(months)
+	entries = {
+		month: {"canines": 0, "renewals": [], "durations": {}, "valid_until": None}
+		for month in months
+	}
+	with connection.cursor() as cursor:
+		# Settled enrollments (renewed, or grace period over) and renewals per duration
+		cursor.execute(
+			"SELECT cohort, duration, "
+			"SUM(CASE WHEN renewed = 1 OR renew_by < %s THEN 1 ELSE 0 END), SUM(renewed), "
+			"MIN(CASE WHEN renewed = 0 AND renew_by >= %s THEN renew_by END) "
+			f"FROM ({flagged}) AS flagged GROUP BY cohort, duration",
+			[today, today, *params],
+		)
+		for cohort, duration, ended, renewed, pending in cursor.fetchall():
+			entry = entries[_month(cohort)]
+			entry["durations"][duration] = {"ended": ended, "renewed": renewed}
+			pending_until = _date(pending)
+			if pending_until and (not entry["valid_until"] or pending_until < entry["valid_until"]):
+				entry["valid_until"] = pending_until
+
+		# Consecutive renewals from the first enrollment: position of the first
+		# enrollment not renewed, minus one. Canines with at least N of them are a
+		# running sum from the longest streak down.
+		cursor.execute(
+			"SELECT cohort, streak, SUM(COUNT(*)) OVER (PARTITION BY cohort ORDER BY streak DESC) "
+			"FROM (SELECT cohort, canine_id, MIN(CASE WHEN renewed = 0 THEN sequence END) - 1 "
+			f"AS streak FROM ({flagged}) AS flagged GROUP BY cohort, canine_id) AS canines "
+			"GROUP BY cohort, streak ORDER BY cohort, streak",
+			params,
+		)
+		for cohort, streak, at_least in cursor.fetchall():
+			renewals = entries[_month(cohort)]["renewals"]
+			# Streaks nobody stopped at have the count of the next longer one
+			renewals.extend([int(at_least)] * (streak + 1 - len(renewals)))
+			renewals[streak] = int(at_least)
+	for entry in entries.values():
+		entry["canines"] = entry["renewals"][0] if entry["renewals"] else 0
+		entry["renewals"] = entry["renewals"][1:]
+	return entries
+
+
+def _cohort_key(month):
+	return caching.make_key(
+		"cohort",
+		[ALL_COHORTS, cohort_namespace(month)],
+		{"month": month, "grace": settings.RENEWAL_GRACE_DAYS},
+	)
+
+
+def cohort_entries(today=None):
+	"""
+	``{cohort month: entry}``, recomputing (in one batch) only the cohorts that are
+	missing from the cache, were invalidated or whose pending renewals expired.
+	"""
+	today = today or timezone.now().date()
+	months = cohort_months()
+	keys = {month: _cohort_key(month) for month in months}
+	cached = cache.get_many(keys.values())
+	entries, stale = {}, []
+	for month, key in keys.items():
+		entry = cached.get(key)
+		if entry is None or (entry["valid_until"] and entry["valid_until"] < today):
+			stale.append(month)
+		else:
+			entries[month] = entry
+	caching.record_cache("cohort", hit=not stale)
+	if stale:
+		computed = _compute(stale, today)
+		cache.set_many(
+			{keys[month]: entry for month, entry in computed.items()}, timeout=COHORT_TIMEOUT
+		)
+		entries.update(computed)
+	return dict(sorted(entries.items()))
+
+
+def cohort_report(today=None):
+	entries = cohort_entries(today)
+	durations = {}
+	for entry in entries.values():
+		for duration, counts in entry["durations"].items():
+			total = durations.setdefault(duration, {"ended": 0, "renewed": 0})
+			total["ended"] += counts["ended"]
+			total["renewed"] += counts["renewed"]
+	labels = dict(EnrollmentPlan.Duration.choices)
+	return {
+		"grace_days": settings.RENEWAL_GRACE_DAYS,
+		"renewal_by_duration": [
+			{
+				"duration": duration,
+				"duration_display": labels.get(duration, duration),
+				**counts,
+				"renewal_rate": _rate(counts["renewed"], counts["ended"]),
+			}
+			for duration, counts in sorted(durations.items())
+		],
+		"cohorts": [
+			{
+				"cohort": month,
+				"canines": entry["canines"],
+				"renewals": entry["renewals"],
+				"retention": [_rate(count, entry["canines"]) for count in entry["renewals"]],
+			}
+			for month, entry in entries.items()
+		],
+	}
+
+
+def _rate(part, whole):
+	return round(part / whole, 4) if whole else None
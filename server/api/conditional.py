@@ -0,0 +1,61 @@
+import hashlib
+from operator import attrgetter
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+	"""
+	ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+	The validator is computed before serialization from ``updated_at`` columns:
+	``Max`` of every field in ``validator_fields`` plus ``Count`` of the filtered
+	queryset for lists (one aggregate query), the row's own values for details.
+	Requests whose If-None-Match (or If-Modified-Since, details only) still match get
+	304 without serializing anything. ``validator_fields`` should include the ``updated_at`` of
+	the relations whose data the serializer embeds (names, contact data...).
+	"""
+
+	validator_fields = ("updated_at",)
+
+	def list(self, request, *args, **kwargs):
+		queryset = self.filter_queryset(self.get_queryset())
+		aggregates = {f"v{n}": Max(field) for n, field in enumerate(self.validator_fields)}
+		values = queryset.aggregate(count=Count("pk"), **aggregates)
+		count = values.pop("count")
+		# No Last-Modified for lists: deletions don't move Max(updated_at)
+		response = self.conditional_response(request, [count, *values.values()], dated=False)
+		return response or self.finalize(super().list(request, *args, **kwargs))
+
+	def retrieve(self, request, *args, **kwargs):
+		instance = self.get_object()
+		values = []
+		for field in self.validator_fields:
+			try:
+				values.append(attrgetter(field.replace("__", "."))(instance))
+			except AttributeError:
+				# Null relation
+				values.append(None)
+		response = self.conditional_response(request, values)
+		return response or self.finalize(Response(self.get_serializer(instance).data))
+
+	def conditional_response(self, request, values, dated=True):
+		timestamps = [value for value in values if hasattr(value, "timestamp")]
+		self.last_modified = int(max(timestamps).timestamp()) if dated and timestamps else None
+		# Responses may depend on the user (querysets filtered by permissions)
+		raw = "|".join(str(value) for value in [request.user.pk, request.get_full_path(), *values])
+		self.etag = quote_etag(hashlib.sha1(raw.encode(), usedforsecurity=False).hexdigest())
+		response = get_conditional_response(
+			request, etag=self.etag, last_modified=self.last_modified
+		)
+		return self.finalize(response) if response is not None else None
+
+	def finalize(self, response):
+		response["ETag"] = self.etag
+		if self.last_modified is not None:
+			response["Last-Modified"] = http_date(self.last_modified)
+		patch_cache_control(response, private=True, no_cache=True)
+		return response
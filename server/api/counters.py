@@ -0,0 +1,65 @@
+"""
+Maintenance of the enrollment counters of EnrollmentPlan and TransportService.
+
+Counters move with ``F()`` expressions, so concurrent enrollment changes never
+overwrite each other. The Enrollment signals call :func:`adjust` with the counted
+state (plan, transport service, status) before and after every change; bulk
+operations that bypass the signals (expiration sweep, imports) call it themselves.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Enrollment, EnrollmentPlan, TransportService
+
+COUNTER_FIELDS = ("total_enrollments", "active_enrollments", "inactive_enrollments")
+# Counted model and the position of its primary key in Enrollment.counted_state()
+COUNTED_MODELS = ((EnrollmentPlan, 0, "plan_id"), (TransportService, 1, "transport_service_id"))
+
+
+def adjust(removed=(), added=()):
+	"""
+	Apply the counter deltas of enrollments leaving (``removed``) and entering
+	(``added``) the counts; both are iterables of counted states.
+	"""
+	deltas = Counter()
+	for states, sign in ((removed, -1), (added, 1)):
+		for state in states:
+			status_field = "active_enrollments" if state[2] else "inactive_enrollments"
+			for model, index, _fk in COUNTED_MODELS:
+				deltas[model, state[index], "total_enrollments"] += sign
+				deltas[model, state[index], status_field] += sign
+
+	updates = {}
+	for (model, pk, field), delta in deltas.items():
+		if delta:
+			updates.setdefault((model, pk), {})[field] = F(field) + delta
+	for (model, pk), values in updates.items():
+		model.objects.filter(pk=pk).update(**values)
+
+
+def recount():
+	"""
+	Recompute every counter from the enrollments table.
+	Returns the rows that had drifted as ``(model name, pk, stored, actual)`` tuples.
+	"""
+	drifted = []
+	for model, _index, fk in COUNTED_MODELS:
+		for pk in model.objects.values_list("pk", flat=True):
+			with transaction.atomic():
+				# The row lock holds concurrent F() updates back until the fix is written
+				stored = (
+					model.objects.select_for_update().filter(pk=pk).values_list(*COUNTER_FIELDS)
+				).first()
+				counts = Enrollment.objects.filter(**{fk: pk}).aggregate(
+					total=Count("id"), active=Count("id", filter=Q(status=True))
+				)
+				actual = (counts["total"], counts["active"], counts["total"] - counts["active"])
+				if stored is not None and stored != actual:
+					model.objects.filter(pk=pk).update(
+						**dict(zip(COUNTER_FIELDS, actual, strict=True))
+					)
+					drifted.append((model.__name__, pk, stored, actual))
+	return drifted
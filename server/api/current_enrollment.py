@@ -0,0 +1,50 @@
+"""
+Maintenance of ``Canine.current_enrollment``.
+
+The current enrollment of a canine is its active enrollment covering the day,
+the one expiring last if several overlap. The pointer is refreshed with one
+set-based ``UPDATE`` from the Enrollment signals (for the affected canine), from
+bulk operations and from the daily expiration sweep, which also picks up
+enrollments starting that day. Only rows whose pointer changes are written.
+"""
+
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Canine, Enrollment
+
+
+def current_enrollment_subquery(date):
+	return Subquery(
+		Enrollment.objects.filter(
+			canine=OuterRef("pk"),
+			status=True,
+			enrollment_date__lte=date,
+			expiration_date__gte=date,
+		)
+		.order_by("-expiration_date", "-pk")
+		.values("pk")[:1]
+	)
+
+
+def refresh_current_enrollments(canine_ids=None, date=None):
+	"""
+	Point the given canines (default: all) to their current enrollment on ``date``
+	(default: today). Returns the number of canines whose pointer changed.
+	"""
+	date = date or timezone.now().date()
+	canines = (
+		Canine.objects.all() if canine_ids is None else Canine.objects.filter(pk__in=canine_ids)
+	)
+	changed = (
+		canines.annotate(expected=current_enrollment_subquery(date))
+		.filter(
+			Q(current_enrollment__isnull=True, expected__isnull=False)
+			| Q(current_enrollment__isnull=False, expected__isnull=True)
+			| (Q(expected__isnull=False) & ~Q(current_enrollment=F("expected")))
+		)
+		.values("pk")
+	)
+	return Canine.objects.filter(pk__in=changed).update(
+		current_enrollment=current_enrollment_subquery(date), updated_at=timezone.now()
+	)
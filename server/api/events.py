@@ -0,0 +1,173 @@
+"""
+Live attendance events (check-ins and check-outs) for the Server-Sent Events board.
+
+Views call :func:`publish` once their transaction commits. The broadcaster hands the
+message to its backend, and the backend delivers it to the subscribers (one per open
+stream) of every process that should see it:
+
+- ``LocalBackend`` delivers in-process only. It is enough for a single worker and
+  is the stand-in used in development and tests.
+- ``PostgresBackend`` publishes with ``NOTIFY`` and every process ``LISTEN``s on a
+  dedicated connection, so events reach the streams of all workers.
+
+Select the backend with the ``EVENTS_BACKEND`` setting (dotted path).
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "attendance_events"
+SUBSCRIBER_QUEUE_SIZE = 100
+RECONNECT_DELAY = 5
+RESYNC = "resync"
+
+
+class Subscription:
+	"""
+	Queue of formatted SSE messages for one open stream. A subscriber that falls
+	more than ``SUBSCRIBER_QUEUE_SIZE`` messages behind loses them and gets a
+	``resync`` event instead, telling the board to reload the roster.
+	"""
+
+	def __init__(self, loop):
+		self.loop = loop
+		self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+		self.overflowed = False
+
+	def put(self, message):
+		# Runs in the subscriber's event loop
+		try:
+			self.queue.put_nowait(message)
+		except asyncio.QueueFull:
+			self.overflowed = True
+
+	async def get(self):
+		message = await self.queue.get()
+		if self.overflowed:
+			while not self.queue.empty():
+				self.queue.get_nowait()
+			self.overflowed = False
+			return format_event(RESYNC, {})
+		return message
+
+
+def format_event(event, data):
+	payload = json.dumps(data, cls=DjangoJSONEncoder)
+	return f"event: {event}\ndata: {payload}\n\n"
+
+
+class LocalBackend:
+	"""Deliver messages to the subscribers of the publishing process"""
+
+	def __init__(self, deliver):
+		self.deliver = deliver
+
+	def start(self):
+		pass
+
+	def publish(self, message):
+		self.deliver(message)
+
+
+class PostgresBackend(LocalBackend):
+	"""
+	Fan messages out to every process through ``NOTIFY``/``LISTEN`` on the default
+	database. Messages must stay under the 8000 byte ``NOTIFY`` payload limit.
+	"""
+
+	def __init__(self, deliver):
+		super().__init__(deliver)
+		self.thread = None
+
+	def start(self):
+		if self.thread is None:
+			self.thread = threading.Thread(target=self.listen, name="events-listener", daemon=True)
+			self.thread.start()
+
+	def publish(self, message):
+		with connection.cursor() as cursor:
+			cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, message])
+
+	def listen(self):
+		wrapper = connections["default"]
+		while True:
+			try:
+				listener = wrapper.get_new_connection(wrapper.get_connection_params())
+				listener.autocommit = True
+				with listener:
+					listener.execute(f"LISTEN {CHANNEL}")
+					for notify in listener.notifies():
+						self.deliver(notify.payload)
+			except Exception:
+				logger.exception("Events listener disconnected, retrying")
+			time.sleep(RECONNECT_DELAY)
+
+
+class Broadcaster:
+	def __init__(self, backend_class=None):
+		self.subscriptions = set()
+		self.lock = threading.Lock()
+		self.backend_class = backend_class
+		self._backend = None
+
+	@property
+	def backend(self):
+		# Resolved on first use so that settings are loaded
+		with self.lock:
+			if self._backend is None:
+				backend_class = self.backend_class or import_string(settings.EVENTS_BACKEND)
+				self._backend = backend_class(self.deliver)
+			return self._backend
+
+	def publish(self, event, data):
+		self.backend.publish(format_event(event, data))
+
+	def deliver(self, message):
+		# Called from any thread: hand the message to each subscriber's loop
+		with self.lock:
+			subscriptions = list(self.subscriptions)
+		for subscription in subscriptions:
+			try:
+				subscription.loop.call_soon_threadsafe(subscription.put, message)
+			except RuntimeError:
+				# Event loop closed under a stream that was not cleaned up
+				self.unsubscribe(subscription)
+
+	@contextlib.asynccontextmanager
+	async def subscribe(self):
+		# Listeners only start in processes that actually serve streams
+		self.backend.start()
+		subscription = Subscription(asyncio.get_running_loop())
+		with self.lock:
+			self.subscriptions.add(subscription)
+		try:
+			yield subscription
+		finally:
+			self.unsubscribe(subscription)
+
+	def unsubscribe(self, subscription):
+		with self.lock:
+			self.subscriptions.discard(subscription)
+
+
+broadcaster = Broadcaster()
+
+
+def publish(event, data):
+	"""Send ``event`` to every open stream; call it once the change is committed"""
+	try:
+		broadcaster.publish(event, data)
+	except Exception:
+		# Live updates are best effort: never fail the request that published them
+		logger.exception("Could not publish %s event", event)
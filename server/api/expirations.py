@@ -0,0 +1,99 @@
+"""
+Deactivation of expired enrollments.
+
+Enrollments stay active through their expiration date. The sweeper locks a batch of
+expired rows and deactivates them with a single ``UPDATE ... WHERE id IN``,
+so a backlog of a million rows costs a few hundred statements instead of one
+``save()`` per row. Every batch commits on its own, which keeps locks short and lets
+an interrupted run resume where it stopped.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, counters
+from .current_enrollment import refresh_current_enrollments
+from .models import Enrollment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class SweepResult:
+	def __init__(self, date):
+		self.date = date
+		self.deactivated = 0
+		# Ids of the deactivated enrollments, in the order they were swept
+		self.ids = []
+		self.batches = 0
+		self.repointed = 0
+
+	def as_dict(self):
+		return {
+			"date": self.date.isoformat(),
+			"deactivated": self.deactivated,
+			"ids": self.ids,
+			"batches": self.batches,
+			"repointed": self.repointed,
+		}
+
+
+def expired_enrollments(date):
+	return Enrollment.objects.filter(status=True, expiration_date__lt=date)
+
+
+def sweep_expired_enrollments(date=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+	"""
+	Deactivate the active enrollments that expired before ``date`` (default: today).
+	The deactivated ids are returned in ``result.ids`` and logged batch by batch at
+	INFO level on ``api.expirations``.
+	"""
+	result = SweepResult(date or timezone.now().date())
+	expired = expired_enrollments(result.date)
+	if dry_run:
+		result.deactivated = expired.count()
+		return result
+
+	last_pk = 0
+	while True:
+		with transaction.atomic():
+			# Locked so concurrent edits can't change the rows between counting and updating
+			states = list(
+				expired.filter(pk__gt=last_pk)
+				.order_by("pk")
+				.select_for_update()
+				.values_list("pk", "plan_id", "transport_service_id")[:batch_size]
+			)
+			if not states:
+				break
+			ids = [pk for pk, _plan, _transport in states]
+			updated = Enrollment.objects.filter(pk__in=ids).update(
+				status=False, updated_at=timezone.now()
+			)
+			# .update() skips the signals maintaining the plan/transport counters
+			counters.adjust(
+				removed=[(plan, transport, True) for _pk, plan, transport in states],
+				added=[(plan, transport, False) for _pk, plan, transport in states],
+			)
+		result.deactivated += updated
+		result.batches += 1
+		result.ids.extend(ids)
+		last_pk = ids[-1]
+		logger.info("Deactivated %d expired enrollments: %s", updated, ids)
+
+	# Also points canines to enrollments starting today
+	result.repointed = refresh_current_enrollments(date=result.date)
+	if result.deactivated or result.repointed:
+		# .update() doesn't send the signals invalidating the report caches either
+		caching.bump("enrollments", "canines")
+	logger.info(
+		"Expiration sweep for %s: %d enrollments deactivated in %d batches, %d canines repointed",
+		result.date,
+		result.deactivated,
+		result.batches,
+		result.repointed,
+	)
+	return result
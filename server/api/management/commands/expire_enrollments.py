@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from api.expirations import DEFAULT_BATCH_SIZE, sweep_expired_enrollments
+
+
+class Command(BaseCommand):
+	help = "Deactivate the active enrollments whose expiration date has passed."
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--date",
+			type=datetime.date.fromisoformat,
+			help="Deactivate enrollments that expired before this date (default: today)",
+		)
+		parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+		parser.add_argument(
+			"--dry-run", action="store_true", help="Only count the expired enrollments"
+		)
+
+	def handle(self, *args, **options):
+		result = sweep_expired_enrollments(
+			date=options["date"],
+			batch_size=options["batch_size"],
+			dry_run=options["dry_run"],
+		)
+		verb = "would be deactivated" if options["dry_run"] else "deactivated"
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"{result.deactivated} enrollments expired before {result.date} {verb}"
+			)
+		)
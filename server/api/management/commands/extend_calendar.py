@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from api.calendar_days import extend_calendar
+
+
+class Command(BaseCommand):
+	help = "Add the missing days to the calendar table used by the time series reports."
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--start",
+			type=datetime.date.fromisoformat,
+			help="First day (default: January 1 of the earliest enrollment or attendance)",
+		)
+		parser.add_argument(
+			"--end",
+			type=datetime.date.fromisoformat,
+			help="Last day (default: end of the year CALENDAR_YEARS_AHEAD years from now)",
+		)
+		parser.add_argument(
+			"--rebuild",
+			action="store_true",
+			help="Also recompute the existing days (e.g. after changing CALENDAR_HOLIDAYS)",
+		)
+
+	def handle(self, *args, **options):
+		written = extend_calendar(options["start"], options["end"], rebuild=options["rebuild"])
+		verb = "rebuilt" if options["rebuild"] else "added"
+		self.stdout.write(self.style.SUCCESS(f"{written} calendar days {verb}"))
@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.roster_import import COLUMNS, DEFAULT_CHUNK_SIZE, HashingPool, RosterImporter
+
+MAX_PRINTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+	help = (
+		"Import clients, canines and enrollments from a CSV file with the columns: "
+		+ ", ".join(COLUMNS)
+		+ ". Repeat the username on several rows to register several canines for one client."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("csv_path", type=Path)
+		parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+		parser.add_argument(
+			"--workers",
+			type=int,
+			default=None,
+			help="Password hashing processes (default: ROSTER_IMPORT_WORKERS)",
+		)
+		parser.add_argument("--dry-run", action="store_true", help="Only validate the file")
+		parser.add_argument("--report", type=Path, help="Write the per-row error report as JSON")
+
+	def handle(self, *args, **options):
+		if not options["csv_path"].exists():
+			raise CommandError(f"{options['csv_path']} does not exist")
+
+		pool = HashingPool(options["workers"])
+		importer = RosterImporter(
+			chunk_size=options["chunk_size"], pool=pool, dry_run=options["dry_run"]
+		)
+		try:
+			with options["csv_path"].open(newline="", encoding="utf-8-sig") as csv_file:
+				result = importer.run(csv_file)
+		finally:
+			pool.shutdown()
+
+		if options["report"]:
+			options["report"].write_text(json.dumps(result.as_dict(), indent=2, ensure_ascii=False))
+		for error in result.errors[:MAX_PRINTED_ERRORS]:
+			self.stderr.write(f"line {error['line']}: {error['errors']}")
+		if len(result.errors) > MAX_PRINTED_ERRORS:
+			self.stderr.write(f"... and {len(result.errors) - MAX_PRINTED_ERRORS} more errors")
+
+		created = ", ".join(f"{count} {name}" for name, count in result.created.items())
+		prefix = "Validated" if options["dry_run"] else "Imported"
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"{prefix} {result.rows} rows ({len(result.errors)} with errors): {created}"
+			)
+		)
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from api.absences import mark_absences
+
+
+class Command(BaseCommand):
+	help = "Record the active enrollments without attendance on a day as absent."
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--date",
+			type=datetime.date.fromisoformat,
+			help="Day to close (default: today)",
+		)
+		parser.add_argument(
+			"--force",
+			action="store_true",
+			help="Also mark days the calendar has as weekend or holiday",
+		)
+
+	def handle(self, *args, **options):
+		marked = mark_absences(date=options["date"], force=options["force"])
+		self.stdout.write(self.style.SUCCESS(f"{marked} enrollments marked absent"))
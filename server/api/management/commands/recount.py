@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import recount
+
+
+class Command(BaseCommand):
+	help = (
+		"Recompute the enrollment counters of every plan and transport service "
+		"and repair the ones that drifted."
+	)
+
+	def handle(self, *args, **options):
+		drifted = recount()
+		for model_name, pk, stored, actual in drifted:
+			self.stdout.write(f"{model_name} {pk}: {stored} -> {actual} (total, active, inactive)")
+		self.stdout.write(self.style.SUCCESS(f"{len(drifted)} counters repaired"))
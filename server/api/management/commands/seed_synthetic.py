@@ -0,0 +1,275 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import caching, cohorts
+from api.calendar_days import extend_calendar
+from api.counters import recount
+from api.current_enrollment import refresh_current_enrollments
+from api.models import (
+	Attendance,
+	Canine,
+	Client,
+	Enrollment,
+	EnrollmentPlan,
+	TransportService,
+	User,
+)
+
+PLAN_MIX = {
+	EnrollmentPlan.Duration.ONE_MONTH: (0.35, 30, Decimal("350000")),
+	EnrollmentPlan.Duration.ONE_BIMESTER: (0.2, 60, Decimal("650000")),
+	EnrollmentPlan.Duration.ONE_TRIMESTER: (0.2, 90, Decimal("900000")),
+	EnrollmentPlan.Duration.SIX_MONTHS: (0.15, 180, Decimal("1700000")),
+	EnrollmentPlan.Duration.ONE_YEAR: (0.1, 365, Decimal("3200000")),
+}
+
+TRANSPORT_MIX = {
+	TransportService.Type.FULL: 0.3,
+	TransportService.Type.MEDIUM: 0.3,
+	TransportService.Type.NO_SERVICE: 0.4,
+}
+
+# (breed, size), most popular first; weights follow a Zipf-like skew
+BREEDS = [
+	("Criollo", Canine.Size.MEDIUM),
+	("Labrador", Canine.Size.BIG),
+	("French Poodle", Canine.Size.SMALL),
+	("Golden Retriever", Canine.Size.BIG),
+	("Schnauzer", Canine.Size.SMALL),
+	("Pug", Canine.Size.SMALL),
+	("Beagle", Canine.Size.MEDIUM),
+	("Shih Tzu", Canine.Size.MINI),
+	("Border Collie", Canine.Size.MEDIUM),
+	("Pastor Alemán", Canine.Size.BIG),
+	("Chihuahua", Canine.Size.MINI),
+	("Yorkshire Terrier", Canine.Size.MINI),
+	("Bulldog Francés", Canine.Size.SMALL),
+	("Husky Siberiano", Canine.Size.BIG),
+	("Cocker Spaniel", Canine.Size.MEDIUM),
+]
+BREED_WEIGHTS = [1 / rank for rank in range(1, len(BREEDS) + 1)]
+
+FIRST_NAMES = ["Ana", "Luis", "María", "Carlos", "Laura", "Andrés", "Camila", "Juan", "Sofía"]
+LAST_NAMES = ["García", "Rodríguez", "López", "Martínez", "Gómez", "Díaz", "Torres", "Ramírez"]
+DOG_NAMES = ["Toby", "Luna", "Max", "Rocky", "Lola", "Simón", "Kira", "Bruno", "Nala", "Zeus"]
+
+RENEWAL_RATE = 0.6
+ADVANCE_WITHDRAWAL_RATE = 0.03
+SATURDAY = 5
+
+
+def batched(iterable, size):
+	iterator = iter(iterable)
+	while batch := list(islice(iterator, size)):
+		yield batch
+
+
+class Command(BaseCommand):
+	help = (
+		"Generate synthetic clients, canines, enrollments and daily attendance for load and "
+		"scale testing. Output is deterministic for a given --seed and --end-date."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("--clients", type=int, default=1000)
+		parser.add_argument("--max-canines", type=int, default=3, help="Maximum canines per client")
+		parser.add_argument("--years", type=float, default=2, help="Years of history")
+		parser.add_argument(
+			"--absence-rate", type=float, default=0.12, help="Probability of a school-day absence"
+		)
+		parser.add_argument("--seed", type=int, default=42)
+		parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=None)
+		parser.add_argument("--batch-size", type=int, default=5000)
+		parser.add_argument(
+			"--prefix", default="synthetic", help="Prefix for generated usernames and emails"
+		)
+		parser.add_argument(
+			"--password", default="synthetic-password", help="Password of every generated user"
+		)
+
+	def handle(self, *args, **options):
+		self.rng = random.Random(options["seed"])
+		self.batch_size = options["batch_size"]
+		self.end_date = options["end_date"] or timezone.now().date()
+		self.start_date = self.end_date - datetime.timedelta(days=int(options["years"] * 365))
+		prefix = options["prefix"]
+
+		if User.objects.filter(username__startswith=f"{prefix}_").exists():
+			raise CommandError(
+				f"Users prefixed with '{prefix}_' already exist; use another --prefix"
+			)
+
+		started = time.perf_counter()
+		plans = self._ensure_plans()
+		transports = self._ensure_transports()
+
+		users = self._create_users(options["clients"], prefix, options["password"])
+		clients = self._bulk(Client, (Client(user=user) for user in users))
+		canines = self._bulk(Canine, self._build_canines(clients, options["max_canines"]))
+		enrollments = self._bulk(Enrollment, self._build_enrollments(canines, plans, transports))
+		attendance_count = self._bulk_count(
+			Attendance, self._build_attendance(enrollments, options["absence_rate"])
+		)
+		# bulk_create skips the signals maintaining the counters and current enrollments
+		recount()
+		refresh_current_enrollments(date=self.end_date)
+		caching.bump(cohorts.ALL_COHORTS)
+		# The history may start before the calendar used by the time series reports
+		extend_calendar()
+
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"Created {len(users)} users/clients, {len(canines)} canines, "
+				f"{len(enrollments)} enrollments and {attendance_count} attendance rows "
+				f"in {time.perf_counter() - started:.1f}s"
+			)
+		)
+
+	def _bulk(self, model, objects):
+		"""bulk_create in batches, returning the created objects (with primary keys)"""
+		created = []
+		for batch in batched(objects, self.batch_size):
+			with transaction.atomic():
+				created.extend(model.objects.bulk_create(batch, batch_size=self.batch_size))
+		return created
+
+	def _bulk_count(self, model, objects):
+		"""bulk_create in batches without keeping the objects around"""
+		count = 0
+		for batch in batched(objects, self.batch_size):
+			with transaction.atomic():
+				model.objects.bulk_create(batch, batch_size=self.batch_size)
+			count += len(batch)
+			self.stdout.write(f"  {model._meta.verbose_name_plural}: {count}", ending="\r")
+		self.stdout.write("")
+		return count
+
+	def _ensure_plans(self):
+		plans = {}
+		for duration, (_weight, days, price) in PLAN_MIX.items():
+			plan = EnrollmentPlan.objects.filter(duration=duration, active=True).first()
+			if plan is None:
+				plan = EnrollmentPlan.objects.create(
+					name=f"Plan {duration.label}", duration=duration, price=price
+				)
+			plans[duration] = (plan, days)
+		return plans
+
+	def _ensure_transports(self):
+		return {
+			service_type: TransportService.objects.get_or_create(type=service_type)[0]
+			for service_type in TRANSPORT_MIX
+		}
+
+	def _create_users(self, count, prefix, password):
+		# Hashing is deliberately slow, so every synthetic user shares one hash
+		password_hash = make_password(password)
+		rng = self.rng
+		days = (self.end_date - self.start_date).days
+
+		def build():
+			for i in range(count):
+				yield User(
+					username=f"{prefix}_{i}",
+					email=f"{prefix}_{i}@example.com",
+					password=password_hash,
+					first_name=rng.choice(FIRST_NAMES),
+					last_name=rng.choice(LAST_NAMES),
+					phone_number=f"3{rng.randrange(10**9):09d}",
+					document_id=f"{prefix}-{i}",
+					registration_date=self.start_date + datetime.timedelta(rng.randrange(days)),
+				)
+
+		return self._bulk(User, build())
+
+	def _build_canines(self, clients, max_canines):
+		rng = self.rng
+		for client in clients:
+			# Most clients own a single dog
+			owned = min(max_canines, 1 + int(rng.expovariate(2.0)))
+			for _ in range(owned):
+				breed, size = rng.choices(BREEDS, weights=BREED_WEIGHTS)[0]
+				yield Canine(
+					client=client,
+					name=rng.choice(DOG_NAMES),
+					breed=breed,
+					age=rng.randint(1, 14),
+					size=size,
+				)
+
+	def _build_enrollments(self, canines, plans, transports):
+		rng = self.rng
+		durations = list(PLAN_MIX)
+		plan_weights = [PLAN_MIX[duration][0] for duration in durations]
+		transport_types = list(TRANSPORT_MIX)
+		transport_weights = list(TRANSPORT_MIX.values())
+		history_days = (self.end_date - self.start_date).days
+
+		for canine in canines:
+			transport = transports[rng.choices(transport_types, weights=transport_weights)[0]]
+			start = self.start_date + datetime.timedelta(rng.randrange(history_days))
+			while start <= self.end_date:
+				plan, days = plans[rng.choices(durations, weights=plan_weights)[0]]
+				expiration = start + datetime.timedelta(days=days)
+				yield Enrollment(
+					canine=canine,
+					plan=plan,
+					price_paid=plan.price,
+					transport_service=transport,
+					enrollment_date=start,
+					expiration_date=expiration,
+					status=expiration >= self.end_date,
+				)
+				if rng.random() > RENEWAL_RATE:
+					break
+				# The expiration day is still covered, so renewals start the day after at the
+				# earliest; some owners renew a few days late
+				start = expiration + datetime.timedelta(days=1 + rng.choice((0, 0, 0, 1, 3, 7)))
+
+	def _build_attendance(self, enrollments, absence_rate):
+		rng = self.rng
+		one_day = datetime.timedelta(days=1)
+		for enrollment in enrollments:
+			day = enrollment.enrollment_date
+			last_day = min(enrollment.expiration_date, self.end_date)
+			while day <= last_day:
+				if day.weekday() < SATURDAY:
+					yield self._attendance_for(enrollment, day, rng, absence_rate)
+				day += one_day
+
+	def _attendance_for(self, enrollment, day, rng, absence_rate):
+		if rng.random() < absence_rate:
+			return Attendance(enrollment=enrollment, date=day, status=Attendance.Status.ABSENT)
+
+		arrival = datetime.time(7 + rng.randrange(3), rng.randrange(60))
+		if day == self.end_date:
+			return Attendance(
+				enrollment=enrollment,
+				date=day,
+				arrival_time=arrival,
+				status=Attendance.Status.PRESENT,
+			)
+		if rng.random() < ADVANCE_WITHDRAWAL_RATE:
+			return Attendance(
+				enrollment=enrollment,
+				date=day,
+				arrival_time=arrival,
+				departure_time=datetime.time(11 + rng.randrange(3), rng.randrange(60)),
+				status=Attendance.Status.ADVANCE_WITHDRAWAL,
+				withdrawal_reason="Retiro anticipado por el propietario",
+			)
+		return Attendance(
+			enrollment=enrollment,
+			date=day,
+			arrival_time=arrival,
+			departure_time=datetime.time(15 + rng.randrange(3), rng.randrange(60)),
+			status=Attendance.Status.DISPATCHED,
+		)
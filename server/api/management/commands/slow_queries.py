@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+
+from api.models import User
+from api.slow_queries import slow_query_log
+
+
+class Command(BaseCommand):
+	help = (
+		"Run GET requests in-process and print the slow queries they issue, together "
+		"with their EXPLAIN plans. Useful to reproduce the plan of a slow report locally."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("paths", nargs="+", help="API paths to request, e.g. /api/canines/")
+		parser.add_argument(
+			"--threshold",
+			type=float,
+			default=0,
+			help="Record queries slower than this many milliseconds (default: every query)",
+		)
+		parser.add_argument(
+			"--analyze",
+			action="store_true",
+			help="Capture EXPLAIN ANALYZE of SELECT statements where supported",
+		)
+		parser.add_argument("--user", help="Username to authenticate the requests as")
+		parser.add_argument("--json", action="store_true", help="Print the log as JSON")
+
+	def handle(self, *args, **options):
+		client = TestClient(HTTP_HOST="localhost")
+		if options["user"]:
+			try:
+				client.force_login(User.objects.get(username=options["user"]))
+			except User.DoesNotExist as e:
+				raise CommandError(f"User '{options['user']}' does not exist") from e
+
+		slow_query_log.clear()
+		with override_settings(
+			SLOW_QUERY_THRESHOLD_MS=options["threshold"],
+			SLOW_QUERY_EXPLAIN_ANALYZE=options["analyze"],
+		):
+			for path in options["paths"]:
+				response = client.get(path)
+				self.stdout.write(f"GET {path} -> {response.status_code}")
+			slow_query_log.wait()
+
+		entries = slow_query_log.snapshot()
+		if options["json"]:
+			self.stdout.write(json.dumps(entries, indent=2))
+			return
+
+		for entry in reversed(entries):
+			self.stdout.write(self.style.WARNING(f"\n[{entry['duration_ms']} ms] {entry['view']}"))
+			self.stdout.write(entry["sql"])
+			self.stdout.write(f"params: {entry['params']}")
+			self.stdout.write(entry["plan"] or "(no plan captured)")
@@ -0,0 +1,26 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from api.roster import summarize, warm_roster
+
+
+class Command(BaseCommand):
+	help = (
+		"Build the daily roster (expected canines and their attendance) into the cache. "
+		"Only useful with a cache shared by the server processes."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--date", type=datetime.date.fromisoformat, help="Roster date (default: today)"
+		)
+
+	def handle(self, *args, **options):
+		rows = warm_roster(options["date"])
+		summary = summarize(rows)
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"Roster cached: {summary['expected']} expected, {summary['pending']} pending"
+			)
+		)
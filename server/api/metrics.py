@@ -0,0 +1,278 @@
+"""
+In-process metrics registry exported in the Prometheus text format.
+
+Each worker process keeps its own counters and histograms. When several workers
+serve the API (e.g. gunicorn), set ``METRICS_MULTIPROCESS_DIR`` to a directory
+shared by all of them: every worker periodically writes its values there and the
+``/api/metrics/`` endpoint merges the files of all workers before rendering.
+
+Worker files are named after the process id and start time, so a recycled pid
+never overwrites the totals of a dead worker. On exit a worker folds its values
+into ``metrics-archive.json`` and removes its file, keeping the summed counters
+monotonic while the directory stays bounded.
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+ARCHIVE_FILE = "metrics-archive.json"
+LOCK_FILE = "metrics.lock"
+
+
+def _escape(value):
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labels, extra=None):
+	pairs = list(zip(labelnames, labels, strict=True))
+	if extra:
+		pairs.append(extra)
+	if not pairs:
+		return ""
+	return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+	type = "counter"
+
+	def __init__(self, name, documentation, labelnames=()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self.values = {}
+
+	def inc(self, amount=1, **labels):
+		key = tuple(str(labels[name]) for name in self.labelnames)
+		self.values[key] = self.values.get(key, 0) + amount
+
+	def dump(self, values=None):
+		values = self.values if values is None else values
+		return [[list(key), value] for key, value in values.items()]
+
+	def merge(self, dumped, into):
+		for key, value in dumped:
+			into[tuple(key)] = into.get(tuple(key), 0) + value
+
+	def render(self, values):
+		for key, value in sorted(values.items()):
+			yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+	type = "histogram"
+
+	def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(buckets)
+		self.values = {}
+
+	def observe(self, value, **labels):
+		key = tuple(str(labels[name]) for name in self.labelnames)
+		state = self.values.get(key)
+		if state is None:
+			# Per-bucket (non cumulative) counts, +Inf bucket last, then sum
+			state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+		state[0][bisect_left(self.buckets, value)] += 1
+		state[1] += value
+
+	def dump(self, values=None):
+		values = self.values if values is None else values
+		return [[list(key), counts, total] for key, (counts, total) in values.items()]
+
+	def merge(self, dumped, into):
+		for key, counts, total in dumped:
+			state = into.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+			state[0] = [a + b for a, b in zip(state[0], counts, strict=True)]
+			state[1] += total
+
+	def render(self, values):
+		for key, (counts, total) in sorted(values.items()):
+			cumulative = 0
+			for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+				cumulative += count
+				labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+				yield f"{self.name}_bucket{labels} {cumulative}"
+			labels = _format_labels(self.labelnames, key)
+			yield f"{self.name}_sum{labels} {_format_value(total)}"
+			yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+	"""Collection of metrics that can be dumped, merged across processes and rendered"""
+
+	def __init__(self):
+		self.metrics = {}
+		self.lock = threading.Lock()
+		self._last_flush = 0.0
+		self._pid = None
+		self._started = None
+
+	def counter(self, name, documentation, labelnames=()):
+		return self._register(Counter(name, documentation, labelnames))
+
+	def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+		return self._register(Histogram(name, documentation, labelnames, buckets))
+
+	def _register(self, metric):
+		self.metrics[metric.name] = metric
+		return metric
+
+	def dump(self):
+		with self.lock:
+			return {name: metric.dump() for name, metric in self.metrics.items()}
+
+	def merge(self, dumps):
+		"""Sum dumps of several workers into ``{name: values}``"""
+		merged = {name: {} for name in self.metrics}
+		for dumped in dumps:
+			for name, values in dumped.items():
+				if name in self.metrics:
+					self.metrics[name].merge(values, merged[name])
+		return merged
+
+	def render(self):
+		"""Render the metrics of every worker in the Prometheus text exposition format"""
+		merged = self.merge(self._collect())
+		lines = []
+		for name, metric in self.metrics.items():
+			lines.extend((f"# HELP {name} {metric.documentation}", f"# TYPE {name} {metric.type}"))
+			lines.extend(metric.render(merged[name]))
+		return "\n".join(lines) + "\n"
+
+	def _collect(self):
+		directory = _multiprocess_dir()
+		if directory is None:
+			return [self.dump()]
+		self.flush(force=True)
+		dumps = []
+		# Shared lock: a worker archiving its file must not be counted twice
+		with _locked(directory, shared=True):
+			for path in directory.glob("metrics-*.json"):
+				try:
+					dumps.append(json.loads(path.read_text()))
+				except (OSError, ValueError):
+					# File being replaced by its worker or from an incompatible version
+					continue
+		return dumps
+
+	def _worker_file(self, directory):
+		pid = os.getpid()
+		if pid != self._pid:
+			# First flush of this process (workers forked from a preloaded master too)
+			self._pid, self._started = pid, time.time_ns()
+			atexit.register(self.archive)
+		return directory / f"metrics-{self._pid}-{self._started}.json"
+
+	def flush(self, force=False):
+		"""Write this worker's values to the shared directory (at most every few seconds)"""
+		directory = _multiprocess_dir()
+		if directory is None:
+			return
+		now = time.monotonic()
+		interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+		if not force and now - self._last_flush < interval:
+			return
+		self._last_flush = now
+		directory.mkdir(parents=True, exist_ok=True)
+		target = self._worker_file(directory)
+		tmp = target.with_suffix(".tmp")
+		tmp.write_text(json.dumps(self.dump()))
+		tmp.replace(target)
+
+	def archive(self):
+		"""Fold this worker's values into the archive file and remove its own file"""
+		directory = _multiprocess_dir()
+		if directory is None or self._pid != os.getpid():
+			return
+		target = self._worker_file(directory)
+		archive = directory / ARCHIVE_FILE
+		with _locked(directory):
+			dumps = [self.dump()]
+			with contextlib.suppress(OSError, ValueError):
+				dumps.append(json.loads(archive.read_text()))
+			merged = self.merge(dumps)
+			dumped = {name: self.metrics[name].dump(values) for name, values in merged.items()}
+			tmp = archive.with_suffix(".tmp")
+			tmp.write_text(json.dumps(dumped))
+			tmp.replace(archive)
+			target.unlink(missing_ok=True)
+
+
+def _multiprocess_dir():
+	directory = getattr(settings, "METRICS_MULTIPROCESS_DIR", None)
+	return Path(directory) if directory else None
+
+
+@contextlib.contextmanager
+def _locked(directory, shared=False):
+	"""Advisory lock of the shared directory between the workers"""
+	# Unix only, like the multi-worker servers this mode is for
+	import fcntl
+
+	directory.mkdir(parents=True, exist_ok=True)
+	with (directory / LOCK_FILE).open("a") as lock:
+		fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+	"http_request_duration_seconds",
+	"Request latency by resolved URL name and method.",
+	("view", "method"),
+)
+responses = registry.counter(
+	"http_responses_total", "Responses by resolved URL name and status code.", ("view", "status")
+)
+db_queries = registry.histogram(
+	"db_queries_per_request",
+	"Number of SQL queries issued per request.",
+	("view",),
+	buckets=QUERY_COUNT_BUCKETS,
+)
+cache_requests = registry.counter(
+	"cache_requests_total",
+	"Application cache lookups by cache name and result.",
+	("cache", "result"),
+)
+check_ins = registry.counter("attendance_check_ins_total", "Canine check-ins registered.")
+
+
+def observe_request(view_name, method, status_code, duration, query_count):
+	with registry.lock:
+		request_latency.observe(duration, view=view_name, method=method)
+		responses.inc(view=view_name, status=status_code)
+		db_queries.observe(query_count, view=view_name)
+	registry.flush()
+
+
+def record_cache(cache_name, hit):
+	with registry.lock:
+		cache_requests.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+def record_check_in():
+	with registry.lock:
+		check_ins.inc()
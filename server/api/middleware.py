@@ -0,0 +1,128 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+from .profiling import QueryTimer, RequestProfile, activate
+from .slow_queries import SlowQueryRecorder
+
+profiling_logger = logging.getLogger("api.profiling")
+
+
+class RequestProfilingMiddleware:
+	"""
+	Record SQL query count/time, view time and render time for each request.
+
+	Profiling runs for every request when ``REQUEST_PROFILING_ENABLED`` is set, or
+	for a single request when staff users send the ``REQUEST_PROFILING_HEADER``
+	header. Results are emitted as a ``Server-Timing`` header (visible in the
+	browser devtools) and as one structured log line on the ``api.profiling`` logger.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		enabled = getattr(settings, "REQUEST_PROFILING_ENABLED", False)
+		requested = self._requested(request)
+		if not enabled and not requested:
+			return self.get_response(request)
+
+		profile = RequestProfile()
+		request._profile = profile
+		with activate(profile), connection.execute_wrapper(profile.queries):
+			response = self.get_response(request)
+		finished = time.perf_counter()
+
+		# DRF authenticates inside the view (JWT), so the user is only known now
+		user = getattr(request, "user", None)
+		if not enabled and not (user is not None and user.is_staff):
+			return response
+
+		phases = profile.phases(finished)
+		response["Server-Timing"] = self._server_timing(phases, profile.queries.count)
+		profiling_logger.info(json.dumps(self._log_record(request, response, phases, profile)))
+		return response
+
+	def process_view(self, request, view_func, view_args, view_kwargs):
+		profile = getattr(request, "_profile", None)
+		if profile is not None:
+			profile.view_started = time.perf_counter()
+
+	def process_template_response(self, request, response):
+		profile = getattr(request, "_profile", None)
+		if profile is not None:
+			profile.view_finished = time.perf_counter()
+
+			def _rendered(_response):
+				profile.render_finished = time.perf_counter()
+
+			response.add_post_render_callback(_rendered)
+		return response
+
+	def _requested(self, request):
+		header = getattr(settings, "REQUEST_PROFILING_HEADER", "X-Profile")
+		return request.headers.get(header, "").lower() in {"1", "true"}
+
+	def _server_timing(self, phases, query_count):
+		entries = []
+		for name, seconds in phases.items():
+			description = f';desc="{query_count} queries"' if name == "db" else ""
+			entries.append(f"{name};dur={seconds * 1000:.2f}{description}")
+		return ", ".join(entries)
+
+	def _log_record(self, request, response, phases, profile):
+		resolver_match = getattr(request, "resolver_match", None)
+		user = getattr(request, "user", None)
+		return {
+			"method": request.method,
+			"path": request.path,
+			"view": resolver_match.view_name if resolver_match else None,
+			"status": response.status_code,
+			"user_id": user.pk if user is not None and user.is_authenticated else None,
+			"db_queries": profile.queries.count,
+			**{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in phases.items()},
+		}
+
+
+class SlowQueryLogMiddleware:
+	"""
+	Record queries slower than ``SLOW_QUERY_THRESHOLD_MS`` (with the view that ran
+	them) in the slow query log. Disabled when the threshold is ``None``.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		if getattr(settings, "SLOW_QUERY_THRESHOLD_MS", None) is None:
+			return self.get_response(request)
+		with connection.execute_wrapper(SlowQueryRecorder(request)):
+			return self.get_response(request)
+
+
+class MetricsMiddleware:
+	"""
+	Observe latency, status code and query count of every request, labelled with
+	the name of the URL pattern it resolved to (e.g. ``enrollment-report-by-plan``).
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		queries = QueryTimer()
+		start = time.perf_counter()
+		with connection.execute_wrapper(queries):
+			response = self.get_response(request)
+		duration = time.perf_counter() - start
+
+		resolver_match = getattr(request, "resolver_match", None)
+		view_name = resolver_match.view_name if resolver_match else "<unresolved>"
+		metrics.observe_request(
+			view_name, request.method, response.status_code, duration, queries.count
+		)
+		return response
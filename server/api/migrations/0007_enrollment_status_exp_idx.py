@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0006_alter_user_document_id"),
+	]
+
+	operations = [
+		migrations.AddIndex(
+			model_name="enrollment",
+			index=models.Index(
+				fields=["status", "expiration_date"], name="enrollment_status_exp_idx"
+			),
+		),
+	]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:30
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_enrollments(apps, schema_editor):
+	Enrollment = apps.get_model("api", "Enrollment")
+	for model_name, fk in (("EnrollmentPlan", "plan_id"), ("TransportService", "transport_service_id")):
+		model = apps.get_model("api", model_name)
+		counts = Enrollment.objects.values(fk).annotate(
+			total=Count("id"), active=Count("id", filter=Q(status=True))
+		)
+		for row in counts.order_by():
+			model.objects.filter(pk=row[fk]).update(
+				total_enrollments=row["total"],
+				active_enrollments=row["active"],
+				inactive_enrollments=row["total"] - row["active"],
+			)
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0007_enrollment_status_exp_idx"),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name="enrollmentplan",
+			name="active_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name="enrollmentplan",
+			name="inactive_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name="enrollmentplan",
+			name="total_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name="transportservice",
+			name="active_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name="transportservice",
+			name="inactive_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name="transportservice",
+			name="total_enrollments",
+			field=models.IntegerField(default=0, editable=False),
+		),
+		migrations.RunPython(count_enrollments, migrations.RunPython.noop),
+	]
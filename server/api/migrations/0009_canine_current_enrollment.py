@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def point_current_enrollments(apps, schema_editor):
+	Canine = apps.get_model("api", "Canine")
+	Enrollment = apps.get_model("api", "Enrollment")
+	today = timezone.now().date()
+	Canine.objects.update(
+		current_enrollment=Subquery(
+			Enrollment.objects.filter(
+				canine=OuterRef("pk"),
+				status=True,
+				enrollment_date__lte=today,
+				expiration_date__gte=today,
+			)
+			.order_by("-expiration_date", "-pk")
+			.values("pk")[:1]
+		)
+	)
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0008_enrollment_counters"),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name="canine",
+			name="current_enrollment",
+			field=models.ForeignKey(
+				blank=True,
+				editable=False,
+				null=True,
+				on_delete=django.db.models.deletion.SET_NULL,
+				related_name="+",
+				to="api.enrollment",
+			),
+		),
+		migrations.RunPython(point_current_enrollments, migrations.RunPython.noop),
+	]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:30
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+	"""Rows never changed since creation: use their creation timestamp where there is one"""
+	apps.get_model("api", "Canine").objects.update(updated_at=F("creation_date"))
+	apps.get_model("api", "Enrollment").objects.update(updated_at=F("creation_date"))
+	apps.get_model("api", "User").objects.update(updated_at=F("date_joined"))
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0009_canine_current_enrollment"),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name="attendance",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="canine",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="client",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="enrollment",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="internaluser",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="user",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+	]
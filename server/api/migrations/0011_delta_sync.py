@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0010_updated_at"),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name="Tombstone",
+			fields=[
+				(
+					"id",
+					models.BigAutoField(
+						auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+					),
+				),
+				("model", models.CharField(max_length=50)),
+				("object_id", models.BigIntegerField()),
+				("deleted_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+			],
+			options={
+				"verbose_name": "tombstone",
+				"verbose_name_plural": "tombstones",
+				"indexes": [models.Index(fields=["model", "id"], name="tombstone_model_idx")],
+			},
+		),
+		migrations.AddIndex(
+			model_name="canine",
+			index=models.Index(fields=["updated_at", "id"], name="canine_updated_idx"),
+		),
+		migrations.AddIndex(
+			model_name="enrollment",
+			index=models.Index(fields=["updated_at", "id"], name="enrollment_updated_idx"),
+		),
+		migrations.AddIndex(
+			model_name="attendance",
+			index=models.Index(fields=["updated_at", "id"], name="attendance_updated_idx"),
+		),
+	]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def snapshot_prices(apps, schema_editor):
+	Enrollment = apps.get_model("api", "Enrollment")
+	EnrollmentPlan = apps.get_model("api", "EnrollmentPlan")
+	# The price history is gone: existing enrollments get the current plan price
+	Enrollment.objects.update(
+		price_paid=Subquery(EnrollmentPlan.objects.filter(pk=OuterRef("plan_id")).values("price"))
+	)
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0011_delta_sync"),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name="enrollment",
+			name="price_paid",
+			field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+		),
+		migrations.RunPython(snapshot_prices, migrations.RunPython.noop),
+		migrations.AlterField(
+			model_name="enrollment",
+			name="price_paid",
+			field=models.DecimalField(blank=True, decimal_places=2, max_digits=10),
+		),
+		migrations.AddIndex(
+			model_name="enrollment",
+			index=models.Index(
+				fields=["enrollment_date", "status", "price_paid"], name="enrollment_income_idx"
+			),
+		),
+	]
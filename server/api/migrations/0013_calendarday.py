@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def fill_calendar(apps, schema_editor):
+	from api.calendar_days import BATCH_SIZE, calendar_days, calendar_range
+
+	CalendarDay = apps.get_model("api", "CalendarDay")
+	Enrollment = apps.get_model("api", "Enrollment")
+	Attendance = apps.get_model("api", "Attendance")
+	# Same range as calendar_days.default_range(), but queried through the historical
+	# models: the current ones may not match the schema at this point
+	start, end = calendar_range(
+		timezone.localdate(),
+		Enrollment.objects.aggregate(first=Min("enrollment_date"))["first"],
+		Attendance.objects.aggregate(first=Min("date"))["first"],
+	)
+	CalendarDay.objects.bulk_create(
+		[CalendarDay(**fields) for fields in calendar_days(start, end)], batch_size=BATCH_SIZE
+	)
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0012_enrollment_price_paid"),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name="CalendarDay",
+			fields=[
+				("date", models.DateField(primary_key=True, serialize=False)),
+				("year", models.SmallIntegerField()),
+				("month", models.SmallIntegerField()),
+				("day", models.SmallIntegerField()),
+				("weekday", models.SmallIntegerField()),
+				("week", models.SmallIntegerField()),
+				("is_weekend", models.BooleanField()),
+				("is_holiday", models.BooleanField(default=False)),
+				("holiday", models.CharField(blank=True, max_length=100)),
+			],
+			options={
+				"verbose_name": "calendar day",
+				"verbose_name_plural": "calendar days",
+				"ordering": ["date"],
+			},
+		),
+		# Joins on the date fields, without columns
+		migrations.SeparateDatabaseAndState(
+			state_operations=[
+				migrations.AddField(
+					model_name="enrollment",
+					name="enrollment_day",
+					field=models.ForeignObject(
+						from_fields=["enrollment_date"],
+						null=True,
+						on_delete=django.db.models.deletion.DO_NOTHING,
+						related_name="+",
+						to="api.calendarday",
+						to_fields=["date"],
+					),
+				),
+				migrations.AddField(
+					model_name="attendance",
+					name="calendar_day",
+					field=models.ForeignObject(
+						from_fields=["date"],
+						null=True,
+						on_delete=django.db.models.deletion.DO_NOTHING,
+						related_name="+",
+						to="api.calendarday",
+						to_fields=["date"],
+					),
+				),
+			],
+		),
+		migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+	]
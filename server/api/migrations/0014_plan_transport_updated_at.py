@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		("api", "0013_calendarday"),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name="enrollmentplan",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+		migrations.AddField(
+			model_name="transportservice",
+			name="updated_at",
+			field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+			preserve_default=False,
+		),
+	]
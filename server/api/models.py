@@ -17,6 +17,7 @@ class User(AbstractUser):
 	status = models.BooleanField(default=True)  # Active/Inactive
 	document_id = models.CharField(max_length=50, unique=True, blank=True, null=True)
 	registration_date = models.DateField(default=get_default_registration_date)
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		verbose_name = _("user")
@@ -53,6 +54,8 @@ class InternalUser(models.Model):
 
 	photo = models.ImageField(upload_to="internal_profile_photos/", blank=True, null=True)
 
+	updated_at = models.DateTimeField(auto_now=True)
+
 	def __str__(self):
 		return f"{self.user.username} ({self.get_role_display()})"
 
@@ -65,6 +68,7 @@ class Client(models.Model):
 	"""Client/Owner model"""
 
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="client_profile")
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		verbose_name = _("client")
@@ -92,17 +96,42 @@ class Canine(models.Model):
 	photo = models.ImageField(upload_to="canines/", blank=True, null=True)
 	creation_date = models.DateTimeField(auto_now_add=True)
 	status = models.BooleanField(default=True)
+	updated_at = models.DateTimeField(auto_now=True)
+	# Active enrollment covering today, maintained by api.current_enrollment
+	current_enrollment = models.ForeignKey(
+		"Enrollment",
+		on_delete=models.SET_NULL,
+		related_name="+",
+		blank=True,
+		null=True,
+		editable=False,
+	)
 
 	class Meta:
 		verbose_name = _("canine")
 		verbose_name_plural = _("canines")
 		ordering = ["name"]
+		indexes = [models.Index(fields=["updated_at", "id"], name="canine_updated_idx")]
 
 	def __str__(self):
 		return f"{self.name} ({self.breed})"
 
 
-class EnrollmentPlan(models.Model):
+class EnrollmentCounters(models.Model):
+	"""
+	Enrollment counters maintained by the Enrollment signals (see ``api.counters``).
+	``manage.py recount`` repairs them if they ever drift.
+	"""
+
+	total_enrollments = models.IntegerField(default=0, editable=False)
+	active_enrollments = models.IntegerField(default=0, editable=False)
+	inactive_enrollments = models.IntegerField(default=0, editable=False)
+
+	class Meta:
+		abstract = True
+
+
+class EnrollmentPlan(EnrollmentCounters):
 	"""Enrollment plan model"""
 
 	class Duration(models.TextChoices):
@@ -116,6 +145,7 @@ class EnrollmentPlan(models.Model):
 	duration = models.CharField(max_length=20, choices=Duration.choices)
 	price = models.DecimalField(max_digits=10, decimal_places=2)
 	active = models.BooleanField(default=True)
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		verbose_name = _("enrollment plan")
@@ -125,7 +155,7 @@ class EnrollmentPlan(models.Model):
 		return f"{self.name} - {self.get_duration_display()}"
 
 
-class TransportService(models.Model):
+class TransportService(EnrollmentCounters):
 	"""Transport service model"""
 
 	class Type(models.TextChoices):
@@ -134,6 +164,7 @@ class TransportService(models.Model):
 		NO_SERVICE = "no_service", _("No servicio")
 
 	type = models.CharField(max_length=20, choices=Type.choices)
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		verbose_name = _("transport service")
@@ -154,16 +185,60 @@ class Enrollment(models.Model):
 	enrollment_date = models.DateField()
 	expiration_date = models.DateField()
 	status = models.BooleanField(default=True)  # Active/Inactive
+	# Plan price when the enrollment was made (filled in by save() when left empty),
+	# so income doesn't change with later plan price edits
+	price_paid = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
 	creation_date = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+	# Calendar attributes of the enrollment date (a join on the date, no column)
+	enrollment_day = models.ForeignObject(
+		"CalendarDay",
+		on_delete=models.DO_NOTHING,
+		from_fields=["enrollment_date"],
+		to_fields=["date"],
+		related_name="+",
+		null=True,
+	)
 
 	class Meta:
 		verbose_name = _("enrollment")
 		verbose_name_plural = _("enrollments")
 		ordering = ["-creation_date"]
+		indexes = [
+			# Expiring/expired enrollment lookups (renewal queue, expiration sweep)
+			models.Index(fields=["status", "expiration_date"], name="enrollment_status_exp_idx"),
+			# Delta sync (api.sync)
+			models.Index(fields=["updated_at", "id"], name="enrollment_updated_idx"),
+			# Income reports: covers their date range, status filter and sum
+			models.Index(
+				fields=["enrollment_date", "status", "price_paid"], name="enrollment_income_idx"
+			),
+		]
 
 	def __str__(self):
 		return f"Enrollment of {self.canine.name} - {self.plan.name}"
 
+	def save(self, *args, **kwargs):
+		if self.price_paid is None:
+			self.price_paid = self.plan.price
+		super().save(*args, **kwargs)
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance.track_counted_state()
+		return instance
+
+	def counted_state(self):
+		"""The values the plan/transport counters depend on, None if any is deferred"""
+		fields = ("plan_id", "transport_service_id", "status")
+		if any(field not in self.__dict__ for field in fields):
+			return None
+		return (self.plan_id, self.transport_service_id, self.status)
+
+	def track_counted_state(self):
+		self._counted_state = self.counted_state()
+
 
 class Attendance(models.Model):
 	"""Attendance tracking model"""
@@ -180,12 +255,64 @@ class Attendance(models.Model):
 	status = models.CharField(max_length=20, choices=Status.choices, default=Status.PRESENT)
 	departure_time = models.TimeField(blank=True, null=True)
 	withdrawal_reason = models.TextField(blank=True)
+	updated_at = models.DateTimeField(auto_now=True)
+	# Calendar attributes of the day (a join on the date, no column)
+	calendar_day = models.ForeignObject(
+		"CalendarDay",
+		on_delete=models.DO_NOTHING,
+		from_fields=["date"],
+		to_fields=["date"],
+		related_name="+",
+		null=True,
+	)
 
 	class Meta:
 		verbose_name = _("attendance")
 		verbose_name_plural = _("attendances")
 		ordering = ["-date", "-arrival_time"]
 		unique_together = ["enrollment_id", "date"]
+		indexes = [models.Index(fields=["updated_at", "id"], name="attendance_updated_idx")]
 
 	def __str__(self):
 		return f"Attendance - {self.enrollment.canine.name} - {self.date}"
+
+
+class CalendarDay(models.Model):
+	"""
+	Calendar dimension: one row per day with precomputed attributes, used to group
+	by weekday or holiday and to gap-fill time series (see ``api.calendar_days``).
+	"""
+
+	date = models.DateField(primary_key=True)
+	year = models.SmallIntegerField()
+	month = models.SmallIntegerField()
+	day = models.SmallIntegerField()
+	weekday = models.SmallIntegerField()  # ISO: 1 = Monday ... 7 = Sunday
+	week = models.SmallIntegerField()  # ISO week number
+	is_weekend = models.BooleanField()
+	is_holiday = models.BooleanField(default=False)
+	holiday = models.CharField(max_length=100, blank=True)
+
+	class Meta:
+		verbose_name = _("calendar day")
+		verbose_name_plural = _("calendar days")
+		ordering = ["date"]
+
+	def __str__(self):
+		return str(self.date)
+
+
+class Tombstone(models.Model):
+	"""Record of a deleted row, so delta sync clients can drop it (see api.sync)"""
+
+	model = models.CharField(max_length=50)
+	object_id = models.BigIntegerField()
+	deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+	class Meta:
+		verbose_name = _("tombstone")
+		verbose_name_plural = _("tombstones")
+		indexes = [models.Index(fields=["model", "id"], name="tombstone_model_idx")]
+
+	def __str__(self):
+		return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,66 @@
+import base64
+import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ExpirationKeysetPagination:
+	"""
+	Keyset pagination over ``(expiration_date, id)``.
+
+	The cursor encodes the last row of the previous page, so every page is an index
+	range scan starting right after it, however deep the client is in the queue.
+	Unlike offset pagination, rows renewed or deactivated meanwhile don't shift pages.
+	"""
+
+	cursor_query_param = "cursor"
+	page_size_query_param = "page_size"
+	page_size = 50
+	max_page_size = 200
+
+	def paginate_queryset(self, queryset, request):
+		self.request = request
+		self.page_size = self.get_page_size(request)
+		queryset = queryset.order_by("expiration_date", "id")
+		cursor = request.query_params.get(self.cursor_query_param)
+		if cursor:
+			date, pk = self.decode_cursor(cursor)
+			# The redundant lower bound keeps the predicate usable as an index range
+			queryset = queryset.filter(expiration_date__gte=date).filter(
+				Q(expiration_date__gt=date) | Q(id__gt=pk)
+			)
+		# One extra row tells whether there is a next page
+		rows = list(queryset[: self.page_size + 1])
+		self.has_next = len(rows) > self.page_size
+		self.page = rows[: self.page_size]
+		return self.page
+
+	def get_page_size(self, request):
+		try:
+			size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+		except ValueError:
+			return self.page_size
+		return min(max(size, 1), self.max_page_size)
+
+	def encode_cursor(self, row):
+		raw = f"{row.expiration_date.isoformat()}|{row.pk}"
+		return base64.urlsafe_b64encode(raw.encode()).decode()
+
+	def decode_cursor(self, cursor):
+		try:
+			date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+			return datetime.date.fromisoformat(date), int(pk)
+		except ValueError as e:
+			raise ValidationError({"cursor": "Invalid cursor"}) from e
+
+	def get_next_link(self):
+		if not self.has_next:
+			return None
+		url = self.request.build_absolute_uri()
+		return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+	def get_paginated_response(self, data):
+		return Response({"next": self.get_next_link(), "results": data})
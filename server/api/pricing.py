@@ -0,0 +1,241 @@
+"""
+Plan pricing what-if simulator.
+
+The enrollment history is loaded once into compact NumPy arrays, one entry per
+(plan, enrollment month, canine size, transport) with its number of enrollments,
+and kept in process memory until the enrollments or canines change (checked
+against their cache namespace versions on every use).
+
+A simulation turns the (filtered) history into a plans x months demand matrix and
+projects the income of every scenario with one matrix product: scenario prices
+(scenarios x plans) @ demand (plans x months). Demand is historical. An optional
+price ``elasticity`` scales each plan's demand by ``(new / current) ** -elasticity``.
+Income is booked in the month the enrollment starts, like the cash income report.
+"""
+
+import datetime
+import threading
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from . import caching
+from .models import Canine, Enrollment, EnrollmentPlan, TransportService
+
+NAMESPACES = ["enrollments", "canines"]
+MAX_SCENARIOS = 500
+MAX_ELASTICITY = 10
+SIZES = Canine.Size.values
+TRANSPORTS = TransportService.Type.values
+
+
+class PricingError(ValueError):
+	pass
+
+
+class DemandHistory:
+	"""Enrollment counts per plan, month, size and transport as parallel arrays"""
+
+	def __init__(self, rows):
+		plan_ids = sorted({row["plan_id"] for row in rows})
+		month_numbers = np.fromiter(
+			(row["month"].year * 12 + row["month"].month - 1 for row in rows), np.int32, len(rows)
+		)
+		self.first_month = int(month_numbers.min()) if rows else 0
+		self.month_count = int(month_numbers.max()) - self.first_month + 1 if rows else 0
+		self.plan_ids = np.array(plan_ids, dtype=np.int64)
+		plan_index = {plan_id: index for index, plan_id in enumerate(plan_ids)}
+		self.plans = np.fromiter((plan_index[row["plan_id"]] for row in rows), np.int16, len(rows))
+		self.months = (month_numbers - self.first_month).astype(np.int16)
+		self.sizes = np.fromiter((SIZES.index(row["size"]) for row in rows), np.int8, len(rows))
+		self.transports = np.fromiter(
+			(TRANSPORTS.index(row["transport"]) for row in rows), np.int8, len(rows)
+		)
+		self.counts = np.fromiter((row["count"] for row in rows), np.int32, len(rows))
+
+	def month_label(self, index):
+		year, month = divmod(self.first_month + index, 12)
+		return f"{year:04d}-{month + 1:02d}"
+
+	def month_index(self, value):
+		return value.year * 12 + value.month - 1 - self.first_month
+
+	def demand(self, sizes=None, transports=None):
+		"""Enrollments per plan (rows, in ``plan_ids`` order) and month (columns)"""
+		selected = np.ones(len(self.counts), dtype=bool)
+		if sizes:
+			selected &= np.isin(self.sizes, [SIZES.index(size) for size in sizes])
+		if transports:
+			selected &= np.isin(self.transports, [TRANSPORTS.index(kind) for kind in transports])
+		cells = self.plans[selected].astype(np.int64) * self.month_count + self.months[selected]
+		return np.bincount(
+			cells,
+			weights=self.counts[selected],
+			minlength=len(self.plan_ids) * self.month_count,
+		).reshape(len(self.plan_ids), self.month_count)
+
+
+def load_history():
+	rows = (
+		Enrollment.objects.order_by()
+		.annotate(month=TruncMonth("enrollment_date"))
+		.values("plan_id", "month", size=F("canine__size"), transport=F("transport_service__type"))
+		.annotate(count=Count("id"))
+	)
+	return DemandHistory(list(rows))
+
+
+class HistoryCache:
+	"""Process-local :class:`DemandHistory`, reloaded when its namespaces are bumped"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.versions = None
+		self.history = None
+
+	def get(self):
+		if not caching.enabled():
+			return load_history()
+		versions = caching.get_versions(NAMESPACES)
+		with self.lock:
+			hit = self.history is not None and versions == self.versions
+			caching.record_cache("pricing_history", hit=hit)
+			if not hit:
+				self.history = load_history()
+				self.versions = versions
+			return self.history
+
+
+history_cache = HistoryCache()
+
+
+def _price(value, label):
+	try:
+		price = Decimal(str(value))
+	except InvalidOperation as e:
+		raise PricingError(f"Invalid price for {label}") from e
+	if not price.is_finite() or price < 0:
+		raise PricingError(f"Invalid price for {label}")
+	return float(price)
+
+
+def _choices(data, name, choices):
+	values = data.get(name) or []
+	if isinstance(values, str):
+		values = values.split(",")
+	if not isinstance(values, list) or any(value not in choices for value in values):
+		raise PricingError(f"{name} must be a list of: {', '.join(choices)}")
+	return values
+
+
+def parse_simulation(data, plans):
+	"""
+	Validate a simulation request against ``plans`` (``{id: current price}``): a
+	list of ``scenarios`` (``{"name", "factor", "prices": {plan id: price}}``), an
+	optional ``elasticity`` and ``size``/``transport``/``date_from``/``date_to``
+	filters. ``factor`` scales every current price and ``prices`` then replaces some
+	of them. Returns the spec with the scenario price matrix under ``prices``.
+	"""
+	if not isinstance(data, dict):
+		raise PricingError("Expected a JSON object")
+	scenarios = data.get("scenarios")
+	if not isinstance(scenarios, list) or not scenarios:
+		raise PricingError("scenarios must be a non-empty list")
+	if len(scenarios) > MAX_SCENARIOS:
+		raise PricingError(f"At most {MAX_SCENARIOS} scenarios")
+
+	plan_ids = list(plans)
+	columns = {str(plan_id): index for index, plan_id in enumerate(plan_ids)}
+	current = np.array([float(price) for price in plans.values()])
+	prices = np.empty((len(scenarios), len(plan_ids)))
+	names = []
+	for row, scenario in enumerate(scenarios):
+		if not isinstance(scenario, dict):
+			raise PricingError("Every scenario must be an object")
+		names.append(str(scenario.get("name") or f"Scenario {row + 1}"))
+		prices[row] = current * _price(scenario.get("factor", 1), f"scenario {row + 1} factor")
+		overrides = scenario.get("prices") or {}
+		if not isinstance(overrides, dict):
+			raise PricingError("prices must map plan ids to prices")
+		for plan_id, price in overrides.items():
+			if str(plan_id) not in columns:
+				raise PricingError(f"Unknown plan: {plan_id}")
+			prices[row, columns[str(plan_id)]] = _price(price, f"plan {plan_id}")
+
+	try:
+		elasticity = float(data.get("elasticity") or 0)
+	except (TypeError, ValueError) as e:
+		raise PricingError("elasticity must be a number") from e
+	if not 0 <= elasticity <= MAX_ELASTICITY:
+		raise PricingError(f"elasticity must be between 0 and {MAX_ELASTICITY}")
+
+	spec = {
+		"names": names,
+		"plan_ids": plan_ids,
+		"current": current,
+		"prices": prices,
+		"elasticity": elasticity,
+		"sizes": _choices(data, "size", SIZES),
+		"transports": _choices(data, "transport", TRANSPORTS),
+	}
+	for bound in ("date_from", "date_to"):
+		try:
+			spec[bound] = datetime.date.fromisoformat(data[bound]) if data.get(bound) else None
+		except (TypeError, ValueError) as e:
+			raise PricingError(f"{bound} must be in YYYY-MM-DD format") from e
+	return spec
+
+
+def current_prices():
+	return dict(EnrollmentPlan.objects.order_by("id").values_list("id", "price"))
+
+
+def simulate(spec, history=None):
+	"""
+	Projected income per month of the baseline (current prices) and of every
+	scenario in ``spec`` (see :func:`parse_simulation`).
+	"""
+	history = history or history_cache.get()
+	demand = history.demand(spec["sizes"], spec["transports"])
+	first, last = 0, history.month_count
+	if spec["date_from"]:
+		first = max(first, history.month_index(spec["date_from"]))
+	if spec["date_to"]:
+		last = min(last, history.month_index(spec["date_to"]) + 1)
+	demand = demand[:, first : max(first, last)]
+
+	# Scenario prices in the history's plan order; plans without history have no demand
+	columns = np.searchsorted(np.array(spec["plan_ids"]), history.plan_ids)
+	current = spec["current"][columns]
+	prices = np.vstack([current, spec["prices"][:, columns]])
+	if spec["elasticity"]:
+		ratio = np.divide(prices, current, out=np.ones_like(prices), where=current > 0)
+		prices *= np.power(ratio, -spec["elasticity"], where=ratio > 0, out=np.zeros_like(ratio))
+	income = prices @ demand
+
+	months = [history.month_label(index) for index in range(first, max(first, last))]
+	totals = income.sum(axis=1)
+	results = [
+		{
+			"name": name,
+			"total": _money(total),
+			"change": _money(total - totals[0]),
+			"change_rate": round(float(total / totals[0] - 1), 4) if totals[0] else None,
+			"monthly": [_money(amount) for amount in amounts],
+		}
+		for name, total, amounts in zip(
+			["Current prices", *spec["names"]], totals, income, strict=True
+		)
+	]
+	return {
+		"months": months,
+		"enrollments": int(demand.sum()),
+		"baseline": results[0],
+		"scenarios": results[1:],
+	}
+
+
+def _money(value):
+	return str(Decimal(f"{value:.2f}"))
@@ -0,0 +1,111 @@
+"""Helpers for collecting per-request timings (database, view and render phases)."""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_profile = ContextVar("request_profile", default=None)
+
+
+class QueryTimer:
+	"""
+	Database execute wrapper that counts queries and accumulates their duration.
+	Install it with ``connection.execute_wrapper(QueryTimer())``.
+	"""
+
+	def __init__(self):
+		self.count = 0
+		self.duration = 0.0
+
+	def __call__(self, execute, sql, params, many, context):
+		start = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			self.duration += time.perf_counter() - start
+			self.count += 1
+
+
+class RequestProfile:
+	"""Timings collected while a single request is being handled"""
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.queries = QueryTimer()
+		self.sections = {}
+		self.view_started = None
+		self.view_finished = None
+		self.render_finished = None
+
+	def add(self, name, duration):
+		self.sections[name] = self.sections.get(name, 0.0) + duration
+
+	def phases(self, finished):
+		"""
+		Return the ``{name: seconds}`` breakdown of the request.
+		``view`` excludes the time spent in the database and ``render`` covers the
+		DRF renderer (serialized data to JSON bytes).
+		"""
+		phases = {"total": finished - self.started, "db": self.queries.duration}
+		if self.view_started is not None:
+			view_finished = self.view_finished or finished
+			phases["view"] = max(view_finished - self.view_started - self.queries.duration, 0.0)
+			if self.view_finished is not None and self.render_finished is not None:
+				phases["render"] = self.render_finished - self.view_finished
+		phases.update(self.sections)
+		return phases
+
+
+def current_profile():
+	"""Return the profile of the request being handled, or None if it is not profiled"""
+	return _current_profile.get()
+
+
+@contextmanager
+def activate(profile):
+	token = _current_profile.set(profile)
+	try:
+		yield profile
+	finally:
+		_current_profile.reset(token)
+
+
+@contextmanager
+def profile_section(name):
+	"""
+	Time a block of code as a named Server-Timing entry of the current request.
+
+	Does nothing when the request is not being profiled, e.g.
+	``with profile_section("serializer"): data = serializer.data``
+	"""
+	profile = current_profile()
+	if profile is None:
+		yield
+		return
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		profile.add(name, time.perf_counter() - start)
+
+
+class SerializerTimingMixin:
+	"""
+	Viewset mixin timing the ``data`` of every serializer returned by
+	``get_serializer`` as the ``serializer`` Server-Timing entry.
+
+	Only the outermost ``to_representation`` is wrapped, so nested serializers and
+	list children are not counted twice.
+	"""
+
+	def get_serializer(self, *args, **kwargs):
+		serializer = super().get_serializer(*args, **kwargs)
+		if current_profile() is not None:
+			to_representation = serializer.to_representation
+
+			def timed(instance):
+				with profile_section("serializer"):
+					return to_representation(instance)
+
+			serializer.to_representation = timed
+		return serializer
@@ -0,0 +1,487 @@
+"""
+Declarative report engine.
+
+A report picks a source (``enrollments`` or ``attendance``), up to
+``REPORT_MAX_DIMENSIONS`` dimensions to group by and one or more measures. It is
+compiled into a single ``GROUP BY`` query. Only the dimensions, measures and filters
+registered in :data:`SOURCES` can be used; query parameters never reach the ORM as
+field names.
+
+Pivots (:func:`run_pivot`) cross one or two dimensions and add subtotals per row,
+per column and a grand total. On PostgreSQL they come from one ``GROUPING SETS``
+query; other backends group by every dimension once and add the subtotals up while
+reading the rows, so pivots only accept additive measures.
+
+A report over a single time dimension (``date`` or ``month``) can ask for a dense
+series: its groups are joined to the calendar table (:mod:`api.calendar_days`) so
+that periods without data come back with zero measures. The calendar is first
+extended over the years of the selected facts when they fall outside it.
+
+Results are cached in the namespaces of the tables the source reads (see
+:mod:`api.caching`). On PostgreSQL the planner's cost estimate is checked before a
+report runs, and reports above ``REPORT_MAX_COST`` are refused.
+"""
+
+import datetime
+import itertools
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Max, Min, Subquery, Sum
+from django.db.models.functions import TruncMonth
+
+from . import caching, calendar_days
+from .models import Attendance, CalendarDay, Enrollment
+
+DEFAULT_LIMIT = 100
+
+
+class ReportError(ValueError):
+	pass
+
+
+def _boolean(value):
+	if value.lower() not in {"true", "false"}:
+		raise ReportError("status must be true or false")
+	return value.lower() == "true"
+
+
+class Dimension:
+	"""
+	Grouping column. ``field`` is the ORM path it reads; dimensions with a
+	``parse`` function can also be used as equality filters (``?plan=...``).
+	"""
+
+	def __init__(self, field, expression=None, parse=str, output=None):
+		self.field = field
+		self.expression = expression if expression is not None else F(field)
+		self.parse = parse
+		self.output = output
+
+	def format(self, value):
+		return self.output(value) if self.output and value is not None else value
+
+
+def _month(value):
+	return value.strftime("%Y-%m")
+
+
+# Calendar periods of the time dimensions, for dense series
+SPINES = {"date": F("date"), "month": TruncMonth("date")}
+
+
+class Source:
+	def __init__(self, model, date_field, namespaces, dimensions, measures):
+		self.model = model
+		self.date_field = date_field
+		self.namespaces = namespaces
+		self.dimensions = dimensions
+		self.measures = measures
+
+
+SOURCES = {
+	"enrollments": Source(
+		Enrollment,
+		date_field="enrollment_date",
+		namespaces=("enrollments", "canines"),
+		dimensions={
+			"plan": Dimension("plan__name"),
+			"size": Dimension("canine__size"),
+			"transport": Dimension("transport_service__type"),
+			"breed": Dimension("canine__breed"),
+			"status": Dimension("status", parse=_boolean),
+			"month": Dimension("month", TruncMonth("enrollment_date"), parse=None, output=_month),
+			"weekday": Dimension("enrollment_day__weekday", parse=int),
+			"holiday": Dimension("enrollment_day__is_holiday", parse=_boolean),
+		},
+		measures={
+			"count": Count("id"),
+			"canines": Count("canine", distinct=True),
+			"income": Sum("price_paid"),
+		},
+	),
+	"attendance": Source(
+		Attendance,
+		date_field="date",
+		namespaces=("attendance", "enrollments", "canines"),
+		dimensions={
+			"plan": Dimension("enrollment__plan__name"),
+			"size": Dimension("enrollment__canine__size"),
+			"transport": Dimension("enrollment__transport_service__type"),
+			"breed": Dimension("enrollment__canine__breed"),
+			"status": Dimension("status"),
+			"date": Dimension("date", parse=datetime.date.fromisoformat),
+			"month": Dimension("month", TruncMonth("date"), parse=None, output=_month),
+			"weekday": Dimension("calendar_day__weekday", parse=int),
+			"holiday": Dimension("calendar_day__is_holiday", parse=_boolean),
+		},
+		measures={
+			"count": Count("id"),
+			"canines": Count("enrollment__canine", distinct=True),
+		},
+	),
+}
+
+
+def _split(value):
+	return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def parse_spec(params):
+	"""
+	Build a report spec from query parameters: ``source``, ``dimensions`` and
+	``measures`` (comma separated), ``date_from``/``date_to``, one equality filter
+	per filterable dimension, ``order`` (comma separated, ``-`` for descending),
+	``limit`` and ``dense``.
+	"""
+	name = params.get("source", "enrollments")
+	if name not in SOURCES:
+		raise ReportError(f"source must be one of: {', '.join(SOURCES)}")
+	spec = {
+		"source": name,
+		"dimensions": _split(params.get("dimensions")),
+		"measures": _split(params.get("measures")) or ["count"],
+		"order": _split(params.get("order")),
+		"filters": {},
+		"dense": params.get("dense", "").lower() == "true",
+	}
+	for bound in ("date_from", "date_to"):
+		if params.get(bound):
+			try:
+				spec[bound] = datetime.date.fromisoformat(params[bound])
+			except ValueError as e:
+				raise ReportError(f"{bound} must be in YYYY-MM-DD format") from e
+	for dimension_name, dimension in SOURCES[name].dimensions.items():
+		if params.get(dimension_name) is not None and dimension.parse is not None:
+			try:
+				spec["filters"][dimension_name] = dimension.parse(params[dimension_name])
+			except ValueError as e:
+				raise ReportError(f"Invalid value for {dimension_name}") from e
+	try:
+		spec["limit"] = int(params.get("limit", DEFAULT_LIMIT))
+	except ValueError as e:
+		raise ReportError("limit must be an integer") from e
+	if not 1 <= spec["limit"] <= settings.REPORT_MAX_ROWS:
+		raise ReportError(f"limit must be between 1 and {settings.REPORT_MAX_ROWS}")
+	return spec
+
+
+DEFAULT_SPEC = {
+	"dimensions": [],
+	"measures": ["count"],
+	"filters": {},
+	"date_from": None,
+	"date_to": None,
+	"order": [],
+	"limit": DEFAULT_LIMIT,
+	"dense": False,
+}
+
+
+def run_report(spec):
+	"""
+	Run (or fetch from the cache) a report. ``spec`` has the keys built by
+	:func:`parse_spec`; missing ones take the values of ``DEFAULT_SPEC`` and
+	``limit=None`` returns every group. With ``dense`` every period of the date range
+	(of the data when unbounded) is returned, in order. Returns ``{"results": [...], "truncated"}``
+	where each result has one key per dimension and measure.
+	"""
+	spec = {**DEFAULT_SPEC, **spec}
+	registry = SOURCES[spec["source"]]
+	_validate(registry, spec)
+	return caching.cached(
+		"report", registry.namespaces, lambda: _compute(registry, spec), params=spec
+	)
+
+
+def _validate(registry, spec):
+	dimensions, measures = list(spec["dimensions"]), list(spec["measures"])
+	if len(dimensions) > settings.REPORT_MAX_DIMENSIONS:
+		raise ReportError(f"At most {settings.REPORT_MAX_DIMENSIONS} dimensions")
+	if len(set(dimensions)) != len(dimensions):
+		raise ReportError("Dimensions must not repeat")
+	for name in dimensions:
+		if name not in registry.dimensions:
+			raise ReportError(f"Unknown dimension: {name}")
+	for name in measures:
+		if name not in registry.measures:
+			raise ReportError(f"Unknown measure: {name}")
+	for name in spec["filters"]:
+		if registry.dimensions.get(name) is None or registry.dimensions[name].parse is None:
+			raise ReportError(f"Unknown filter: {name}")
+	for name in spec["order"]:
+		if name.removeprefix("-") not in dimensions + measures:
+			raise ReportError(f"Can only order by the selected dimensions and measures: {name}")
+	if spec["dense"] and (len(dimensions) != 1 or dimensions[0] not in SPINES or spec["order"]):
+		raise ReportError("Dense series need one time dimension (date or month) and no order")
+
+
+def build_queryset(registry, spec):
+	"""Fact rows selected by the date range and filters of ``spec``"""
+	queryset = registry.model.objects.all()
+	if spec["date_from"]:
+		queryset = queryset.filter(**{f"{registry.date_field}__gte": spec["date_from"]})
+	if spec["date_to"]:
+		queryset = queryset.filter(**{f"{registry.date_field}__lte": spec["date_to"]})
+	for name, value in spec["filters"].items():
+		queryset = queryset.filter(**{registry.dimensions[name].field: value})
+	return queryset
+
+
+def _alias(name):
+	# Names like "status" or "date" would clash with the model's fields
+	return f"report_{name}"
+
+
+def _order_alias(name):
+	return f"-{_alias(name[1:])}" if name.startswith("-") else _alias(name)
+
+
+def _compute(registry, spec):
+	dimensions, measures, limit = spec["dimensions"], spec["measures"], spec["limit"]
+	queryset = build_queryset(registry, spec)
+	aggregates = {_alias(name): registry.measures[name] for name in measures}
+	if not dimensions:
+		check_cost(queryset)
+		row = queryset.aggregate(**aggregates)
+		return {"results": [_format(registry, spec, row)], "truncated": False}
+
+	ordered = {name.removeprefix("-") for name in spec["order"]}
+	queryset = (
+		queryset.values(
+			**{_alias(name): registry.dimensions[name].expression for name in dimensions}
+		)
+		.annotate(**aggregates)
+		# Dimensions break ties so that results (and truncation) are stable
+		.order_by(
+			*(_order_alias(name) for name in spec["order"]),
+			*(_alias(name) for name in dimensions if name not in ordered),
+		)
+	)
+	check_cost(queryset)
+	if spec["dense"]:
+		rows = _dense(registry, spec, queryset)
+	else:
+		rows = list(queryset if limit is None else queryset[: limit + 1])
+	truncated = limit is not None and len(rows) > limit
+	results = [_format(registry, spec, row) for row in rows[:limit]]
+	return {"results": results, "truncated": truncated}
+
+
+def _spine(registry, spec):
+	"""Calendar periods of the time dimension between the bounds, or the first and last fact"""
+	facts = build_queryset(registry, spec).order_by()
+	# Facts outside the calendar would fall out of the join
+	span = facts.aggregate(first=Min(registry.date_field), last=Max(registry.date_field))
+	calendar_days.cover(span["first"], span["last"])
+	first = spec["date_from"] or Subquery(
+		facts.order_by(registry.date_field).values(registry.date_field)[:1]
+	)
+	last = spec["date_to"] or Subquery(
+		facts.order_by(f"-{registry.date_field}").values(registry.date_field)[:1]
+	)
+	return (
+		CalendarDay.objects.filter(date__gte=first, date__lte=last)
+		.order_by()
+		.values(period=SPINES[spec["dimensions"][0]])
+		.distinct()
+	)
+
+
+def _dense(registry, spec, queryset):
+	"""Rows of ``queryset`` (grouped by one time dimension) LEFT JOINed to :func:`_spine`"""
+	spine_sql, spine_params = _spine(registry, spec).query.sql_with_params()
+	compiler = queryset.order_by().query.get_compiler(connection=connection)
+	facts_sql, facts_params = compiler.as_sql()
+	quote = connection.ops.quote_name
+	period = f"spine.{quote('period')}"
+	dimension = _alias(spec["dimensions"][0])
+	aliases = [alias for _expression, _sql, alias in compiler.select]
+	# Periods without facts get zero measures
+	columns = [
+		period if alias == dimension else f"COALESCE(facts.{quote(alias)}, 0)" for alias in aliases
+	]
+	sql = (
+		f"SELECT {', '.join(columns)} FROM ({spine_sql}) AS spine "
+		f"LEFT JOIN ({facts_sql}) AS facts ON facts.{quote(dimension)} = {period} "
+		f"ORDER BY {period}"
+	)
+	if spec["limit"] is not None:
+		sql += f" LIMIT {int(spec['limit']) + 1}"
+	with connection.cursor() as cursor:
+		cursor.execute(sql, [*spine_params, *facts_params])
+		values = cursor.fetchall()
+	# The spine has the type of the dimension, so the facts query's converters apply
+	converters = compiler.get_converters(
+		[expression for expression, _sql, _alias in compiler.select]
+	)
+	if converters:
+		values = compiler.apply_converters(values, converters)
+	return [dict(zip(aliases, row, strict=True)) for row in values]
+
+
+def _format(registry, spec, row):
+	result = {}
+	for name in spec["dimensions"]:
+		result[name] = registry.dimensions[name].format(row[_alias(name)])
+	for name in spec["measures"]:
+		value = row[_alias(name)]
+		result[name] = str(value) if isinstance(value, Decimal) else value
+	return result
+
+
+def check_cost(queryset):
+	"""Refuse queries the PostgreSQL planner estimates above ``REPORT_MAX_COST``"""
+	max_cost = settings.REPORT_MAX_COST
+	if max_cost is None or connection.vendor != "postgresql":
+		return
+	plan = json.loads(queryset.explain(format="json"))
+	cost = plan["Plan"]["Total Cost"]
+	if cost > max_cost:
+		raise ReportError(
+			f"Report too expensive (estimated cost {cost:.0f} > {max_cost:.0f}): "
+			"narrow the date range or use fewer dimensions"
+		)
+
+
+PIVOT_DIMENSIONS = 2
+
+
+def parse_pivot_spec(params):
+	"""
+	Like :func:`parse_spec`, with ``rows`` and (optionally) ``columns`` naming the
+	pivot dimensions instead of ``dimensions``.
+	"""
+	if not params.get("rows"):
+		raise ReportError("rows is required")
+	spec = parse_spec(params)
+	spec["dimensions"] = [name for name in (params.get("rows"), params.get("columns")) if name]
+	del spec["limit"], spec["order"], spec["dense"]
+	return spec
+
+
+def run_pivot(spec):
+	"""
+	Cross the dimensions of ``spec`` (rows first, then columns). Returns ``cells`` (one
+	per combination present in the data), ``row_totals``, ``column_totals`` (two
+	dimensions only) and the grand ``total``.
+	"""
+	spec = {**DEFAULT_SPEC, **spec, "order": [], "limit": None}
+	registry = SOURCES[spec["source"]]
+	_validate(registry, spec)
+	if not 1 <= len(spec["dimensions"]) <= PIVOT_DIMENSIONS:
+		raise ReportError("A pivot needs rows and at most one column dimension")
+	for name in spec["measures"]:
+		if not _additive(registry.measures[name]):
+			raise ReportError(f"Pivots can't add up {name}: it is not additive")
+	compute = _grouping_sets if connection.vendor == "postgresql" else _single_pass
+	return caching.cached(
+		"pivot", registry.namespaces, lambda: _pivot(registry, spec, compute), params=spec
+	)
+
+
+def _additive(aggregate):
+	return aggregate.function in {"COUNT", "SUM"} and not aggregate.distinct
+
+
+def _pivot(registry, spec, compute):
+	dimensions = spec["dimensions"]
+	groups = {}
+	for present, row in compute(registry, spec):
+		groups.setdefault(present, []).append(
+			_format(registry, {**spec, "dimensions": present}, row)
+		)
+	pivot = {
+		"cells": groups.get(tuple(dimensions), []),
+		"row_totals": groups.get(tuple(dimensions[:1]), []),
+		"total": (groups.get((), []) or [dict.fromkeys(spec["measures"], 0)])[0],
+	}
+	if len(dimensions) == PIVOT_DIMENSIONS:
+		pivot["column_totals"] = groups.get(tuple(dimensions[1:]), [])
+	return pivot
+
+
+def _grouping_sets(registry, spec):
+	"""
+	One ``GROUP BY GROUPING SETS`` over the fact rows: every subset of the dimensions.
+	Yields ``(dimensions present, row)`` with the row keyed by alias.
+	"""
+	dimensions, measures = spec["dimensions"], spec["measures"]
+	facts = build_queryset(registry, spec).values(
+		**{_alias(name): registry.dimensions[name].expression for name in dimensions},
+		**{_alias(name): registry.measures[name].get_source_expressions()[0] for name in measures},
+	)
+	check_cost(facts)
+	inner_sql, params = facts.query.sql_with_params()
+	quote = connection.ops.quote_name
+	columns = [quote(_alias(name)) for name in dimensions]
+	aggregates = [
+		f"{registry.measures[name].function}({quote(_alias(name))}) AS {quote(_alias(name))}"
+		for name in measures
+	]
+	sets = ", ".join(
+		f"({', '.join(subset)})"
+		for size in range(len(columns), -1, -1)
+		for subset in itertools.combinations(columns, size)
+	)
+	sql = (
+		f"SELECT {', '.join(columns + aggregates)}, GROUPING({', '.join(columns)}) "
+		f"FROM ({inner_sql}) AS facts GROUP BY GROUPING SETS ({sets}) "
+		f"ORDER BY {', '.join(columns)}"
+	)
+	with connection.cursor() as cursor:
+		cursor.execute(sql, params)
+		names = [_alias(name) for name in dimensions + measures] + ["grouping"]
+		for values in cursor.fetchall():
+			row = dict(zip(names, values, strict=True))
+			# GROUPING() sets the bit of every dimension aggregated away (first = highest)
+			grouping = row.pop("grouping")
+			present = tuple(
+				name
+				for index, name in enumerate(dimensions)
+				if not grouping >> (len(dimensions) - 1 - index) & 1
+			)
+			yield present, row
+
+
+def _single_pass(registry, spec):
+	"""
+	Fallback without ``GROUPING SETS``: group by every dimension, then add each cell
+	into its row, column and grand totals while reading it.
+	"""
+	dimensions, measures = spec["dimensions"], spec["measures"]
+	cells = (
+		build_queryset(registry, spec)
+		.values(**{_alias(name): registry.dimensions[name].expression for name in dimensions})
+		.annotate(**{_alias(name): registry.measures[name] for name in measures})
+	)
+	check_cost(cells)
+	subsets = [
+		subset
+		for size in range(len(dimensions) - 1, -1, -1)
+		for subset in itertools.combinations(dimensions, size)
+	]
+	totals = {subset: {} for subset in subsets}
+	for row in cells.order_by(*(_alias(name) for name in dimensions)):
+		yield tuple(dimensions), row
+		for subset in subsets:
+			key = tuple(row[_alias(name)] for name in subset)
+			total = totals[subset].setdefault(
+				key,
+				{
+					**{_alias(name): row[_alias(name)] for name in subset},
+					**{_alias(name): 0 for name in measures},
+				},
+			)
+			for name in measures:
+				total[_alias(name)] += row[_alias(name)] or 0
+	for subset in subsets:
+		for key in sorted(totals[subset], key=_sort_key):
+			yield subset, totals[subset][key]
+
+
+def _sort_key(values):
+	# NULL groups last, as PostgreSQL orders them
+	return tuple((value is None, value) for value in values)
@@ -0,0 +1,160 @@
+"""
+Daily roster: every enrollment expected on a day with its attendance state.
+
+The roster is built with one query (active enrollments LEFT JOIN that day's
+attendance) and cached per day. Attendance changes are then applied to the cached
+roster one row at a time from the ``post_save``/``post_delete`` signals, so check-ins
+don't trigger a rebuild. Changes to enrollments or canines invalidate it through the
+versioned cache namespaces. ``manage.py warm_roster`` (or the scheduled job of the
+same name) builds it before opening time.
+"""
+
+import datetime
+
+from django.core.cache import cache
+from django.db.models import F, FilteredRelation, Q
+from django.utils import timezone
+
+from . import caching
+from .models import Enrollment
+
+PENDING = "pending"
+ROSTER_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 5
+
+
+def roster_key(date):
+	return caching.make_key("roster", ["enrollments", "canines"], {"date": date})
+
+
+def build_roster(date):
+	rows = (
+		Enrollment.objects.filter(status=True, enrollment_date__lte=date, expiration_date__gte=date)
+		.annotate(day=FilteredRelation("attendances", condition=Q(attendances__date=date)))
+		.values(
+			"canine_id",
+			enrollment_id=F("id"),
+			canine_name=F("canine__name"),
+			breed=F("canine__breed"),
+			size=F("canine__size"),
+			client_first_name=F("canine__client__user__first_name"),
+			client_last_name=F("canine__client__user__last_name"),
+			client_phone=F("canine__client__user__phone_number"),
+			plan_name=F("plan__name"),
+			transport=F("transport_service__type"),
+			attendance_id=F("day__id"),
+			attendance_status=F("day__status"),
+			arrival_time=F("day__arrival_time"),
+			departure_time=F("day__departure_time"),
+		)
+		.order_by("canine__name", "id")
+	)
+	return [_format_row(row) for row in rows]
+
+
+def _format_row(row):
+	first_name = row.pop("client_first_name")
+	last_name = row.pop("client_last_name")
+	row["client_name"] = f"{first_name} {last_name}".strip()
+	row["state"] = row.pop("attendance_status") or PENDING
+	for field in ("arrival_time", "departure_time"):
+		row[field] = row[field].isoformat() if row[field] else None
+	return row
+
+
+def get_roster(date=None):
+	"""Cached roster for ``date`` (default: today), building it on a miss"""
+	date = date or timezone.now().date()
+	key = roster_key(date)
+	rows = cache.get(key)
+	caching.record_cache("roster", hit=rows is not None)
+	if rows is None:
+		rows = warm_roster(date)
+	return rows
+
+
+def warm_roster(date=None):
+	"""Rebuild the roster of ``date`` (default: today) into the cache"""
+	date = date or timezone.now().date()
+	key = roster_key(date)
+	generation = cache.get(f"{key}:generation")
+	rows = build_roster(date)
+	_store(key, rows, generation)
+	return rows
+
+
+def _store(key, rows, generation):
+	"""
+	Cache ``rows`` unless an attendance change happened since ``generation`` was read;
+	the change may be missing from them, so the roster is dropped and rebuilt later.
+	"""
+	cache.set(key, rows, timeout=ROSTER_TIMEOUT)
+	if cache.get(f"{key}:generation") != generation:
+		cache.delete(key)
+
+
+def invalidate_roster(date):
+	"""Drop the cached roster of ``date`` after attendance changes made in bulk"""
+	if not caching.enabled():
+		return
+	key = roster_key(date)
+	# Also makes a roster being built concurrently discard itself (see _store)
+	cache.add(f"{key}:generation", 0, timeout=ROSTER_TIMEOUT)
+	cache.incr(f"{key}:generation")
+	cache.delete(key)
+
+
+def record_attendance(attendance, deleted=False):
+	"""
+	Apply one committed attendance change to the cached roster of its day, if any.
+	Concurrent changes of the same day can't be merged safely, so they drop the roster.
+	"""
+	if not caching.enabled():
+		return
+	key = roster_key(attendance.date)
+	generation_key = f"{key}:generation"
+	cache.add(generation_key, 0, timeout=ROSTER_TIMEOUT)
+	generation = cache.incr(generation_key)
+	lock_key = f"{key}:lock"
+	if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+		cache.delete(key)
+		return
+	try:
+		rows = cache.get(key)
+		if rows is None:
+			return
+		for row in rows:
+			if row["enrollment_id"] == attendance.enrollment_id:
+				_apply(row, None if deleted else attendance)
+				_store(key, rows, generation)
+				break
+	finally:
+		cache.delete(lock_key)
+
+
+def _apply(row, attendance):
+	if attendance is None:
+		row.update(attendance_id=None, state=PENDING, arrival_time=None, departure_time=None)
+		return
+	row.update(
+		attendance_id=attendance.pk,
+		state=attendance.status,
+		arrival_time=_time(attendance.arrival_time),
+		departure_time=_time(attendance.departure_time),
+	)
+
+
+def _time(value):
+	# check_out stores the raw request string until the instance is reloaded
+	if not value:
+		return None
+	if isinstance(value, str):
+		value = datetime.time.fromisoformat(value)
+	return value.isoformat()
+
+
+def summarize(rows):
+	summary = {"expected": len(rows), PENDING: 0}
+	for row in rows:
+		summary[row["state"]] = summary.get(row["state"], 0) + 1
+	return summary
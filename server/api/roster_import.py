@@ -0,0 +1,330 @@
+"""
+Bulk import of a client roster (users, clients, canines and enrollments) from CSV.
+
+Rows are streamed and processed in chunks. For every chunk, uniqueness of
+username/email/document_id is checked with one query per field, passwords are
+hashed in a process pool (see :class:`HashingPool`) and rows are inserted with
+``bulk_create`` inside a transaction. Invalid rows are skipped and reported with their line number.
+
+A client with several canines is written as several rows sharing the username;
+the user columns of the repeated rows are ignored.
+"""
+
+import csv
+import datetime
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from . import cohorts, counters
+from .current_enrollment import refresh_current_enrollments
+from .models import Canine, Client, Enrollment, EnrollmentPlan, TransportService, User
+
+COLUMNS = [
+	"username",
+	"email",
+	"password",
+	"first_name",
+	"last_name",
+	"phone_number",
+	"address",
+	"document_id",
+	"canine_name",
+	"breed",
+	"age",
+	"size",
+	"plan",
+	"transport",
+	"enrollment_date",
+	"expiration_date",
+]
+REQUIRED_USER_COLUMNS = ["username", "email", "password", "first_name", "last_name"]
+REQUIRED_CANINE_COLUMNS = ["breed", "age", "size"]
+DEFAULT_CHUNK_SIZE = 1000
+# Fewer new passwords than this in a chunk are hashed in the importing process
+MIN_POOL_HASHES = 4
+
+MSG_REQUIRED = "Este campo es obligatorio."
+MSG_USERNAME_TAKEN = "Este nombre de usuario ya está en uso."
+MSG_EMAIL_TAKEN = "Este correo electrónico ya está registrado."
+MSG_DOCUMENT_TAKEN = "Este documento de identidad ya está registrado."
+MSG_USER_ROW_FAILED = "La fila que crea este usuario tiene errores."
+
+UNIQUE_FIELDS = {
+	"username": MSG_USERNAME_TAKEN,
+	"email": MSG_EMAIL_TAKEN,
+	"document_id": MSG_DOCUMENT_TAKEN,
+}
+
+
+def _init_worker(settings_module):
+	"""Process pool initializer: password hashers need configured settings"""
+	os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+	import django
+
+	django.setup()
+
+
+class HashingPool:
+	"""
+	Process pool hashing passwords, created on first use and reused by every import
+	of this process, so uploads don't each fork workers and set up Django again.
+	Small batches skip it.
+	"""
+
+	def __init__(self, workers=None):
+		self.workers = workers
+		self._executor = None
+		self._lock = threading.Lock()
+
+	def hash(self, passwords):
+		if len(passwords) < MIN_POOL_HASHES:
+			return [make_password(password) for password in passwords]
+		workers = self.workers or settings.ROSTER_IMPORT_WORKERS
+		with self._lock:
+			if self._executor is None:
+				self._executor = ProcessPoolExecutor(
+					max_workers=workers,
+					initializer=_init_worker,
+					initargs=(settings.SETTINGS_MODULE,),
+				)
+		chunksize = max(1, len(passwords) // (workers * 4))
+		return list(self._executor.map(make_password, passwords, chunksize=chunksize))
+
+	def shutdown(self):
+		with self._lock:
+			if self._executor is not None:
+				self._executor.shutdown()
+				self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+class RosterImportResult:
+	def __init__(self):
+		self.created = {"users": 0, "clients": 0, "canines": 0, "enrollments": 0}
+		self.errors = []
+		self.rows = 0
+
+	def as_dict(self):
+		errors = sorted(self.errors, key=lambda error: error["line"])
+		return {"rows": self.rows, "created": self.created, "errors": errors}
+
+
+class RosterImporter:
+	def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, pool=None, dry_run=False):
+		self.chunk_size = chunk_size
+		self.pool = pool or hashing_pool
+		self.dry_run = dry_run
+		self.result = RosterImportResult()
+		# Values already used earlier in the file, and clients created so far
+		self.seen = {field: set() for field in UNIQUE_FIELDS}
+		self.clients = {}
+		self.failed_usernames = set()
+		self.plans = {}
+		for plan in EnrollmentPlan.objects.filter(active=True):
+			self.plans[str(plan.pk)] = plan
+			self.plans.setdefault(plan.name.lower(), plan)
+		self.transports = {service.type: service for service in TransportService.objects.all()}
+
+	def run(self, text_stream):
+		reader = csv.DictReader(text_stream)
+		header = reader.fieldnames or []
+		missing = [column for column in REQUIRED_USER_COLUMNS if column not in header]
+		if missing:
+			self.result.errors.append(
+				{"line": 1, "errors": {"columns": f"Faltan columnas: {', '.join(missing)}"}}
+			)
+			return self.result
+
+		# Line 1 is the header
+		rows = enumerate(reader, start=2)
+		while chunk := list(islice(rows, self.chunk_size)):
+			self._import_chunk(chunk)
+		return self.result
+
+	def _import_chunk(self, chunk):
+		self.result.rows += len(chunk)
+		valid = []
+		creating = []
+		pending = set()
+		for line, raw in chunk:
+			row = {key: (value or "").strip() for key, value in raw.items() if key}
+			username = row.get("username")
+			if username in self.failed_usernames:
+				self._fail(line, row, {"username": MSG_USER_ROW_FAILED})
+				continue
+			creates_user = username not in self.clients and username not in pending
+			errors, parsed = self._validate_row(row, creates_user)
+			if errors:
+				self._fail(line, row, errors, creates_user)
+				continue
+			valid.append((line, row, parsed))
+			if creates_user:
+				creating.append((line, row))
+				pending.add(username)
+
+		new_users = self._check_uniqueness(creating)
+		# Drop extra canines of users whose creating row failed the uniqueness check
+		kept = []
+		for line, row, parsed in valid:
+			if row["username"] in self.failed_usernames:
+				if all(line != created_line for created_line, _row in creating):
+					self._fail(line, row, {"username": MSG_USER_ROW_FAILED})
+				continue
+			kept.append((line, row, parsed))
+
+		if self.dry_run:
+			self.clients.update(dict.fromkeys(row["username"] for _line, row in new_users))
+			return
+
+		hashes = self.pool.hash([row["password"] for _line, row in new_users])
+		with transaction.atomic():
+			self._insert(kept, new_users, hashes)
+
+	def _fail(self, line, row, errors, creates_user=False):
+		self.result.errors.append({"line": line, "errors": errors})
+		if creates_user and row.get("username"):
+			self.failed_usernames.add(row["username"])
+
+	def _validate_row(self, row, creates_user):
+		errors = {}
+		if creates_user:
+			for column in REQUIRED_USER_COLUMNS:
+				if not row.get(column):
+					errors[column] = MSG_REQUIRED
+			if row.get("email"):
+				try:
+					validate_email(row["email"])
+				except ValidationError as e:
+					errors["email"] = e.messages[0]
+
+		parsed = {}
+		if row.get("canine_name"):
+			parsed["canine"] = self._validate_canine(row, errors)
+			if row.get("plan"):
+				parsed["enrollment"] = self._validate_enrollment(row, errors)
+		return errors, parsed
+
+	def _validate_canine(self, row, errors):
+		for column in REQUIRED_CANINE_COLUMNS:
+			if not row.get(column):
+				errors[column] = MSG_REQUIRED
+		if row.get("size") and row["size"] not in Canine.Size.values:
+			errors["size"] = f"Debe ser uno de {Canine.Size.values}."
+		try:
+			age = int(row.get("age") or 0)
+		except ValueError:
+			errors["age"] = "Debe ser un número entero."
+			age = None
+		return {
+			"name": row["canine_name"],
+			"breed": row.get("breed"),
+			"age": age,
+			"size": row.get("size"),
+		}
+
+	def _validate_enrollment(self, row, errors):
+		plan = self.plans.get(row["plan"].lower())
+		if plan is None:
+			errors["plan"] = "El plan no existe o no está activo."
+		transport = self.transports.get(row.get("transport") or TransportService.Type.NO_SERVICE)
+		if transport is None:
+			errors["transport"] = "El servicio de transporte no existe."
+		dates = {}
+		for column in ("enrollment_date", "expiration_date"):
+			try:
+				dates[column] = datetime.date.fromisoformat(row.get(column, ""))
+			except ValueError:
+				errors[column] = "Fecha inválida (AAAA-MM-DD)."
+		start, end = dates.get("enrollment_date"), dates.get("expiration_date")
+		if start and end and end <= start:
+			errors["expiration_date"] = (
+				"La fecha de expiración debe ser posterior a la fecha de inscripción."
+			)
+		return {
+			"plan": plan,
+			"price_paid": plan.price if plan else None,
+			"transport_service": transport,
+			**dates,
+		}
+
+	def _check_uniqueness(self, creating):
+		"""
+		Set-based uniqueness check of the rows creating a user: one query per unique
+		field for the whole chunk, plus values used earlier in the file.
+		Returns the rows whose user can be created.
+		"""
+		taken = {}
+		for field in UNIQUE_FIELDS:
+			values = {row[field] for _line, row in creating if row.get(field)}
+			taken[field] = set(
+				User.objects.filter(**{f"{field}__in": values}).values_list(field, flat=True)
+			)
+
+		new_users = []
+		for line, row in creating:
+			errors = {
+				field: message
+				for field, message in UNIQUE_FIELDS.items()
+				if row.get(field) and (row[field] in taken[field] or row[field] in self.seen[field])
+			}
+			if errors:
+				self._fail(line, row, errors, creates_user=True)
+				continue
+			for field in UNIQUE_FIELDS:
+				if row.get(field):
+					self.seen[field].add(row[field])
+			new_users.append((line, row))
+		return new_users
+
+	def _insert(self, valid, new_users, hashes):
+		users = User.objects.bulk_create(
+			[
+				User(
+					username=row["username"],
+					email=row["email"],
+					password=password_hash,
+					first_name=row["first_name"],
+					last_name=row["last_name"],
+					phone_number=row.get("phone_number", ""),
+					address=row.get("address", ""),
+					document_id=row.get("document_id") or None,
+				)
+				for (_line, row), password_hash in zip(new_users, hashes, strict=True)
+			]
+		)
+		clients = Client.objects.bulk_create([Client(user=user) for user in users])
+		for client in clients:
+			self.clients[client.user.username] = client
+
+		canines = []
+		enrollment_data = []
+		for _line, row, parsed in valid:
+			if "canine" not in parsed:
+				continue
+			canine = Canine(client=self.clients[row["username"]], **parsed["canine"])
+			canines.append(canine)
+			if "enrollment" in parsed:
+				enrollment_data.append((canine, parsed["enrollment"]))
+		Canine.objects.bulk_create(canines)
+		enrollments = Enrollment.objects.bulk_create(
+			[Enrollment(canine=canine, **data) for canine, data in enrollment_data]
+		)
+		# bulk_create skips the signals maintaining the plan/transport counters
+		counters.adjust(added=[enrollment.counted_state() for enrollment in enrollments])
+		refresh_current_enrollments([enrollment.canine_id for enrollment in enrollments])
+		cohorts.invalidate_canines([enrollment.canine_id for enrollment in enrollments])
+
+		self.result.created["users"] += len(users)
+		self.result.created["clients"] += len(clients)
+		self.result.created["canines"] += len(canines)
+		self.result.created["enrollments"] += len(enrollments)
@@ -0,0 +1,91 @@
+"""
+Minimal in-process scheduler for daily maintenance jobs.
+
+Enabled with ``SCHEDULER_ENABLED=1``; it runs the jobs listed in ``SCHEDULED_JOBS``
+(job name -> "HH:MM" local time) from a daemon thread. When several worker processes
+run the scheduler, a cache lock makes each daily run happen once, provided ``CACHES``
+is shared between them; without one, every process still runs each job once a day.
+Deployments with an external cron can leave it disabled and call the management
+commands instead (e.g. ``manage.py expire_enrollments``).
+"""
+
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+JOBS = {
+	"expire_enrollments": "api.expirations.sweep_expired_enrollments",
+	"warm_roster": "api.roster.warm_roster",
+	"prune_tombstones": "api.sync.prune_tombstones",
+	"extend_calendar": "api.calendar_days.extend_calendar",
+	"mark_absences": "api.absences.mark_absences",
+}
+POLL_INTERVAL = 30
+LOCK_TIMEOUT = 60 * 60 * 24
+
+_started = threading.Event()
+_start_lock = threading.Lock()
+
+
+class Scheduler:
+	def __init__(self, schedule):
+		self.jobs = {}
+		for name, at in schedule.items():
+			if name not in JOBS:
+				logger.warning("Unknown scheduled job %r ignored", name)
+				continue
+			self.jobs[name] = datetime.time.fromisoformat(at)
+		# Day of the last run of every job in this process
+		self.last_run = {}
+		self.stopped = threading.Event()
+
+	def due(self, now):
+		"""Jobs whose time has passed today and that did not run yet today"""
+		today = now.date()
+		for name, at in self.jobs.items():
+			if now.time() < at or self.last_run.get(name) == today:
+				continue
+			# Not retried by this process today, even when another process got the lock
+			self.last_run[name] = today
+			if cache.add(f"scheduler:{name}:{today}", 1, LOCK_TIMEOUT):
+				yield name
+
+	def run_job(self, name):
+		logger.info("Running scheduled job %s", name)
+		try:
+			import_string(JOBS[name])()
+		except Exception:
+			logger.exception("Scheduled job %s failed", name)
+		finally:
+			close_old_connections()
+
+	def run(self):
+		while not self.stopped.wait(POLL_INTERVAL):
+			for name in self.due(timezone.localtime()):
+				self.run_job(name)
+
+	def stop(self):
+		self.stopped.set()
+
+
+def start():
+	"""Start the scheduler thread once per process"""
+	with _start_lock:
+		if _started.is_set():
+			return None
+		_started.set()
+	if not caching.enabled():
+		logger.warning("No shared cache configured: every process runs the scheduled jobs")
+	scheduler = Scheduler(settings.SCHEDULED_JOBS)
+	threading.Thread(target=scheduler.run, name="api-scheduler", daemon=True).start()
+	return scheduler
@@ -285,10 +285,29 @@ class ClientSerializer(serializers.ModelSerializer):
 		fields = ["id", "user", "user_id", "registration_date"]
 
 
+class CurrentEnrollmentSerializer(serializers.ModelSerializer):
+	"""Summary of the enrollment a canine is attending on"""
+
+	plan_name = serializers.CharField(source="plan.name", read_only=True)
+
+	class Meta:
+		model = Enrollment
+		fields = [
+			"id",
+			"plan",
+			"plan_name",
+			"transport_service",
+			"enrollment_date",
+			"expiration_date",
+		]
+		read_only_fields = fields
+
+
 class CanineSerializer(serializers.ModelSerializer):
 	"""Canine serializer"""
 
 	client_name = serializers.CharField(source="client.user.get_full_name", read_only=True)
+	current_enrollment = CurrentEnrollmentSerializer(read_only=True)
 
 	class Meta:
 		model = Canine
@@ -303,6 +322,7 @@ class CanineSerializer(serializers.ModelSerializer):
 			"photo",
 			"creation_date",
 			"status",
+			"current_enrollment",
 		]
 		read_only_fields = ["creation_date"]
 
@@ -347,9 +367,10 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 			"enrollment_date",
 			"expiration_date",
 			"status",
+			"price_paid",
 			"creation_date",
 		]
-		read_only_fields = ["creation_date"]
+		read_only_fields = ["price_paid", "creation_date"]
 
 	def validate(self, data):
 		"""
@@ -387,6 +408,13 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 
 		return data
 
+	def update(self, instance, validated_data):
+		# Switching plans charges the current price of the new plan
+		plan = validated_data.get("plan")
+		if plan is not None and plan.pk != instance.plan_id:
+			validated_data["price_paid"] = plan.price
+		return super().update(instance, validated_data)
+
 	def validate_canine(self, value):
 		"""
 		Validate that the canine is active.
@@ -396,6 +424,29 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 		return value
 
 
+class ExpiringEnrollmentSerializer(EnrollmentSerializer):
+	"""Enrollment with the owner contact data, for the renewal queue"""
+
+	client_id = serializers.IntegerField(source="canine.client_id", read_only=True)
+	client_name = serializers.CharField(source="canine.client.user.get_full_name", read_only=True)
+	client_email = serializers.EmailField(source="canine.client.user.email", read_only=True)
+	client_phone = serializers.CharField(source="canine.client.user.phone_number", read_only=True)
+	days_left = serializers.SerializerMethodField()
+
+	class Meta(EnrollmentSerializer.Meta):
+		fields = [
+			*EnrollmentSerializer.Meta.fields,
+			"client_id",
+			"client_name",
+			"client_email",
+			"client_phone",
+			"days_left",
+		]
+
+	def get_days_left(self, obj):
+		return (obj.expiration_date - self.context["today"]).days
+
+
 class AttendanceSerializer(serializers.ModelSerializer):
 	"""Attendance serializer"""
 
@@ -419,6 +470,16 @@ class AttendanceSerializer(serializers.ModelSerializer):
 		]
 
 
+class DashboardCanineSerializer(CanineSerializer):
+	"""Canine with its enrollments and latest attendance, for the client dashboard"""
+
+	enrollments = EnrollmentSerializer(many=True, read_only=True)
+	recent_attendance = AttendanceSerializer(many=True, read_only=True)
+
+	class Meta(CanineSerializer.Meta):
+		fields = [*CanineSerializer.Meta.fields, "enrollments", "recent_attendance"]
+
+
 # Registration serializer
 class RegisterSerializer(serializers.Serializer):
 	"""Serializer for user registration"""
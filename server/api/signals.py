@@ -0,0 +1,110 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from . import caching, cohorts, counters, roster
+from .current_enrollment import refresh_current_enrollments
+from .models import Attendance, Canine, Enrollment, EnrollmentPlan, TransportService
+from .sync import record_tombstone
+
+# Cache namespace invalidated when rows of each model change
+INVALIDATES = {
+	Enrollment: "enrollments",
+	EnrollmentPlan: "enrollments",
+	TransportService: "enrollments",
+	Canine: "canines",
+	Attendance: "attendance",
+}
+
+# Enrollment fields the plan and transport service counters depend on
+COUNTED_FIELDS = {"plan", "transport_service", "status"}
+
+
+def invalidate_caches(sender, **_kwargs):
+	caching.bump(INVALIDATES[sender])
+
+
+def update_roster(instance, signal, **_kwargs):
+	deleted = signal is post_delete
+	transaction.on_commit(partial(roster.record_attendance, instance, deleted=deleted))
+
+
+def track_enrollment(instance, **_kwargs):
+	# Instances not loaded from the database (or with deferred fields) fetch the
+	# state they replace, if any
+	if getattr(instance, "_counted_state", None) is None:
+		instance._counted_state = (
+			Enrollment.objects.filter(pk=instance.pk)
+			.values_list("plan_id", "transport_service_id", "status")
+			.first()
+			if instance.pk
+			else None
+		)
+
+
+def count_enrollment(instance, signal, update_fields=None, **_kwargs):
+	if signal is post_delete:
+		previous = getattr(instance, "_counted_state", None) or instance.counted_state()
+		counters.adjust(removed=[previous] if previous else [])
+		return
+	# Set by track_enrollment; None for a new enrollment
+	previous = instance._counted_state
+	# update_fields may name a foreign key by its attname ("plan_id")
+	if update_fields is not None and not COUNTED_FIELDS & {
+		instance._meta.get_field(name).name for name in update_fields
+	}:
+		return
+	if instance.counted_state() is None:
+		instance.refresh_from_db(fields=list(COUNTED_FIELDS))
+	current = instance.counted_state()
+	if previous != current:
+		counters.adjust(removed=[previous] if previous else [], added=[current])
+	instance.track_counted_state()
+
+
+def point_current_enrollment(instance, **_kwargs):
+	# The enrollment may also have moved away from the canine it was current for
+	canines = Canine.objects.filter(
+		Q(pk=instance.canine_id) | Q(current_enrollment_id=instance.pk)
+	).values("pk")
+	refresh_current_enrollments(canines)
+
+
+def track_cohorts(instance, **_kwargs):
+	cohorts.track_cohorts(instance)
+
+
+def record_cohorts(instance, **_kwargs):
+	cohorts.record_cohorts(instance)
+
+
+def invalidate_cohorts(**_kwargs):
+	# Renewals are reported per plan duration
+	caching.bump(cohorts.ALL_COHORTS)
+
+
+def connect():
+	for model in INVALIDATES:
+		for signal in (post_save, post_delete):
+			signal.connect(
+				invalidate_caches, sender=model, dispatch_uid=f"invalidate-{model.__name__}"
+			)
+	for signal in (post_save, post_delete):
+		signal.connect(update_roster, sender=Attendance, dispatch_uid="update-roster")
+	pre_save.connect(track_enrollment, sender=Enrollment, dispatch_uid="track-enrollment")
+	for signal in (post_save, post_delete):
+		signal.connect(count_enrollment, sender=Enrollment, dispatch_uid="count-enrollment")
+		signal.connect(
+			point_current_enrollment, sender=Enrollment, dispatch_uid="point-current-enrollment"
+		)
+	for signal in (pre_save, pre_delete):
+		signal.connect(track_cohorts, sender=Enrollment, dispatch_uid="track-cohorts")
+	for signal in (post_save, post_delete):
+		signal.connect(record_cohorts, sender=Enrollment, dispatch_uid="record-cohorts")
+		signal.connect(invalidate_cohorts, sender=EnrollmentPlan, dispatch_uid="invalidate-cohorts")
+	for model in (Canine, Enrollment, Attendance):
+		post_delete.connect(
+			record_tombstone, sender=model, dispatch_uid=f"tombstone-{model.__name__}"
+		)
@@ -0,0 +1,162 @@
+"""
+Slow query log.
+
+Queries slower than ``SLOW_QUERY_THRESHOLD_MS`` are kept in a bounded in-process
+ring buffer together with the view that issued them, their parameters and an
+``EXPLAIN`` plan. Plans are captured on a background thread (with its own database
+connection) so the request that ran the slow query is not delayed further.
+"""
+
+import contextlib
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAM_LENGTH = 200
+EXPLAINABLE_PREFIXES = ("select", "with")
+# EXPLAIN ANALYZE executes the statement: a WITH may hide an UPDATE/INSERT/DELETE
+ANALYZABLE_PREFIX = "select"
+
+
+def _threshold_ms():
+	return getattr(settings, "SLOW_QUERY_THRESHOLD_MS", None)
+
+
+def _safe_params(params):
+	if params is None:
+		return []
+	if isinstance(params, dict):
+		return {key: repr(value)[:MAX_PARAM_LENGTH] for key, value in params.items()}
+	return [repr(value)[:MAX_PARAM_LENGTH] for value in params]
+
+
+def _explain_prefix(connection, sql):
+	prefix = connection.ops.explain_query_prefix()
+	analyze = getattr(settings, "SLOW_QUERY_EXPLAIN_ANALYZE", False)
+	if analyze and sql.lstrip().lower().startswith(ANALYZABLE_PREFIX):
+		# Backends without ANALYZE support (e.g. SQLite) keep the plain prefix
+		with contextlib.suppress(ValueError):
+			prefix = connection.ops.explain_query_prefix(analyze=True)
+	return prefix
+
+
+class SlowQueryLog:
+	"""Thread-safe ring buffer of slow queries with asynchronously captured plans"""
+
+	def __init__(self, size=None):
+		self._size = size
+		self._entries = None
+		self._lock = threading.Lock()
+		self._ids = itertools.count(1)
+		self._executor = None
+		self._pending = set()
+
+	@property
+	def entries(self):
+		if self._entries is None:
+			self._entries = deque(
+				maxlen=self._size or getattr(settings, "SLOW_QUERY_LOG_SIZE", 100)
+			)
+		return self._entries
+
+	def record(self, sql, params, duration, view_name=None, alias="default"):
+		entry = {
+			"id": next(self._ids),
+			"recorded_at": timezone.now().isoformat(),
+			"duration_ms": round(duration * 1000, 2),
+			"view": view_name,
+			"sql": sql,
+			"params": _safe_params(params),
+			"plan": None,
+		}
+		with self._lock:
+			self.entries.append(entry)
+
+		logger.warning("Slow query (%.2f ms) in %s: %s", entry["duration_ms"], view_name, sql)
+
+		if sql.lstrip().lower().startswith(EXPLAINABLE_PREFIXES):
+			future = self._get_executor().submit(self._explain, entry, sql, params, alias)
+			with self._lock:
+				self._pending.add(future)
+			# Outside the lock: runs right away in this thread if the future is already done
+			future.add_done_callback(self._done)
+		return entry
+
+	def snapshot(self):
+		"""Return recorded queries, most recent first"""
+		with self._lock:
+			return list(reversed(self.entries))
+
+	def clear(self):
+		with self._lock:
+			self.entries.clear()
+
+	def wait(self, timeout=None):
+		"""Block until every pending EXPLAIN has been captured"""
+		with self._lock:
+			pending = list(self._pending)
+		wait(pending, timeout=timeout)
+
+	def _done(self, future):
+		# Called from the executor thread
+		with self._lock:
+			self._pending.discard(future)
+
+	def _get_executor(self):
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(
+				max_workers=1, thread_name_prefix="slow-query-explain"
+			)
+		return self._executor
+
+	def _explain(self, entry, sql, params, alias):
+		connection = connections[alias]
+		try:
+			prefix = _explain_prefix(connection, sql)
+			with connection.cursor() as cursor:
+				cursor.execute(f"{prefix} {sql}", params)
+				rows = cursor.fetchall()
+		except Exception as e:
+			entry["plan"] = f"EXPLAIN failed: {e}"
+		else:
+			entry["plan"] = "\n".join(" ".join(str(column) for column in row) for row in rows)
+		finally:
+			# Worker threads open their own connection; don't leave it dangling
+			connection.close()
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SlowQueryRecorder:
+	"""
+	Database execute wrapper that records queries slower than the configured
+	threshold in ``slow_query_log``.
+	"""
+
+	def __init__(self, request=None, alias="default"):
+		self.request = request
+		self.alias = alias
+
+	def __call__(self, execute, sql, params, many, context):
+		threshold = _threshold_ms()
+		start = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			duration = time.perf_counter() - start
+			if threshold is not None and not many and duration * 1000 >= threshold:
+				slow_query_log.record(sql, params, duration, self._view_name(), self.alias)
+
+	def _view_name(self):
+		resolver_match = getattr(self.request, "resolver_match", None)
+		return resolver_match.view_name if resolver_match else None
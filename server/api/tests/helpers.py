@@ -0,0 +1,32 @@
+import datetime
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Canine, Client, Enrollment, EnrollmentPlan, TransportService, User
+
+
+def staff_client():
+	"""API client authenticated as a superuser"""
+	user = User.objects.create_superuser("director", "director@example.com", "password")
+	client = APIClient()
+	client.force_authenticate(user)
+	return client
+
+
+def create_enrollment(name="Firulais", enrollment_date=None, plan=None, transport=None):
+	"""An enrollment (with its owner and canine) starting on ``enrollment_date`` (today)"""
+	enrollment_date = enrollment_date or timezone.localdate()
+	user = User.objects.create_user(f"owner-{name}", f"{name}@example.com", "password")
+	canine = Canine.objects.create(
+		client=Client.objects.create(user=user), name=name, breed="Criollo", age=3, size="small"
+	)
+	return Enrollment.objects.create(
+		canine=canine,
+		plan=plan
+		or EnrollmentPlan.objects.create(name="Mensual", duration="1_mes", price=Decimal(100)),
+		transport_service=transport or TransportService.objects.create(type="full"),
+		enrollment_date=enrollment_date,
+		expiration_date=enrollment_date + datetime.timedelta(days=30),
+	)
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from .helpers import create_enrollment, staff_client
+
+URL = "/api/enrollments/"
+
+
+class ConditionalGetTests(TestCase):
+	def setUp(self):
+		self.client = staff_client()
+		self.enrollment = create_enrollment()
+
+	def assert_revalidates(self, url, edit):
+		"""304 while nothing changes, 200 with a new ETag after ``edit()``"""
+		etag = self.client.get(url)["ETag"]
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		edit()
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response["ETag"], etag)
+		return response
+
+	def rename_plan(self):
+		self.enrollment.plan.name = "Mensual plus"
+		self.enrollment.plan.save()
+
+	def change_transport(self):
+		self.enrollment.transport_service.type = "medium"
+		self.enrollment.transport_service.save()
+
+	def test_list_after_plan_edit(self):
+		response = self.assert_revalidates(URL, self.rename_plan)
+		self.assertEqual(response.data[0]["plan_name"], "Mensual plus")
+
+	def test_detail_after_plan_edit(self):
+		response = self.assert_revalidates(f"{URL}{self.enrollment.pk}/", self.rename_plan)
+		self.assertEqual(response.data["plan_name"], "Mensual plus")
+
+	def test_list_after_transport_edit(self):
+		self.assert_revalidates(URL, self.change_transport)
+
+	def test_detail_after_transport_edit(self):
+		response = self.assert_revalidates(f"{URL}{self.enrollment.pk}/", self.change_transport)
+		self.assertEqual(
+			response.data["transport_service_name"], "Servicio medio (Solo mañana o tarde)"
+		)
+
+	def test_canine_after_plan_edit(self):
+		self.assert_revalidates(f"/api/canines/{self.enrollment.canine_id}/", self.rename_plan)
@@ -0,0 +1,68 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+
+from api.models import Attendance, CalendarDay
+from api.reports import ReportError
+
+from .helpers import create_enrollment, staff_client
+
+
+class ReportErrorTests(TestCase):
+	def setUp(self):
+		self.client = staff_client()
+		create_enrollment()
+
+	def test_rejected_reports_are_bad_requests(self):
+		urls = [
+			"/api/enrollments/report_by_plan/",
+			"/api/enrollments/report_by_breed/",
+			"/api/attendance/report_by_date/",
+			"/api/reports/monthly-income/",
+		]
+		error = ReportError("Report too expensive")
+		with mock.patch("api.reports.check_cost", side_effect=error):
+			for url in urls:
+				with self.subTest(url=url):
+					response = self.client.get(url)
+					self.assertEqual(response.status_code, 400)
+					self.assertEqual(response.data, {"error": "Report too expensive"})
+
+
+class DenseSeriesTests(TestCase):
+	"""Facts dated before the calendar still show up in dense series"""
+
+	def setUp(self):
+		self.client = staff_client()
+		self.day = datetime.date(2019, 3, 15)
+		self.assertFalse(CalendarDay.objects.filter(date__lte=self.day).exists())
+		self.enrollment = create_enrollment(enrollment_date=self.day)
+
+	def test_monthly_income(self):
+		response = self.client.get("/api/reports/monthly-income/")
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data["summary"]["total_enrollments"], 1)
+		self.assertEqual(response.data["monthly_data"][0]["date"], "2019-03")
+
+	def test_custom_report(self):
+		create_enrollment("Luna")
+		response = self.client.get(
+			"/api/reports/custom/",
+			{"source": "enrollments", "dimensions": "month", "dense": "true", "limit": "1000"},
+		)
+		results = response.data["results"]
+		self.assertEqual(results[0], {"month": "2019-03", "count": 1})
+		# Months without enrollments between it and today's are filled in
+		self.assertEqual(results[1], {"month": "2019-04", "count": 0})
+		self.assertEqual(sum(row["count"] for row in results), 2)
+
+	def test_attendance_by_date(self):
+		Attendance.objects.create(enrollment=self.enrollment, date=self.day)
+		response = self.client.get(
+			"/api/attendance/report_by_date/", {"date_from": "2019-03-14", "date_to": "2019-03-16"}
+		)
+		self.assertEqual(
+			[row["count"] for row in response.data],
+			[0, 1, 0],
+		)
@@ -0,0 +1,83 @@
+import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import Enrollment
+from api.sync import decode_cursor, encode_cursor
+
+from .helpers import create_enrollment, staff_client
+
+URL = "/api/enrollments/"
+
+
+@override_settings(DELTA_SYNC_LAG_SECONDS=0)
+class DeltaSyncTests(TestCase):
+	def setUp(self):
+		self.client = staff_client()
+
+	def sync(self, cursor, **params):
+		return self.client.get(URL, {"since": cursor, **params})
+
+	def ids(self, response):
+		return [row["id"] for row in response.data["results"]]
+
+	def test_cursor_round_trip(self):
+		now = timezone.now()
+		cursor = encode_cursor(now, 7, 3, now)
+		self.assertEqual(decode_cursor(cursor), (now, 7, 3, now))
+		self.assertEqual(decode_cursor("0"), (None, 0, 0, None))
+
+	def test_invalid_cursor(self):
+		self.assertEqual(self.sync("not-a-cursor").status_code, 400)
+
+	def test_pages_and_changes_after_the_cursor(self):
+		first, second = create_enrollment("Firulais"), create_enrollment("Luna")
+		page = self.sync("0", page_size=1)
+		self.assertEqual(self.ids(page), [first.pk])
+		self.assertTrue(page.data["has_more"])
+		page = self.sync(page.data["cursor"], page_size=1)
+		self.assertEqual(self.ids(page), [second.pk])
+		self.assertFalse(page.data["has_more"])
+
+		cursor = page.data["cursor"]
+		self.assertEqual(self.ids(self.sync(cursor)), [])
+		first.status = False
+		first.save()
+		self.assertEqual(self.ids(self.sync(cursor)), [first.pk])
+
+	def test_deletion_tombstone(self):
+		enrollment = create_enrollment()
+		cursor = self.sync("0").data["cursor"]
+		pk = enrollment.pk
+		enrollment.delete()
+		page = self.sync(cursor)
+		self.assertEqual(page.data["deleted"], [pk])
+		self.assertEqual(self.sync(page.data["cursor"]).data["deleted"], [])
+
+	@override_settings(DELTA_SYNC_LAG_SECONDS=60)
+	def test_recent_changes_wait_for_the_lag_window(self):
+		enrollment = create_enrollment()
+		page = self.sync("0")
+		self.assertEqual(self.ids(page), [])
+		Enrollment.objects.filter(pk=enrollment.pk).update(
+			updated_at=timezone.now() - datetime.timedelta(minutes=2)
+		)
+		self.assertEqual(self.ids(self.sync(page.data["cursor"])), [enrollment.pk])
+
+	@override_settings(TOMBSTONE_RETENTION_DAYS=30)
+	def test_expired_cursor(self):
+		synced_at = timezone.now() - datetime.timedelta(days=31)
+		self.assertEqual(self.sync(encode_cursor(synced_at, 1, 0, synced_at)).status_code, 410)
+
+	@override_settings(TOMBSTONE_RETENTION_DAYS=30)
+	def test_quiet_table_cursor_does_not_expire(self):
+		enrollment = create_enrollment()
+		Enrollment.objects.filter(pk=enrollment.pk).update(
+			updated_at=timezone.now() - datetime.timedelta(days=60)
+		)
+		cursor = self.sync("0").data["cursor"]
+		# The last change is older than the retention, the last sync isn't
+		page = self.sync(cursor)
+		self.assertEqual(page.status_code, 200)
+		self.assertEqual(self.ids(page), [])
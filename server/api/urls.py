@@ -13,12 +13,17 @@ from .views import (
 	ReportsViewSet,
 	TransportServiceViewSet,
 	UserViewSet,
+	attendance_events_view,
+	batch_view,
 	canine_attendance_view,
+	me_dashboard_view,
+	metrics_view,
 	password_reset_confirm,
 	password_reset_request,
 	password_reset_validate,
 	profile_view,
 	register_view,
+	slow_queries_view,
 	user_type_view,
 	verify_password,
 	verify_recaptcha_view,
@@ -36,6 +41,8 @@ router.register("internal-users", InternalUserViewSet, basename="internal-user")
 router.register("reports", ReportsViewSet, basename="reports")
 
 urlpatterns = [
+	# Before the router, whose attendance/<pk>/ route would match "events"
+	path("attendance/events/", attendance_events_view, name="attendance-events"),
 	path("", include(router.urls)),
 	path(
 		"reports/enrollments-by-plan-detailed/",
@@ -51,6 +58,8 @@ urlpatterns = [
 	path("profile/", profile_view, name="profile"),
 	path("canines/<int:canine_id>/attendance/", canine_attendance_view, name="canine-attendance"),
 	path("user-type/", user_type_view, name="user-type"),
+	path("me/dashboard/", me_dashboard_view, name="me-dashboard"),
+	path("batch/", batch_view, name="batch"),
 	path(
 		"reports/enrollments-by-plan/",
 		EnrollmentsByPlanReportView.as_view(),
@@ -74,4 +83,6 @@ urlpatterns = [
 		name="password_reset_validate",
 	),
 	path("recaptcha/verify/", verify_recaptcha_view, name="recaptcha-verify"),
+	path("slow-queries/", slow_queries_view, name="slow-queries"),
+	path("metrics/", metrics_view, name="metrics"),
 ]
@@ -1,26 +1,43 @@
+import asyncio
+import csv
+import hashlib
+import io
 import json
 import logging
-from datetime import timedelta
+from collections import deque
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from functools import partial
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import send_mail
-from django.db.models import Count, Q, Sum
-from django.db.models.functions import TruncMonth
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Value
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
 from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
-from rest_framework import filters, status, viewsets
+from django.utils.http import quote_etag, urlsafe_base64_decode, urlsafe_base64_encode
+from rest_framework import exceptions, filters, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, BasePermission, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ViewSet
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import attendance_analytics, caching, events, metrics, pricing, reports, revenue
+from .batch import BatchError, parse_requests, run_batch
+from .cohorts import cohort_report
+from .conditional import ConditionalGetMixin
 from .models import (
 	Attendance,
 	Canine,
@@ -31,22 +48,41 @@ from .models import (
 	TransportService,
 	User,
 )
+from .pagination import ExpirationKeysetPagination
+from .profiling import SerializerTimingMixin, profile_section
+from .roster import get_roster, summarize
+from .roster_import import RosterImporter
 from .serializers import (
 	AttendanceSerializer,
 	CanineSerializer,
 	ClientSerializer,
+	DashboardCanineSerializer,
 	EnrollmentPlanSerializer,
 	EnrollmentSerializer,
+	ExpiringEnrollmentSerializer,
 	InternalUserSerializer,
 	RegisterSerializer,
 	TransportServiceSerializer,
 	UserSerializer,
 )
+from .slow_queries import slow_query_log
+from .sync import DeltaSyncMixin
 
 UserModel = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_EXPIRING_WITHIN = 14
+MAX_EXPIRING_WITHIN = 365
+DASHBOARD_ATTENDANCE = 10
+MAX_DASHBOARD_ATTENDANCE = 50
+BREED_REPORT_LIMIT = 10
+EVENTS_HEARTBEAT_INTERVAL = 15
+EVENTS_RETRY_MS = 5000
+INCOME_MODE_CASH = "cash"
+INCOME_MODE_ACCRUAL = "accrual"
+
 
 class IsDirectorOrAdmin(BasePermission):
 	"""
@@ -69,7 +105,32 @@ class IsDirectorOrAdmin(BasePermission):
 		return False
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def _grouped_report(source, dimension, limit=None, **options):
+	"""
+	Response with the count per ``dimension`` keyed by its ORM path, the shape of the
+	report_by_* actions; 400 when the report can't run (e.g. too costly).
+	"""
+	field = reports.SOURCES[source].dimensions[dimension].field
+	spec = {"source": source, "dimensions": [dimension], "limit": limit, **options}
+	try:
+		report = reports.run_report(spec)
+	except reports.ReportError as e:
+		return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+	return Response([{field: row[dimension], "count": row["count"]} for row in report["results"]])
+
+
+class IsInternalUser(BasePermission):
+	"""
+	Permission class to allow only staff members (admins or any internal role).
+	"""
+
+	def has_permission(self, request, view):
+		if not request.user or not request.user.is_authenticated:
+			return False
+		return request.user.is_staff or hasattr(request.user, "internal_profile")
+
+
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet for User management.
 	Administrators and Directors can manage all users.
@@ -104,11 +165,12 @@ class UserViewSet(viewsets.ModelViewSet):
 		return Response(serializer.data)
 
 
-class InternalUserViewSet(viewsets.ModelViewSet):
+class InternalUserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
 	"""Admin-only endpoints to create, list and update internal users"""
 
 	queryset = InternalUser.objects.all()
 	serializer_class = InternalUserSerializer
+	validator_fields = ("updated_at", "user__updated_at")
 	permission_classes = [IsAdminUser]
 	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 	search_fields = ["user__username", "user__email", "role"]
@@ -167,13 +229,14 @@ class InternalUserViewSet(viewsets.ModelViewSet):
 		return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet for Client management.
 	"""
 
 	queryset = Client.objects.all()
 	serializer_class = ClientSerializer
+	validator_fields = ("updated_at", "user__updated_at")
 	permission_classes = [IsAuthenticated]
 	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 	search_fields = ["user__username", "user__email", "user__first_name", "user__last_name"]
@@ -188,14 +251,56 @@ class ClientViewSet(viewsets.ModelViewSet):
 		serializer = CanineSerializer(canines, many=True)
 		return Response(serializer.data)
 
+	@action(
+		detail=False,
+		methods=["post"],
+		url_path="import",
+		permission_classes=[IsAdminUser],
+		parser_classes=[MultiPartParser],
+	)
+	def import_roster(self, request):
+		"""
+		Bulk import clients, canines and enrollments from an uploaded CSV (`file`).
+		Send `dry_run=true` to only validate. Returns a per-row error report.
+		"""
+		upload = request.FILES.get("file")
+		if upload is None:
+			return Response({"error": "CSV file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+		importer = RosterImporter(dry_run=request.data.get("dry_run", "").lower() == "true")
+		text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+		try:
+			# Read the whole file once first, so nothing is imported from an unreadable one
+			deque(csv.reader(text), maxlen=0)
+		except (UnicodeDecodeError, csv.Error):
+			return Response(
+				{"error": "The file must be a UTF-8 encoded CSV"},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
+		text.seek(0)
+		result = importer.run(text)
+		created = any(result.created.values())
+		return Response(
+			result.as_dict(),
+			status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+		)
+
 
-class CanineViewSet(viewsets.ModelViewSet):
+class CanineViewSet(
+	SerializerTimingMixin, DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
 	"""
 	ViewSet for Canine management.
 	"""
 
 	queryset = Canine.objects.all()
 	serializer_class = CanineSerializer
+	validator_fields = (
+		"updated_at",
+		"client__user__updated_at",
+		"current_enrollment__updated_at",
+		"current_enrollment__plan__updated_at",
+	)
 	permission_classes = [IsAuthenticated]
 	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 	search_fields = ["name", "breed"]
@@ -203,7 +308,7 @@ class CanineViewSet(viewsets.ModelViewSet):
 	ordering = ["name"]
 
 	def get_queryset(self):
-		queryset = Canine.objects.all()
+		queryset = Canine.objects.select_related("client__user", "current_enrollment__plan")
 		# Filters
 		size = self.request.query_params.get("size", None)
 		breed = self.request.query_params.get("breed", None)
@@ -246,7 +351,9 @@ class TransportServiceViewSet(viewsets.ModelViewSet):
 	permission_classes = [IsAuthenticated]
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(
+	SerializerTimingMixin, DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
 	"""
 	ViewSet for Enrollment management.
 	Directors and Admins can update enrollments.
@@ -254,6 +361,12 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
 
 	queryset = Enrollment.objects.all()
 	serializer_class = EnrollmentSerializer
+	validator_fields = (
+		"updated_at",
+		"canine__updated_at",
+		"plan__updated_at",
+		"transport_service__updated_at",
+	)
 	permission_classes = [IsAuthenticated]
 	filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 	search_fields = ["canine__name", "plan__name"]
@@ -266,7 +379,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
 		"""
 		if self.action in {"update", "partial_update", "destroy"}:
 			return [IsDirectorOrAdmin()]
-		return [IsAuthenticated()]
+		return super().get_permissions()
 
 	def get_queryset(self):
 		queryset = Enrollment.objects.select_related("canine", "plan", "transport_service").all()
@@ -291,50 +404,69 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
 
 		return queryset
 
+	@action(detail=False, methods=["get"], permission_classes=[IsInternalUser])
+	def expiring(self, request):
+		"""Active enrollments expiring in the next ``within`` days, soonest first"""
+		try:
+			within = int(request.query_params.get("within", DEFAULT_EXPIRING_WITHIN))
+		except ValueError:
+			return Response(
+				{"error": "within must be a valid integer"}, status=status.HTTP_400_BAD_REQUEST
+			)
+		if not 0 <= within <= MAX_EXPIRING_WITHIN:
+			return Response(
+				{"error": f"within must be between 0 and {MAX_EXPIRING_WITHIN}"},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
+
+		today = timezone.now().date()
+		queryset = Enrollment.objects.select_related(
+			"canine__client__user", "plan", "transport_service"
+		).filter(
+			status=True,
+			expiration_date__gte=today,
+			expiration_date__lte=today + timedelta(days=within),
+		)
+		paginator = ExpirationKeysetPagination()
+		page = paginator.paginate_queryset(queryset, request)
+		serializer = ExpiringEnrollmentSerializer(page, many=True, context={"today": today})
+		return paginator.get_paginated_response(serializer.data)
+
 	@action(detail=False, methods=["get"])
 	def report_by_plan(self, request):
 		"""Report: Enrollments by plan"""
-		enrollments = (
-			Enrollment.objects.values("plan__name").annotate(count=Count("id")).order_by("-count")
-		)
-		return Response(enrollments.data if hasattr(enrollments, "data") else list(enrollments))
+		return _grouped_report("enrollments", "plan", order=["-count"])
 
 	@action(detail=False, methods=["get"])
 	def report_by_size(self, request):
 		"""Report: Enrollments by canine size"""
-		enrollments = (
-			Enrollment.objects.values("canine__size").annotate(count=Count("id")).order_by("-count")
-		)
-		return Response(enrollments.data if hasattr(enrollments, "data") else list(enrollments))
+		return _grouped_report("enrollments", "size", order=["-count"])
 
 	@action(detail=False, methods=["get"])
 	def report_by_transport(self, request):
 		"""Report: Enrollments by transport service"""
-		enrollments = (
-			Enrollment.objects.values("transport_service__type")
-			.annotate(count=Count("id"))
-			.order_by("-count")
-		)
-		return Response(enrollments.data if hasattr(enrollments, "data") else list(enrollments))
+		return _grouped_report("enrollments", "transport", order=["-count"])
 
 	@action(detail=False, methods=["get"])
 	def report_by_breed(self, request):
 		"""Report: Enrollments by breed (top 10)"""
-		enrollments = (
-			Enrollment.objects.values("canine__breed")
-			.annotate(count=Count("id"))
-			.order_by("-count")[:10]
-		)
-		return Response(enrollments.data if hasattr(enrollments, "data") else list(enrollments))
+		return _grouped_report("enrollments", "breed", order=["-count"], limit=BREED_REPORT_LIMIT)
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(
+	SerializerTimingMixin, DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
 	"""
 	ViewSet for Attendance management.
 	"""
 
 	queryset = Attendance.objects.all()
 	serializer_class = AttendanceSerializer
+	validator_fields = (
+		"updated_at",
+		"enrollment__canine__updated_at",
+		"enrollment__canine__client__user__updated_at",
+	)
 	permission_classes = [IsAuthenticated]
 	filter_backends = [filters.OrderingFilter]
 	ordering_fields = ["date", "arrival_time"]
@@ -371,6 +503,19 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 		serializer = self.get_serializer(attendances, many=True)
 		return Response(serializer.data)
 
+	@action(detail=False, methods=["get"], permission_classes=[IsInternalUser])
+	def roster(self, request):
+		"""Every canine expected on a day (default: today) with its attendance state"""
+		day = request.query_params.get("date", None)
+		try:
+			day = date.fromisoformat(day) if day else timezone.now().date()
+		except ValueError:
+			return Response(
+				{"error": "date must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST
+			)
+		rows = get_roster(day)
+		return Response({"date": day, "summary": summarize(rows), "results": rows})
+
 	@action(detail=False, methods=["post"])
 	def check_in(self, request):
 		"""Register canine arrival"""
@@ -392,8 +537,10 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 			if not created:
 				attendance.arrival_time = timezone.now().time()
 				attendance.save()
+			metrics.record_check_in()
 
 			serializer = self.get_serializer(attendance)
+			transaction.on_commit(partial(events.publish, "check_in", serializer.data))
 			return Response(
 				serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
 			)
@@ -415,30 +562,29 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 		attendance.withdrawal_reason = withdrawal_reason
 		attendance.save()
 		serializer = self.get_serializer(attendance)
+		transaction.on_commit(partial(events.publish, "check_out", serializer.data))
 		return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 	@action(detail=False, methods=["get"])
 	def report_by_date(self, request):
 		"""Report: Attendance by date range"""
-		date_from = request.query_params.get("date_from", None)
-		date_to = request.query_params.get("date_to", None)
-
-		attendances = Attendance.objects.all()
-
-		if date_from:
-			attendances = attendances.filter(date__gte=date_from)
-		if date_to:
-			attendances = attendances.filter(date__lte=date_to)
-
-		data = attendances.values("date").annotate(count=Count("id")).order_by("date")
-
-		return Response(list(data))
+		try:
+			bounds = {
+				bound: date.fromisoformat(request.query_params[bound])
+				for bound in ("date_from", "date_to")
+				if request.query_params.get(bound)
+			}
+		except ValueError:
+			return Response(
+				{"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST
+			)
+		# Every day of the range, days without attendance included
+		return _grouped_report("attendance", "date", dense=True, **bounds)
 
 	@action(detail=False, methods=["get"])
 	def report_by_status(self, request):
 		"""Report: Attendance by status"""
-		data = Attendance.objects.values("status").annotate(count=Count("id")).order_by("-count")
-		return Response(list(data))
+		return _grouped_report("attendance", "status", order=["-count"])
 
 
 @api_view(["POST"])
@@ -473,17 +619,15 @@ def profile_view(request):
 
 		# GET: Retrieve profile data
 		if request.method == "GET":
-			user_data = UserSerializer(user).data
-			client_data = ClientSerializer(client).data
-
-			profile_data = {
-				"user": user_data,
-				"client": client_data,
-			}
-
-			canines = Canine.objects.filter(client=client)
-			canines_data = CanineSerializer(canines, many=True).data
-			profile_data["canines"] = canines_data
+			canines = Canine.objects.filter(client=client).select_related(
+				"client__user", "current_enrollment__plan"
+			)
+			with profile_section("serializer"):
+				profile_data = {
+					"user": UserSerializer(user).data,
+					"client": ClientSerializer(client).data,
+					"canines": CanineSerializer(canines, many=True).data,
+				}
 
 			return Response(profile_data)
 
@@ -626,6 +770,74 @@ def verify_recaptcha_view(request):
 	return Response(data)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def me_dashboard_view(request):
+	"""
+	Everything the client area needs in one call: user, client, canines with their
+	current enrollment, enrollments and latest ``?attendance=N`` attendance records.
+	Responses carry an ETag; an unchanged dashboard is answered with 304.
+	"""
+	try:
+		attendance_limit = int(request.query_params.get("attendance", DASHBOARD_ATTENDANCE))
+	except ValueError:
+		return Response(
+			{"error": "attendance must be a valid integer"}, status=status.HTTP_400_BAD_REQUEST
+		)
+	attendance_limit = min(max(attendance_limit, 0), MAX_DASHBOARD_ATTENDANCE)
+
+	try:
+		client = Client.objects.get(user=request.user)
+	except Client.DoesNotExist:
+		return Response({"error": "Client profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+	# Fixed number of queries: canines, enrollments and the latest attendance of
+	# each enrollment (sliced prefetch, a window function in the database)
+	canines = list(
+		Canine.objects.filter(client=client)
+		.select_related(
+			"client__user", "current_enrollment__plan", "current_enrollment__transport_service"
+		)
+		.prefetch_related(
+			Prefetch(
+				"enrollments",
+				queryset=Enrollment.objects.select_related("plan", "transport_service").order_by(
+					"-enrollment_date"
+				),
+			),
+			Prefetch(
+				"enrollments__attendances",
+				queryset=Attendance.objects.order_by("-date")[:attendance_limit],
+				to_attr="recent_attendance",
+			),
+		)
+	)
+	for canine in canines:
+		latest = [
+			a for enrollment in canine.enrollments.all() for a in enrollment.recent_attendance
+		]
+		latest.sort(key=lambda attendance: attendance.date, reverse=True)
+		canine.recent_attendance = latest[:attendance_limit]
+
+	with profile_section("serializer"):
+		data = {
+			"user": UserSerializer(request.user).data,
+			"client": {"id": client.id},
+			"canines": DashboardCanineSerializer(canines, many=True).data,
+		}
+
+	etag = quote_etag(
+		hashlib.sha1(
+			json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode(),
+			usedforsecurity=False,
+		).hexdigest()
+	)
+	response = get_conditional_response(request, etag=etag) or Response(data)
+	response["ETag"] = etag
+	patch_cache_control(response, private=True, no_cache=True)
+	return response
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def canine_attendance_view(request, canine_id):
@@ -637,7 +849,9 @@ def canine_attendance_view(request, canine_id):
 
 	try:
 		client = Client.objects.get(user=user)
-		canine = get_object_or_404(Canine, id=canine_id)
+		canine = get_object_or_404(
+			Canine.objects.select_related("client__user", "current_enrollment__plan"), id=canine_id
+		)
 
 		if canine.client.id != client.id:
 			return Response(
@@ -647,9 +861,11 @@ def canine_attendance_view(request, canine_id):
 
 		enrollments = Enrollment.objects.filter(canine=canine)
 		attendances = Attendance.objects.filter(enrollment__in=enrollments).order_by("-date")
-		attendance_data = AttendanceSerializer(attendances, many=True).data
+		with profile_section("serializer"):
+			attendance_data = AttendanceSerializer(attendances, many=True).data
+			canine_data = CanineSerializer(canine).data
 
-		return Response({"canine": CanineSerializer(canine).data, "attendances": attendance_data})
+		return Response({"canine": canine_data, "attendances": attendance_data})
 
 	except Client.DoesNotExist:
 		return Response({"error": "Client profile not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -665,42 +881,56 @@ class EnrollmentsByPlanReportView(APIView):
 
 	def get(self, request):
 		# Get query parameters for filtering
-		status_filter = request.query_params.get("status", None)
-		active_only = request.query_params.get("active_only", None)
-		include_empty = request.query_params.get("include_empty", None)
-
-		plans = EnrollmentPlan.objects.filter(active=True).annotate(
-			total_enrollments=Count("enrollments"),
-			active_enrollments=Count("enrollments", filter=Q(enrollments__status=True)),
-			inactive_enrollments=Count("enrollments", filter=Q(enrollments__status=False)),
+		params = {
+			"status_filter": request.query_params.get("status", None),
+			"active_only": request.query_params.get("active_only", None),
+			"include_empty": request.query_params.get("include_empty", None),
+		}
+		return Response(
+			caching.cached(
+				"enrollments_by_plan",
+				["enrollments"],
+				lambda: self.build_report(**params),
+				params=params,
+			)
 		)
 
+	def build_report(self, status_filter, active_only, include_empty):
+		# Counters are maintained on the plans (see api.counters): no enrollments scan
+		plans = EnrollmentPlan.objects.filter(active=True)
+
 		if status_filter is not None:
-			status_bool = status_filter.lower() == "true"
 			# If status is filtered, we only count enrollments with that status
-			plans = EnrollmentPlan.objects.filter(active=True).annotate(
-				total_enrollments=Count("enrollments", filter=Q(enrollments__status=status_bool)),
-				active_enrollments=Count(
-					"enrollments",
-					filter=Q(enrollments__status=True) & Q(enrollments__status=status_bool),
-				),
-				inactive_enrollments=Count(
-					"enrollments",
-					filter=Q(enrollments__status=False) & Q(enrollments__status=status_bool),
-				),
+			if status_filter.lower() == "true":
+				plans = plans.annotate(
+					reported_total=F("active_enrollments"),
+					reported_active=F("active_enrollments"),
+					reported_inactive=Value(0),
+				)
+			else:
+				plans = plans.annotate(
+					reported_total=F("inactive_enrollments"),
+					reported_active=Value(0),
+					reported_inactive=F("inactive_enrollments"),
+				)
+		else:
+			plans = plans.annotate(
+				reported_total=F("total_enrollments"),
+				reported_active=F("active_enrollments"),
+				reported_inactive=F("inactive_enrollments"),
 			)
 
 		# Order by total enrollments
-		plans = plans.order_by("-total_enrollments")
+		plans = plans.order_by("-reported_total")
 
 		report_data = []
 
 		for plan in plans:
 			# Filter logic
 			if active_only and active_only.lower() == "true":
-				if plan.active_enrollments == 0:
+				if plan.reported_active == 0:
 					continue
-			elif plan.total_enrollments == 0 and not include_empty:
+			elif plan.reported_total == 0 and not include_empty:
 				continue
 
 			plan_data = {
@@ -709,9 +939,9 @@ class EnrollmentsByPlanReportView(APIView):
 				"duration": plan.duration,
 				"duration_display": plan.get_duration_display(),
 				"price": str(plan.price),
-				"total_enrollments": plan.total_enrollments,
-				"active_enrollments": plan.active_enrollments,
-				"inactive_enrollments": plan.inactive_enrollments,
+				"total_enrollments": plan.reported_total,
+				"active_enrollments": plan.reported_active,
+				"inactive_enrollments": plan.reported_inactive,
 			}
 			report_data.append(plan_data)
 
@@ -730,13 +960,16 @@ class EnrollmentsByPlanReportView(APIView):
 			"plans": report_data,
 		}
 
-		return Response(response_data)
+		return response_data
 
 
 class MonthlyIncomeReportView(APIView):
 	"""
 	Report endpoint for monthly income from enrollments.
 	Only Directors and Admins can access this report.
+
+	``mode=cash`` (default) books the price paid for each enrollment in the month
+	it starts; ``mode=accrual`` spreads it over the days the enrollment covers.
 	"""
 
 	permission_classes = [IsDirectorOrAdmin]
@@ -747,67 +980,83 @@ class MonthlyIncomeReportView(APIView):
 		year_from = request.query_params.get("year_from", None)
 		year_to = request.query_params.get("year_to", None)
 		status_filter = request.query_params.get("status", None)
+		mode = request.query_params.get("mode", INCOME_MODE_CASH)
+
+		if mode not in {INCOME_MODE_CASH, INCOME_MODE_ACCRUAL}:
+			return Response(
+				{"error": f"mode must be {INCOME_MODE_CASH} or {INCOME_MODE_ACCRUAL}"},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
 
-		# Base queryset - get enrollments with plan price
-		enrollments = Enrollment.objects.select_related("plan").all()
+		spec = {"source": "enrollments", "dimensions": ["month"], "measures": ["count", "income"]}
 
 		# Apply status filter if provided
 		if status_filter is not None:
-			status_bool = status_filter.lower() == "true"
-			enrollments = enrollments.filter(status=status_bool)
+			spec["filters"] = {"status": status_filter.lower() == "true"}
 
-		# Apply year filters
+		# Apply year filters (as date ranges, which can use the enrollment_date indexes)
 		try:
 			if year:
 				# Filter by specific year
-				enrollments = enrollments.filter(enrollment_date__year=int(year))
+				spec["date_from"] = date(int(year), 1, 1)
+				spec["date_to"] = date(int(year), 12, 31)
 			elif year_from or year_to:
 				# Filter by year range
 				if year_from:
-					enrollments = enrollments.filter(enrollment_date__year__gte=int(year_from))
+					spec["date_from"] = date(int(year_from), 1, 1)
 				if year_to:
-					enrollments = enrollments.filter(enrollment_date__year__lte=int(year_to))
+					spec["date_to"] = date(int(year_to), 12, 31)
 		except (ValueError, TypeError):
 			return Response(
 				{"error": "Year parameters must be valid integers"},
 				status=status.HTTP_400_BAD_REQUEST,
 			)
 
-		# Group by year and month, and sum the plan prices
-		monthly_data = (
-			enrollments.annotate(month=TruncMonth("enrollment_date"))
-			.values("month")
-			.annotate(total_income=Sum("plan__price"), enrollment_count=Count("id"))
-			.order_by("month")
-		)
+		if mode == INCOME_MODE_ACCRUAL:
+			# Prices paid spread over the days each enrollment covers
+			accrued = revenue.accrued_income(
+				spec.get("filters", {}).get("status"), spec.get("date_from"), spec.get("date_to")
+			)
+			months = accrued["months"]
+			total_income = sum((entry["income"] for entry in months), Decimal("0"))
+			total_enrollments = accrued["enrollments"]
+		else:
+			# Income per month, months without enrollments included
+			try:
+				months = reports.run_report({**spec, "dense": True, "limit": None})["results"]
+			except reports.ReportError as e:
+				return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+			total_income = sum((Decimal(str(entry["income"])) for entry in months), Decimal("0"))
+			total_enrollments = sum(entry["count"] for entry in months)
+
+		# The series covers whole years; months before the first and after the last one
+		# with enrollments (e.g. the rest of the current year) would skew the summary
+		with_enrollments = [index for index, entry in enumerate(months) if entry["count"]]
+		months = months[with_enrollments[0] : with_enrollments[-1] + 1] if with_enrollments else []
 
 		# Build response data
 		monthly_income = []
 
-		for entry in monthly_data:
+		for entry in months:
+			month = datetime.strptime(entry["month"], "%Y-%m")
 			monthly_income.append(
 				{
-					"year": entry["month"].year,
-					"month": entry["month"].month,
-					"month_name": entry["month"].strftime("%B"),
-					"month_short": entry["month"].strftime("%b"),
-					"date": entry["month"].strftime("%Y-%m"),
-					"income": str(entry["total_income"] or Decimal("0")),
-					"enrollment_count": entry["enrollment_count"],
+					"year": month.year,
+					"month": month.month,
+					"month_name": month.strftime("%B"),
+					"month_short": month.strftime("%b"),
+					"date": entry["month"],
+					"income": str(entry["income"] or Decimal("0")),
+					"enrollment_count": entry["count"],
 				}
 			)
 
-		total_income = (
-			sum(Decimal(item["income"]) for item in monthly_income)
-			if monthly_income
-			else Decimal("0")
-		)
-		total_enrollments = sum(item["enrollment_count"] for item in monthly_income)
 		avg_monthly_income = (
 			(total_income / len(monthly_income)) if monthly_income else Decimal("0")
 		)
 
 		response_data = {
+			"mode": mode,
 			"summary": {
 				"total_income": str(total_income),
 				"total_enrollments": total_enrollments,
@@ -883,6 +1132,98 @@ class ReportsViewSet(ViewSet):
 
 		return Response(result)
 
+	@action(detail=False, methods=["get"], permission_classes=[IsDirectorOrAdmin])
+	def custom(self, request):
+		"""
+		Ad hoc report, e.g. ``?source=enrollments&dimensions=plan,month&measures=count,income
+		&date_from=2025-01-01&size=small&order=-income``. See :mod:`api.reports`.
+		"""
+		try:
+			spec = reports.parse_spec(request.query_params)
+			report = reports.run_report(spec)
+		except reports.ReportError as e:
+			return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(
+			{
+				"source": spec["source"],
+				"dimensions": spec["dimensions"],
+				"measures": spec["measures"],
+				**report,
+			}
+		)
+
+	@action(detail=False, methods=["get"], permission_classes=[IsDirectorOrAdmin])
+	def pivot(self, request):
+		"""
+		Cross tab with subtotals, e.g. ``?rows=plan&columns=month&measures=count,income``
+		(``source``, date range and filters as in ``custom``).
+		"""
+		try:
+			spec = reports.parse_pivot_spec(request.query_params)
+			pivot = reports.run_pivot(spec)
+		except reports.ReportError as e:
+			return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(
+			{
+				"source": spec["source"],
+				"rows": spec["dimensions"][0],
+				"columns": spec["dimensions"][1] if len(spec["dimensions"]) > 1 else None,
+				"measures": spec["measures"],
+				**pivot,
+			}
+		)
+
+	@action(detail=False, methods=["get"], permission_classes=[IsDirectorOrAdmin])
+	def cohorts(self, request):
+		"""Renewal rate per plan duration and retention curve per first-enrollment month"""
+		return Response(cohort_report())
+
+	@action(
+		detail=False,
+		methods=["get"],
+		url_path="attendance-analytics",
+		permission_classes=[IsDirectorOrAdmin],
+	)
+	def attendance_analytics(self, request):
+		"""
+		Arrivals per weekday and hour, and average stay per canine size and plan, from
+		``date_from`` to ``date_to`` (default: the last 90 days)
+		"""
+		date_from, date_to = attendance_analytics.default_range(timezone.localdate())
+		try:
+			if request.query_params.get("date_from"):
+				date_from = date.fromisoformat(request.query_params["date_from"])
+			if request.query_params.get("date_to"):
+				date_to = date.fromisoformat(request.query_params["date_to"])
+		except ValueError:
+			return Response(
+				{"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST
+			)
+		if date_from > date_to:
+			return Response(
+				{"error": "date_from must not be after date_to"},
+				status=status.HTTP_400_BAD_REQUEST,
+			)
+		return Response(attendance_analytics.attendance_analytics(date_from, date_to))
+
+	@action(
+		detail=False,
+		methods=["post"],
+		url_path="pricing-simulation",
+		permission_classes=[IsDirectorOrAdmin],
+	)
+	def pricing_simulation(self, request):
+		"""
+		Projected monthly income of hypothetical plan prices against the enrollment
+		history, e.g. ``{"scenarios": [{"name": "Plus 10%", "factor": 1.1}]}``.
+		See :mod:`api.pricing`.
+		"""
+		try:
+			spec = pricing.parse_simulation(request.data, pricing.current_prices())
+		except pricing.PricingError as e:
+			return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(pricing.simulate(spec))
+
 	@action(detail=False, methods=["get"], url_path="enrollments-by-transport")
 	def enrollments_by_transport(self, request):
 		limit = int(request.query_params.get("limit", 1))
@@ -1020,3 +1361,122 @@ def password_reset_validate(_request, uidb64, token):
 		return Response({"detail": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
 
 	return Response({"detail": "Token valid."}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def slow_queries_view(request):
+	"""
+	List the slow queries recorded by this server process (most recent first),
+	with their originating view, parameters and EXPLAIN plan. DELETE clears the log.
+	"""
+	if request.method == "DELETE":
+		slow_query_log.clear()
+		return Response(status=status.HTTP_204_NO_CONTENT)
+
+	return Response(
+		{
+			"threshold_ms": getattr(settings, "SLOW_QUERY_THRESHOLD_MS", None),
+			"queries": slow_query_log.snapshot(),
+		}
+	)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def batch_view(request):
+	"""
+	Run several GET requests in one call, e.g. the report calls of the director dashboard.
+
+	Body: ``{"requests": [{"path": "/api/...", "id": <optional>}], "parallel": false}``.
+	Each sub-request is answered as ``{"id", "path", "status", "body"}``, in order, with
+	the permissions of the caller. ``parallel`` runs them on a small thread pool.
+	"""
+	try:
+		items = parse_requests(request.data)
+	except BatchError as e:
+		return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+	parallel = request.data.get("parallel") is True
+	return Response({"responses": run_batch(request, items, parallel=parallel)})
+
+
+def metrics_view(request):
+	"""
+	Prometheus scrape endpoint. Requires ``Authorization: Bearer <METRICS_TOKEN>``
+	when a token is configured, else a staff user.
+	"""
+	token = getattr(settings, "METRICS_TOKEN", "")
+	if token:
+		header = request.headers.get("Authorization", "")
+		if not constant_time_compare(header, f"Bearer {token}"):
+			return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+	else:
+		try:
+			user = _request_user(request)
+		except exceptions.AuthenticationFailed:
+			return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+		if not user.is_authenticated:
+			return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+		if not user.is_staff:
+			return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+	return HttpResponse(metrics.registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _request_user(request):
+	"""
+	Authenticate a plain Django view (metrics, live events): JWT in the
+	``Authorization`` header or in the ``token`` query parameter (``EventSource``
+	can't send headers), else the session.
+	"""
+	authentication = JWTAuthentication()
+	token = request.GET.get("token")
+	if token:
+		validated = authentication.get_validated_token(token)
+		return authentication.get_user(validated)
+	authenticated = authentication.authenticate(request)
+	if authenticated is not None:
+		return authenticated[0]
+	return request.user
+
+
+async def attendance_events_view(request):
+	"""
+	Server-Sent Events stream of check-ins and check-outs for the front desk board,
+	instead of polling ``/api/attendance/today/``. Each event carries the attendance
+	as serialized by the API; a ``resync`` event means events were lost and the
+	roster should be reloaded. Needs the ASGI application (e.g. uvicorn or daphne);
+	a WSGI worker would be held by the stream forever.
+	"""
+	if not isinstance(request, ASGIRequest):
+		return JsonResponse(
+			{"error": "Live events are only served by the ASGI application"},
+			status=status.HTTP_501_NOT_IMPLEMENTED,
+		)
+	try:
+		request.user = await sync_to_async(_request_user)(request)
+	except exceptions.AuthenticationFailed:
+		return JsonResponse(
+			{"error": "Invalid or expired token"}, status=status.HTTP_401_UNAUTHORIZED
+		)
+	if not request.user.is_authenticated:
+		return JsonResponse(
+			{"error": "Authentication credentials were not provided"},
+			status=status.HTTP_401_UNAUTHORIZED,
+		)
+	if not await sync_to_async(IsInternalUser().has_permission)(request, None):
+		return JsonResponse({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+
+	async def stream():
+		async with events.broadcaster.subscribe() as subscription:
+			yield f"retry: {EVENTS_RETRY_MS}\n\n"
+			while True:
+				try:
+					yield await asyncio.wait_for(subscription.get(), EVENTS_HEARTBEAT_INTERVAL)
+				except TimeoutError:
+					# Comment line: keeps proxies from closing an idle connection
+					yield ": heartbeat\n\n"
+
+	response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+	response["Cache-Control"] = "no-cache"
+	response["X-Accel-Buffering"] = "no"
+	return response
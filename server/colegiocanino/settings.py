@@ -91,6 +91,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+	"api.middleware.MetricsMiddleware",
+	"api.middleware.RequestProfilingMiddleware",
+	"api.middleware.SlowQueryLogMiddleware",
 	"django.middleware.security.SecurityMiddleware",
 	"django.contrib.sessions.middleware.SessionMiddleware",
 	"corsheaders.middleware.CorsMiddleware",
@@ -208,3 +211,92 @@ EMAIL_USE_TLS = True
 # Read and sanitize email credentials to avoid stray non-ascii / invisible chars
 EMAIL_HOST_USER = _clean_env_str("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = _clean_env_str("EMAIL_HOST_PASSWORD")
+
+# Request profiling (Server-Timing header + one structured log line per request).
+# Staff users can profile a single request by sending the header below with value "1".
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "0") == "1"
+REQUEST_PROFILING_HEADER = "X-Profile"
+
+LOGGING = {
+	"version": 1,
+	"disable_existing_loggers": False,
+	"handlers": {
+		"console": {"class": "logging.StreamHandler"},
+	},
+	"loggers": {
+		"api": {"handlers": ["console"], "level": os.getenv("API_LOG_LEVEL", "INFO")},
+	},
+}
+
+# Slow query log: queries above the threshold (in ms) are kept with their EXPLAIN plan.
+# SLOW_QUERY_EXPLAIN_ANALYZE runs EXPLAIN ANALYZE (which executes the query) on plain SELECTs only.
+# Set SLOW_QUERY_THRESHOLD_MS to an empty value to disable it.
+SLOW_QUERY_THRESHOLD_MS = (
+	float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+	if os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")
+	else None
+)
+SLOW_QUERY_LOG_SIZE = 100
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv("SLOW_QUERY_EXPLAIN_ANALYZE", "0") == "1"
+
+# Prometheus metrics (/api/metrics/). With several worker processes, point
+# METRICS_MULTIPROCESS_DIR to a directory shared by all of them so the endpoint
+# aggregates every worker. METRICS_TOKEN, when set, is required as a Bearer token;
+# without it only staff users can read the metrics.
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR") or None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = _clean_env_str("METRICS_TOKEN")
+
+# Cache used for reports. Invalidations only reach the process that made them unless the
+# backend is shared, so caching is disabled (DummyCache) until CACHE_BACKEND/CACHE_LOCATION
+# point to a shared backend (e.g. django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache). LocMemCache is only safe with a single process.
+CACHES = {
+	"default": {
+		"BACKEND": os.getenv("CACHE_BACKEND") or "django.core.cache.backends.dummy.DummyCache",
+		"LOCATION": os.getenv("CACHE_LOCATION", ""),
+	}
+}
+
+# Password hashing processes of roster imports, shared by every upload of a worker.
+ROSTER_IMPORT_WORKERS = int(os.getenv("ROSTER_IMPORT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+# In-process scheduler for daily maintenance jobs (job name -> local time "HH:MM").
+# Leave it disabled when the management commands are run from cron instead.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "0") == "1"
+SCHEDULED_JOBS = {
+	"expire_enrollments": os.getenv("EXPIRE_ENROLLMENTS_AT", "00:05"),
+	"warm_roster": os.getenv("WARM_ROSTER_AT", "06:00"),
+	"prune_tombstones": "03:00",
+	"extend_calendar": "03:30",
+	"mark_absences": os.getenv("MARK_ABSENCES_AT", "21:00"),
+}
+
+# Delta sync (?since= on canines, enrollments and attendance): rows changed in the
+# last DELTA_SYNC_LAG_SECONDS are held back until in-flight transactions commit.
+# Deletion tombstones are kept TOMBSTONE_RETENTION_DAYS; older cursors must resync.
+DELTA_SYNC_LAG_SECONDS = 2
+TOMBSTONE_RETENTION_DAYS = 30
+
+# Backend of the live attendance events stream: api.events.LocalBackend delivers within
+# one process; api.events.PostgresBackend fans out to every worker with LISTEN/NOTIFY.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "api.events.LocalBackend")
+
+# Report engine (/api/reports/custom/): allowed dimensions per report, maximum rows
+# returned and maximum PostgreSQL planner cost (empty REPORT_MAX_COST disables the guard).
+REPORT_MAX_DIMENSIONS = 3
+REPORT_MAX_ROWS = 1000
+REPORT_MAX_COST = (
+	float(os.getenv("REPORT_MAX_COST", "1000000"))
+	if os.getenv("REPORT_MAX_COST", "1000000")
+	else None
+)
+
+# Cohort report: an enrollment counts as renewed when the next one starts at most this
+# many days after it expires.
+RENEWAL_GRACE_DAYS = 15
+
+# Calendar dimension (api.calendar_days): days are kept up to the end of the year
+# CALENDAR_YEARS_AHEAD years from now; holidays come from this function (year -> {date: name}).
+CALENDAR_YEARS_AHEAD = 1
+CALENDAR_HOLIDAYS = "api.calendar_days.colombian_holidays"
@@ -0,0 +1,134 @@
+"""
+Benchmark of the expired enrollments sweep (api.expirations).
+
+Creates a throwaway SQLite database (or uses DATABASE_URL with --keep-db),
+inserts ``--enrollments`` active enrollments of which ``--expired-rate`` have
+already expired, and times the batched sweep against a per-row ``save()`` loop
+run on a sample and extrapolated:
+
+    python tests/benchmarks/bench_expirations.py --enrollments 1000000
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parents[2] / "server"
+
+
+def setup_django(database_url):
+	sys.path.insert(0, str(SERVER_DIR))
+	os.environ["DATABASE_URL"] = database_url
+	os.environ.setdefault("SECRET_KEY", "benchmark")
+	os.environ.setdefault("DJANGO_SETTINGS_MODULE", "colegiocanino.settings")
+	import django
+
+	django.setup()
+	from django.core.management import call_command
+
+	call_command("migrate", verbosity=0)
+
+
+def populate(total, expired_rate, batch_size, rng):
+	from api.models import Canine, Client, Enrollment, EnrollmentPlan, TransportService, User
+
+	today = datetime.date.today()
+	user = User.objects.create(username="benchmark", email="benchmark@example.com")
+	client = Client.objects.create(user=user)
+	canines = Canine.objects.bulk_create(
+		Canine(client=client, name=f"Dog {n}", breed="Criollo", age=3, size=Canine.Size.MEDIUM)
+		for n in range(1000)
+	)
+	plan = EnrollmentPlan.objects.create(
+		name="Benchmark", duration=EnrollmentPlan.Duration.ONE_MONTH, price=100
+	)
+	transport = TransportService.objects.create(type=TransportService.Type.NO_SERVICE)
+
+	for start in range(0, total, batch_size):
+		batch = []
+		for _ in range(min(batch_size, total - start)):
+			offset = -rng.randint(1, 365) if rng.random() < expired_rate else rng.randint(0, 365)
+			expiration = today + datetime.timedelta(days=offset)
+			batch.append(
+				Enrollment(
+					canine=rng.choice(canines),
+					plan=plan,
+					price_paid=plan.price,
+					transport_service=transport,
+					enrollment_date=expiration - datetime.timedelta(days=30),
+					expiration_date=expiration,
+				)
+			)
+		Enrollment.objects.bulk_create(batch)
+
+
+def per_row_baseline(sample):
+	"""The naive approach: load each expired enrollment and save() it"""
+	from api.expirations import expired_enrollments
+
+	today = datetime.date.today()
+	started = time.perf_counter()
+	rows = 0
+	for enrollment in expired_enrollments(today)[:sample]:
+		enrollment.status = False
+		enrollment.save()
+		rows += 1
+	return rows, time.perf_counter() - started
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+	)
+	parser.add_argument("--enrollments", type=int, default=1_000_000)
+	parser.add_argument("--expired-rate", type=float, default=0.5)
+	parser.add_argument("--batch-size", type=int, default=1000, help="Sweep batch size")
+	parser.add_argument("--baseline-sample", type=int, default=2000)
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument(
+		"--keep-db", action="store_true", help="Use DATABASE_URL instead of a temporary SQLite file"
+	)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		database_url = (
+			os.environ["DATABASE_URL"] if args.keep_db else f"sqlite:///{tmp}/benchmark.sqlite3"
+		)
+		setup_django(database_url)
+		from api.expirations import expired_enrollments, sweep_expired_enrollments
+
+		# The sweep logs every deactivated id at INFO level
+		logging.getLogger("api.expirations").setLevel(logging.WARNING)
+
+		started = time.perf_counter()
+		populate(args.enrollments, args.expired_rate, 10_000, random.Random(args.seed))
+		sys.stdout.write(
+			f"Inserted {args.enrollments} enrollments in {time.perf_counter() - started:.1f}s\n"
+		)
+
+		expired = expired_enrollments(datetime.date.today()).count()
+		rows, baseline = per_row_baseline(args.baseline_sample)
+		if rows:
+			sys.stdout.write(
+				f"Per-row save(): {rows} rows in {baseline:.2f}s "
+				f"({rows / baseline:,.0f} rows/s, "
+				f"~{baseline / rows * expired:.0f}s for {expired})\n"
+			)
+
+		started = time.perf_counter()
+		result = sweep_expired_enrollments(batch_size=args.batch_size)
+		elapsed = time.perf_counter() - started
+		sys.stdout.write(
+			f"Batched sweep: {result.deactivated} rows in {result.batches} batches, "
+			f"{elapsed:.2f}s ({result.deactivated / elapsed:,.0f} rows/s)\n"
+		)
+
+
+if __name__ == "__main__":
+	main()
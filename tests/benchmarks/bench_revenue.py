@@ -0,0 +1,179 @@
+"""
+Benchmark of the accrual revenue engine (api.revenue).
+
+Creates a throwaway SQLite database (or uses DATABASE_URL with --keep-db),
+inserts ``--enrollments`` enrollments spread over the last ``--years`` years on
+plans of every duration, and times loading them, the vectorized engine and a
+per-enrollment, per-month Python loop run on a sample and extrapolated:
+
+    python tests/benchmarks/bench_revenue.py --enrollments 1000000
+"""
+
+import argparse
+import calendar
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parents[2] / "server"
+DAYS_PER_MONTH = 30
+
+
+def setup_django(database_url):
+	sys.path.insert(0, str(SERVER_DIR))
+	os.environ["DATABASE_URL"] = database_url
+	os.environ.setdefault("SECRET_KEY", "benchmark")
+	os.environ.setdefault("DJANGO_SETTINGS_MODULE", "colegiocanino.settings")
+	import django
+
+	django.setup()
+	from django.core.management import call_command
+
+	call_command("migrate", verbosity=0)
+
+
+def populate(total, years, batch_size, rng):
+	from api.models import Canine, Client, Enrollment, EnrollmentPlan, TransportService, User
+
+	today = datetime.date.today()
+	user = User.objects.create(username="benchmark", email="benchmark@example.com")
+	client = Client.objects.create(user=user)
+	canines = Canine.objects.bulk_create(
+		Canine(client=client, name=f"Dog {n}", breed="Criollo", age=3, size=Canine.Size.MEDIUM)
+		for n in range(1000)
+	)
+	plans = [
+		(
+			EnrollmentPlan.objects.create(
+				name=f"Benchmark {label}", duration=duration, price=100 * months
+			),
+			months,
+		)
+		for months, (duration, label) in zip(
+			(1, 2, 3, 6, 12), EnrollmentPlan.Duration.choices, strict=False
+		)
+	]
+	transport = TransportService.objects.create(type=TransportService.Type.NO_SERVICE)
+
+	for start in range(0, total, batch_size):
+		batch = []
+		for _ in range(min(batch_size, total - start)):
+			plan, months = rng.choice(plans)
+			enrollment_date = today - datetime.timedelta(days=rng.randint(0, 365 * years))
+			batch.append(
+				Enrollment(
+					canine=rng.choice(canines),
+					plan=plan,
+					price_paid=plan.price,
+					transport_service=transport,
+					enrollment_date=enrollment_date,
+					expiration_date=enrollment_date
+					+ datetime.timedelta(days=months * DAYS_PER_MONTH),
+				)
+			)
+		Enrollment.objects.bulk_create(batch)
+
+
+def per_month_baseline(rows):
+	"""The naive approach: walk the months of every enrollment, prorating by days"""
+	income = {}
+	for start, raw_end, price in rows:
+		end = max(raw_end, start + datetime.timedelta(days=1))
+		rate = float(price) / (end - start).days
+		month = start.replace(day=1)
+		while month < end:
+			next_month = month + datetime.timedelta(
+				days=calendar.monthrange(month.year, month.month)[1]
+			)
+			key = month.strftime("%Y-%m")
+			income[key] = (
+				income.get(key, 0) + rate * (min(end, next_month) - max(start, month)).days
+			)
+			month = next_month
+	return income
+
+
+def compare_engine(rows, sample_size):
+	"""Time the vectorized engine on every row against the loop on a sample"""
+	from api.revenue import accrue, cents_array, day_array
+
+	sample = rows[:sample_size]
+	started = time.perf_counter()
+	expected = per_month_baseline(sample)
+	baseline = time.perf_counter() - started
+	sys.stdout.write(
+		f"Per-month loop: {len(sample)} enrollments in {baseline:.2f}s "
+		f"(~{baseline / len(sample) * len(rows):.1f}s for {len(rows)})\n"
+	)
+
+	started = time.perf_counter()
+	starts, ends, prices = zip(*rows, strict=True)
+	arrays = (day_array(starts), day_array(ends), cents_array(prices))
+	converted = time.perf_counter() - started
+	started = time.perf_counter()
+	accrue(*arrays)
+	elapsed = time.perf_counter() - started
+	sys.stdout.write(f"Vectorized: {converted:.2f}s to build arrays, {elapsed:.3f}s to accrue\n")
+
+	months, income, _ = accrue(*(array[: len(sample)] for array in arrays))
+	drift = max(
+		abs(cents / 100 - expected.get(str(month), 0))
+		for month, cents in zip(months, income, strict=True)
+	)
+	sys.stdout.write(f"Largest monthly difference against the loop: {drift:.6f}\n")
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+	)
+	parser.add_argument("--enrollments", type=int, default=1_000_000)
+	parser.add_argument("--years", type=int, default=5)
+	parser.add_argument("--baseline-sample", type=int, default=100_000)
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument(
+		"--keep-db", action="store_true", help="Use DATABASE_URL instead of a temporary SQLite file"
+	)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		database_url = (
+			os.environ["DATABASE_URL"] if args.keep_db else f"sqlite:///{tmp}/benchmark.sqlite3"
+		)
+		setup_django(database_url)
+		from api import caching
+		from api.models import Enrollment
+		from api.revenue import accrued_income
+
+		started = time.perf_counter()
+		populate(args.enrollments, args.years, 10_000, random.Random(args.seed))
+		sys.stdout.write(
+			f"Inserted {args.enrollments} enrollments in {time.perf_counter() - started:.1f}s\n"
+		)
+
+		started = time.perf_counter()
+		rows = list(
+			Enrollment.objects.values_list("enrollment_date", "expiration_date", "price_paid")
+		)
+		sys.stdout.write(f"Loaded {len(rows)} rows in {time.perf_counter() - started:.2f}s\n")
+
+		compare_engine(rows, args.baseline_sample)
+
+		# Make sure a configured cache doesn't answer instead of the engine
+		caching.bump("enrollments")
+		started = time.perf_counter()
+		accrued = accrued_income()
+		elapsed = time.perf_counter() - started
+		total = sum(month["income"] for month in accrued["months"])
+		sys.stdout.write(
+			f"End to end (query + arrays + accrual): {elapsed:.2f}s, "
+			f"accrued {total} against {sum(price for _start, _end, price in rows)} paid\n"
+		)
+
+
+if __name__ == "__main__":
+	main()
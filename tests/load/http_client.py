@@ -0,0 +1,118 @@
+"""Minimal asyncio HTTP/1.1 client (stdlib only) with keep-alive connection reuse."""
+
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+HTTP_OK = 200
+
+
+class HTTPError(Exception):
+	pass
+
+
+class Response:
+	def __init__(self, status, headers, body):
+		self.status = status
+		self.headers = headers
+		self.body = body
+
+	def json(self):
+		return json.loads(self.body or b"null")
+
+
+class Connection:
+	def __init__(self, host, port):
+		self.host = host
+		self.port = port
+		self.reader = None
+		self.writer = None
+
+	async def open(self):
+		self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+			self.reader = self.writer = None
+
+	async def request(self, method, path, headers, body):
+		if self.writer is None:
+			await self.open()
+		lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+		lines.extend(f"{name}: {value}" for name, value in headers.items())
+		lines.append(f"Content-Length: {len(body)}")
+		self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+		await self.writer.drain()
+		return await self._read_response()
+
+	async def _read_response(self):
+		status_line = await self.reader.readline()
+		if not status_line:
+			raise HTTPError("connection closed by server")
+		status = int(status_line.split()[1])
+		headers = {}
+		while (line := await self.reader.readline()) not in {b"\r\n", b"\n", b""}:
+			name, _, value = line.decode("latin-1").partition(":")
+			headers[name.strip().lower()] = value.strip()
+
+		if headers.get("transfer-encoding", "").lower() == "chunked":
+			body = await self._read_chunked()
+		else:
+			body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+		if headers.get("connection", "").lower() == "close":
+			self.close()
+		return Response(status, headers, body)
+
+	async def _read_chunked(self):
+		chunks = []
+		while True:
+			size = int((await self.reader.readline()).split(b";")[0], 16)
+			if size == 0:
+				await self.reader.readline()
+				return b"".join(chunks)
+			chunks.append(await self.reader.readexactly(size))
+			await self.reader.readline()
+
+
+class Client:
+	"""HTTP client bound to one base URL; each client keeps its own connection"""
+
+	def __init__(self, base_url, token=None):
+		parts = urlsplit(base_url)
+		self.base_url = base_url
+		self.prefix = parts.path.rstrip("/")
+		self.connection = Connection(parts.hostname, parts.port or 80)
+		self.token = token
+
+	async def request(self, method, path, payload=None):
+		headers = {"Accept": "application/json"}
+		if self.token:
+			headers["Authorization"] = f"Bearer {self.token}"
+		body = b""
+		if payload is not None:
+			headers["Content-Type"] = "application/json"
+			body = json.dumps(payload).encode()
+		try:
+			return await self.connection.request(method, self.prefix + path, headers, body)
+		except (ConnectionError, HTTPError, asyncio.IncompleteReadError):
+			# Stale keep-alive connection: reconnect once
+			self.connection.close()
+			return await self.connection.request(method, self.prefix + path, headers, body)
+
+	async def get(self, path):
+		return await self.request("GET", path)
+
+	async def post(self, path, payload):
+		return await self.request("POST", path, payload)
+
+	async def login(self, username, password):
+		response = await self.post("/api/login/", {"username": username, "password": password})
+		if response.status != HTTP_OK:
+			raise HTTPError(f"login failed for '{username}' ({response.status})")
+		self.token = response.json()["access"]
+		return self
+
+	def close(self):
+		self.connection.close()
@@ -0,0 +1,311 @@
+"""
+Scenario-based HTTP load tests for the API.
+
+Drives a running server (``task backend`` or gunicorn) with virtual users that
+replay real usage patterns and reports, per scenario, p50/p95/p99 latency and
+throughput of the successful (2xx) responses plus the errors. Results are written
+to JSON so runs on different commits can be compared:
+
+    python tests/load/run.py --duration 30 --concurrency 20 \\
+        --credentials coach=coach:secret director=director:secret admin=admin:secret \\
+        --credentials "client=synthetic_{n}:synthetic-password" \\
+        --output results/$(git rev-parse --short HEAD).json --compare results/baseline.json
+
+``{n}`` in a username is replaced by the virtual user number, so every client
+virtual user logs in as a different synthetic user (see ``manage.py seed_synthetic``).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from http_client import HTTP_OK, Client
+
+HTTP_MULTIPLE_CHOICES = 300
+
+DIRECTOR_REPORTS = [
+	"/api/enrollments/report_by_plan/",
+	"/api/enrollments/report_by_size/",
+	"/api/enrollments/report_by_transport/",
+	"/api/enrollments/report_by_breed/",
+	"/api/attendance/report_by_status/",
+	"/api/reports/monthly-income/",
+	"/api/reports/enrollments-by-plan/",
+]
+
+
+class Stats:
+	"""
+	Latencies of the successful (2xx) responses and, separately, of the failed ones:
+	a burst of fast 401s or 500s must not make a run look faster.
+	"""
+
+	def __init__(self):
+		self.samples = {}
+		self.error_samples = {}
+		self.failures = {}
+
+	async def timed(self, label, request):
+		start = time.perf_counter()
+		try:
+			response = await request
+		except Exception:
+			# No response at all (connection errors, timeouts...)
+			self.failures[label] = self.failures.get(label, 0) + 1
+			raise
+		succeeded = HTTP_OK <= response.status < HTTP_MULTIPLE_CHOICES
+		samples = self.samples if succeeded else self.error_samples
+		samples.setdefault(label, []).append(time.perf_counter() - start)
+		return response
+
+	def summary(self, elapsed):
+		def flatten(by_label):
+			return [sample for samples in by_label.values() for sample in samples]
+
+		labels = sorted({*self.samples, *self.error_samples, *self.failures})
+		return {
+			**_describe(
+				flatten(self.samples),
+				flatten(self.error_samples),
+				sum(self.failures.values()),
+				elapsed,
+			),
+			"endpoints": {
+				label: _describe(
+					self.samples.get(label, []),
+					self.error_samples.get(label, []),
+					self.failures.get(label, 0),
+					elapsed,
+				)
+				for label in labels
+			},
+		}
+
+
+def _percentile(sorted_samples, percent):
+	if not sorted_samples:
+		return None
+	rank = max(0, round(percent / 100 * len(sorted_samples)) - 1)
+	return round(sorted_samples[rank] * 1000, 2)
+
+
+def _latency(samples):
+	ordered = sorted(samples)
+	return {
+		"p50": _percentile(ordered, 50),
+		"p95": _percentile(ordered, 95),
+		"p99": _percentile(ordered, 99),
+		"mean": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None,
+		"max": round(ordered[-1] * 1000, 2) if ordered else None,
+	}
+
+
+def _describe(samples, error_samples, failures, elapsed):
+	"""
+	``requests`` counts every attempt, ``errors`` the non-2xx responses and the
+	requests that got no response. Throughput and ``latency_ms`` only cover the
+	successful responses; ``error_latency_ms`` covers the non-2xx ones.
+	"""
+	return {
+		"requests": len(samples) + len(error_samples) + failures,
+		"errors": len(error_samples) + failures,
+		"throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0,
+		"latency_ms": _latency(samples),
+		"error_latency_ms": _latency(error_samples),
+	}
+
+
+# Scenarios: each one has the role its virtual users log in as, an optional setup
+# run once (its result is shared by every virtual user) and one iteration step.
+
+
+async def setup_check_in(client):
+	response = await client.get("/api/enrollments/?status=true")
+	enrollments = response.json()
+	if not enrollments:
+		raise SystemExit("morning_check_in needs at least one active enrollment")
+	return [enrollment["id"] for enrollment in enrollments]
+
+
+async def morning_check_in(client, stats, enrollment_ids, rng):
+	"""Coaches registering arrivals at opening time"""
+	await stats.timed(
+		"POST attendance/check_in",
+		client.post(
+			"/api/attendance/check_in/",
+			{"enrollment": rng.choice(enrollment_ids), "status": "present"},
+		),
+	)
+	await stats.timed("GET attendance/today", client.get("/api/attendance/today/"))
+
+
+async def client_dashboard(client, stats, _context, _rng):
+	"""Owners opening the client area: profile, then each pet's attendance"""
+	profile = await stats.timed("GET profile", client.get("/api/profile/"))
+	await stats.timed("GET user-type", client.get("/api/user-type/"))
+	if profile.status != HTTP_OK:
+		return
+	for canine in profile.json().get("canines", []):
+		await stats.timed(
+			"GET canines/<id>/attendance", client.get(f"/api/canines/{canine['id']}/attendance/")
+		)
+
+
+async def side_get(client, stats, label, path):
+	"""GET on a separate connection, like a browser firing concurrent requests"""
+	side_client = Client(client.base_url, client.token)
+	try:
+		return await stats.timed(label, side_client.get(path))
+	finally:
+		side_client.close()
+
+
+async def director_reports(client, stats, _context, _rng):
+	"""Director dashboard page load, which fires every report concurrently"""
+	await asyncio.gather(
+		*(
+			side_get(client, stats, f"GET {path.removeprefix('/api/')}", path)
+			for path in DIRECTOR_REPORTS
+		)
+	)
+
+
+async def admin_user_management(client, stats, _context, rng):
+	"""Administrators opening the user management page, then a user's profile"""
+	await stats.timed("GET users/me", client.get("/api/users/me/"))
+	_internal_users, users = await asyncio.gather(
+		side_get(client, stats, "GET internal-users", "/api/internal-users/"),
+		side_get(client, stats, "GET users", "/api/users/"),
+	)
+	if users.status == HTTP_OK and (user_list := users.json()):
+		user_id = rng.choice(user_list)["id"]
+		await stats.timed("GET users/<id>/profile", client.get(f"/api/users/{user_id}/profile/"))
+
+
+SCENARIOS = {
+	"morning_check_in": ("coach", setup_check_in, morning_check_in),
+	"client_dashboard": ("client", None, client_dashboard),
+	"director_reports": ("director", None, director_reports),
+	"admin_user_management": ("admin", None, admin_user_management),
+}
+
+
+async def run_scenario(name, args, credentials):
+	role, setup, step = SCENARIOS[name]
+	if role not in credentials:
+		sys.stderr.write(f"Skipping {name}: no credentials for role '{role}'\n")
+		return None
+
+	username, password = credentials[role]
+	clients = [
+		await Client(args.base_url).login(username.format(n=n), password)
+		for n in range(args.concurrency)
+	]
+	context = await setup(clients[0]) if setup else None
+	stats = Stats()
+	deadline = time.perf_counter() + args.duration
+
+	async def virtual_user(n, client):
+		rng = random.Random(args.seed + n)
+		while time.perf_counter() < deadline:
+			try:
+				await step(client, stats, context, rng)
+			except Exception as e:
+				sys.stderr.write(f"{name}: {e!r}\n")
+
+	started = time.perf_counter()
+	await asyncio.gather(*(virtual_user(n, client) for n, client in enumerate(clients)))
+	elapsed = time.perf_counter() - started
+	for client in clients:
+		client.close()
+	return stats.summary(elapsed)
+
+
+def _git_commit():
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def _parse_credentials(values):
+	credentials = {}
+	for value in values:
+		role, _, user = value.partition("=")
+		username, _, password = user.partition(":")
+		credentials[role] = (username, password)
+	return credentials
+
+
+def _ms(value):
+	"""Latency column; scenarios without successful requests have no percentiles"""
+	return "-" if value is None else value
+
+
+def print_report(results, baseline=None):
+	header = f"{'scenario':<24}{'reqs':>8}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+	write = sys.stdout.write
+	write(f"{header}\n{'-' * len(header)}\n")
+	for name, summary in results["scenarios"].items():
+		latency = summary["latency_ms"]
+		write(
+			f"{name:<24}{summary['requests']:>8}{summary['errors']:>6}{summary['throughput_rps']:>10}"
+			f"{_ms(latency['p50']):>9}{_ms(latency['p95']):>9}{_ms(latency['p99']):>9}\n"
+		)
+		previous = (baseline or {}).get("scenarios", {}).get(name)
+		if previous and previous["latency_ms"]["p95"] and latency["p95"]:
+			change = (latency["p95"] / previous["latency_ms"]["p95"] - 1) * 100
+			rps_change = (summary["throughput_rps"] / (previous["throughput_rps"] or 1) - 1) * 100
+			write(
+				f"{'':<24}vs {baseline['meta']['commit']}: "
+				f"p95 {change:+.1f}%, rps {rps_change:+.1f}%\n"
+			)
+
+
+async def main():
+	parser = argparse.ArgumentParser(
+		description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+	)
+	parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+	parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+	parser.add_argument("--duration", type=float, default=20, help="Seconds per scenario")
+	parser.add_argument("--concurrency", type=int, default=10, help="Virtual users per scenario")
+	parser.add_argument("--credentials", nargs="+", action="extend", default=[])
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--output", type=Path)
+	parser.add_argument("--compare", type=Path, help="Previous results JSON to compare against")
+	args = parser.parse_args()
+
+	credentials = _parse_credentials(args.credentials)
+	results = {
+		"meta": {
+			"commit": _git_commit(),
+			"started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+			"base_url": args.base_url,
+			"duration_s": args.duration,
+			"concurrency": args.concurrency,
+		},
+		"scenarios": {},
+	}
+	for name in args.scenario or SCENARIOS:
+		summary = await run_scenario(name, args, credentials)
+		if summary is not None:
+			results["scenarios"][name] = summary
+
+	baseline = json.loads(args.compare.read_text()) if args.compare else None
+	# Results first: a failing report must not lose the run
+	if args.output:
+		args.output.parent.mkdir(parents=True, exist_ok=True)
+		args.output.write_text(json.dumps(results, indent=2))
+	print_report(results, baseline)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())